@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+from __future__ import print_function
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from sdrcalibrator.lib.utils.sdr_test_class import SDR_Test_Class
+from sdrcalibrator.lib.utils.dictdotaccessor import DictDotAccessor
+
+""" Compare the single and double precision IQ/DSP paths on the mock SDR """
+
+
+""" Create a test class connected to the mock SDR in the given precision mode """
+def create_test(precision, args):
+    profile = DictDotAccessor({
+        'sdr_module': 'mock_sdr',
+        'sdr_connect_params': {},
+        'sdr_power_scale_factor': args.scale_factor,
+        'sdr_iq_precision': precision,
+        'fft_number_of_bins': args.bins,
+        'logging_quiet_mode': True,
+        'logging_save_log_file': False
+    })
+    test = SDR_Test_Class(profile, None)
+    test.equipment_in_use['sdr'] = None
+    test.initialize_equipment()
+    test.calculate_scale_factor()
+    test.construct_fft_window(args.window, args.bins)
+    return test
+
+
+""" Run the DSP chain once on acquired data, returning the results """
+def run_dsp(test, data, args):
+    tdp = test.compute_time_domain_averaged_power(data)
+    fft, fft_freqs = test.compute_avg_fft(data, 0, args.averages)
+    dBm_fft, _ = test.compute_avg_dBm_fft(data, 0, args.averages)
+    return {
+        'tdp': tdp,
+        'fft': fft,
+        'dBm_fft': dBm_fft
+    }
+
+
+""" Time the acquisition and DSP chain and measure the DSP peak traced allocations """
+def benchmark(precision, args):
+    np.random.seed(args.seed)
+    test = create_test(precision, args)
+    n = args.bins*args.averages
+
+    # Acquisition (mock noise generation dominates, so report it separately)
+    t_acq = 0
+    t_dsp = 0
+    for i in range(args.iterations):
+        t0 = time.perf_counter()
+        data = test.acquire_samples(n)
+        t1 = time.perf_counter()
+        results = run_dsp(test, data, args)
+        t2 = time.perf_counter()
+        t_acq += t1-t0
+        t_dsp += t2-t1
+
+    # Peak allocations for a single DSP pass
+    tracemalloc.start()
+    run_dsp(test, data, args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    results['data'] = data.copy()
+    results['t_acq'] = t_acq/args.iterations
+    results['t_dsp'] = t_dsp/args.iterations
+    results['peak'] = peak
+    return results
+
+
+""" Run both precision modes and compare """
+def main(args):
+    double = benchmark('double', args)
+    np.random.seed(args.seed)
+    single = benchmark('single', args)
+
+    print("Samples per pass: {} ({} averages of {} bins)".format(
+            args.bins*args.averages, args.averages, args.bins))
+    print("{:>8} {:>14} {:>14} {:>16} {:>10} {:>10}".format(
+            "Mode", "Acquire (ms)", "DSP (ms)", "DSP peak (MiB)", "IQ dtype", "FFT dtype"))
+    for mode, r in [('double', double), ('single', single)]:
+        print("{:>8} {:>14.3f} {:>14.3f} {:>16.2f} {:>10} {:>10}".format(
+                mode, 1e3*r['t_acq'], 1e3*r['t_dsp'], r['peak']/2.0**20,
+                str(r['data'].dtype), str(r['fft'].dtype)))
+    print("DSP speedup: {:.2f}x, DSP peak memory ratio: {:.2f}".format(
+            double['t_dsp']/single['t_dsp'], float(single['peak'])/double['peak']))
+
+    # Compare the results of the two paths
+    print("Time domain power: {:.6f} dBm (double), {:.6f} dBm (single)".format(
+            double['tdp'], single['tdp']))
+    print("Max IQ difference: {:.3e} V".format(
+            np.max(np.abs(double['data']-single['data']))))
+    for k in ['fft', 'dBm_fft']:
+        # Only compare bins well above the single precision noise floor
+        valid = double[k] > np.max(double[k]) - args.dynamic_range
+        print("Max {} difference: {:.3e} dB ({} bins within {} dB of peak)".format(
+                k, np.max(np.abs(double[k][valid]-single[k][valid])),
+                np.count_nonzero(valid), args.dynamic_range))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the single and double precision IQ/DSP paths on the mock SDR")
+    parser.add_argument("-b", "--bins", type=int, default=4096, help="FFT size")
+    parser.add_argument("-a", "--averages", type=int, default=100, help="Number of FFTs averaged")
+    parser.add_argument("-i", "--iterations", type=int, default=10, help="Timed passes per mode")
+    parser.add_argument("-w", "--window", default=None, choices=[None, 'flattop'], help="FFT window")
+    parser.add_argument("-s", "--scale-factor", type=float, default=-10, help="SDR power scale factor (dB)")
+    parser.add_argument("-r", "--dynamic-range", type=float, default=100, help="Compared range below the FFT peak (dB)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for the mock SDR")
+    args = parser.parse_args()
+    main(args)
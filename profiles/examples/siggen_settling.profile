@@ -0,0 +1,25 @@
+#
+# Test profile characterizing how long the signal generator output takes to settle
+#
+
+# Test parameters
+test_type = 'siggen_settling'
+test_settling_detector = 'power_meter' # 'power_meter' or 'sdr'
+test_settling_frequency_steps = [1e6, 10e6, 100e6, 1e9]
+test_settling_power_steps = [1, 3, 10, 20]
+test_settling_repeats = 3
+test_settling_observation_time = 2 # seconds read after each transition
+#test_settling_reference_time = 1 # seconds to wait between transitions (defaults to siggen_rf_on_settling_time)
+test_settling_tolerance = 0.1 # dB around the final level counted as settled
+test_settling_rf_off_drop = 20 # dB drop counted as the RF output being off
+
+# Frequency parameters
+freq_f0 = 1000e6
+
+# Power Parameters
+power_level = -10
+
+# Logging parameters
+#logging_quiet_mode = False
+logging_save_settling_model = True
+logging_save_log_file = False
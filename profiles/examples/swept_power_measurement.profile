@@ -15,6 +15,9 @@ test_type = 'swept_power_measurement'
 #]
 #test_spur_danl_num = 10
 #test_spur_threshold = 5
+#test_dsp_pipeline_depth = 0 # Points acquired ahead while a DSP worker reduces earlier ones
+#test_siggen_list_sweep = False # EXPERIMENTAL (not yet verified on hardware): preload each power ramp into the signal generator's list sweep (power swept last)
+#test_siggen_list_trigger = 'bus' # 'bus' (*TRG) or 'software' (:TRIGger) list point advance
 
 # Sweep parameters
 sweep_f_min = 100e6
@@ -26,6 +26,8 @@ sdr_gain = 0 # sdr.SDR_DEFAULT_GAIN #60
 #sdr_power_limit = -15
 sdr_power_scale_factor = 0 #-49.8291927888
 #sdr_power_scale_factor_file = './path/to/file/scale_factors.csv'
+#sdr_iq_precision = 'double' # 'single' keeps IQ complex64 and spectra float32
+#sdr_ready_timeout = 1 # seconds to wait for the SDR to settle after clock/sample rate changes
 
 
 ############# NETWORK SETTINGS #############
@@ -39,6 +41,7 @@ siggen_connect_params = {
 }
 siggen_rf_on_settling_time = 0.5
 siggen_rf_off_settling_time = 0.5
+#siggen_settling_model_file = './test_results/.../siggen_settling_model.json' # written by the siggen_settling test
 
 # Power meter paramters 
 # pwrmtr_module = 'n1912a' #pwrmtr_module = 'n9030b'
@@ -47,6 +50,11 @@ pwrmtr_connect_params = {
     'ip_addr' : '192.168.82.123',
     'perform_calibration_at_startup' : False,
     'perform_calibration_during_run' : False
+    # 'verification_policy' : 'on-change', # 'always', 'on-change' or 'sampled' readback of settings
+    # 'verification_sample_interval' : 10
+    # 'measurement_rate' : 'DOUBle', # E4419B: 'NORMal', 'DOUBle' or 'FAST'
+    # 'averaging_count' : None, # E4419B: readings averaged per measurement (None for auto)
+    # 'target_uncertainty' : 0.05 # E4419B: dB, picks the rate and averaging count
 }
 
 # RF Switch parameters
@@ -1,11 +1,11 @@
 import time
 from gnuradio import eng_notation
-import pyvisa as visa
 import csv
 import numpy as np
 import copy
 
 import sdrcalibrator.lib.utils.common as utils
+import sdrcalibrator.lib.equipment.visa_sessions as visa_sessions
 from sdrcalibrator.lib.equipment.atten.atten_error import Programmable_Attenuator_Error
 
 
@@ -29,9 +29,6 @@ class Programmable_Attenuator(object):
         self.alive = False
 
     def connect(self, connect_params):
-        # Create the Visa resource manager
-        rm = visa.ResourceManager('@py')
-
         # Save the connection variables
         self.ip_addr = connect_params['ip_addr']
         #self.port = connect_params['port']
@@ -40,10 +37,10 @@ class Programmable_Attenuator(object):
         except KeyError:
             self.connect_timeout = self.ATTEN_DEFAULT_CONNECT_TIMEOUT
 
-        # Attempt to connect to the machine
+        # Attempt to connect to the machine (reusing an open session)
         try:
             #self.atten = rm.open_resource("TCPIP0::{}::{}::INSTR".format(
-            self.atten = rm.open_resource("TCPIP0::{}::INSTR".format(
+            self.atten = visa_sessions.open_session("TCPIP0::{}::INSTR".format(
                     self.ip_addr#, self.port
                 ), open_timeout=self.connect_timeout)
         except Exception:
@@ -193,6 +190,7 @@ class Programmable_Attenuator(object):
     def power_down(self):
         if self.alive:
             self.attenuation_off(0)
+            visa_sessions.release_session(self.atten)
             self.alive = False
             return
 
@@ -1,7 +1,7 @@
 from gnuradio import eng_notation
 from serial.serialutil import SerialException
-import pyvisa as visa
 
+import sdrcalibrator.lib.equipment.visa_sessions as visa_sessions
 from sdrcalibrator.lib.equipment.pwrmtr.pwrmtr_error import Power_Meter_Error
 
 
@@ -10,19 +10,24 @@ class Power_Meter(object):
     # Power meter constants
     PWRMTR_NAME = 'Agilent E4419B'
     PWRMTR_DEFAULT_CONNECT_TIMEOUT = 5000
+    PWRMTR_DEFAULT_MEASUREMENT_RATE = 'DOUBle' # 'NORMal' (20/s), 'DOUBle' (40/s) or 'FAST' (200/s)
+    PWRMTR_DEFAULT_AVERAGING_COUNT = None # Readings averaged per measurement, None for auto averaging
+
+    # Internal constants
+    MEASUREMENT_RATES = ['NORMal', 'DOUBle', 'FAST']
 
     def __init__(self):
         self.alive = False
 
-        # Create the Visa resource manager and get a list of resources
-        self.rm = visa.ResourceManager('@py')
-        self.resources = self.rm.list_resources()
+    # List the connected resources (only scanned when asked for)
+    def query_equipment_options(self):
+        return visa_sessions.list_resources()
 
     def connect(self, connect_params):
         # Check if we are connecting based off an equipment id and
         # save the string
         if 'equipment_id' in connect_params:
-            connect_params['equipment_string'] = self.resources[
+            connect_params['equipment_string'] = self.query_equipment_options()[
                     connect_params['equipment_id']
                 ]
         if 'equipment_string' in connect_params:
@@ -40,9 +45,9 @@ class Power_Meter(object):
         except KeyError:
             self.connect_timeout = self.PWRMTR_DEFAULT_CONNECT_TIMEOUT
 
-        # Attempt to connect to the machine
+        # Attempt to connect to the machine (reusing an open session)
         try:
-            self.pwrmtr = self.rm.open_resource(
+            self.pwrmtr = visa_sessions.open_session(
                     self.equipment_string, open_timeout=self.connect_timeout
                 )
         except SerialException:
@@ -76,22 +81,58 @@ class Power_Meter(object):
         # Set number data byte order to "normal"
         self.pwrmtr.write('FORMat:BORDer NORMal')
 
-        # Set measurement rate to double (40 readings/second)
-        self.pwrmtr.write('SENSe:MRATe DOUBle')
+        # Get the measurement settings (pick them from the meter's noise at the levels measured)
+        try:
+            self.measurement_rate = connect_params['measurement_rate']
+        except KeyError:
+            self.measurement_rate = self.PWRMTR_DEFAULT_MEASUREMENT_RATE
+        try:
+            self.averaging_count = connect_params['averaging_count']
+        except KeyError:
+            self.averaging_count = self.PWRMTR_DEFAULT_AVERAGING_COUNT
+        if self.measurement_rate not in self.MEASUREMENT_RATES:
+            raise Power_Meter_Error(
+                    11,
+                    "Invalid measurement rate '{}'".format(self.measurement_rate),
+                    "The measurement rate must be one of {}".format(self.MEASUREMENT_RATES)
+                )
+
+        # Configure the measurement once, readings then only trigger and fetch
+        self.configure_measurement()
 
-    def query_equipment_options(self):
-        return self.resources
+    # Set up channel 1 for single triggered average power readings
+    def configure_measurement(self):
+        self.pwrmtr.write('CONFigure1:POWer:AC DEF,2,(@1)')
+
+        # Set the measurement rate
+        self.pwrmtr.write('SENSe1:MRATe {}'.format(self.measurement_rate))
+
+        # Set a fixed averaging count or let the meter pick one for the power level
+        if self.averaging_count is None:
+            self.pwrmtr.write('SENSe1:AVERage:COUNt:AUTO ON')
+        else:
+            self.pwrmtr.write('SENSe1:AVERage:COUNt {}'.format(self.averaging_count))
+        self.pwrmtr.write('SENSe1:AVERage:STATe ON')
+
+        # Take a reading only when asked for one
+        self.pwrmtr.write('INITiate1:CONTinuous OFF')
+        self.pwrmtr.write('TRIGger1:SOURce IMMediate')
+        self.frequency = None
 
+    # Set the frequency correction (only written when the frequency changes)
     def tune_to_frequency(self, freq):
+        if freq == self.frequency:
+            return
         self.pwrmtr.write(
-                "SENSe:FREQuency {}Hz".format(eng_notation.num_to_str(freq))
+                "SENSe1:FREQuency {}Hz".format(eng_notation.num_to_str(freq))
             )
+        self.frequency = freq
 
+    # Take a reading with the configured measurement (READ? is INITiate then FETCh?)
     def take_measurement(self, expected_power):
-        return eng_notation.str_to_num(self.pwrmtr.query(
-                'MEAS1:POW:AC? -10DBM,2,(@1)'
-            ))
+        return eng_notation.str_to_num(self.pwrmtr.query('READ1?'))
 
     def __del__(self):
         if self.alive:
-            self.pwrmtr.close()
+            visa_sessions.release_session(self.pwrmtr)
+            self.alive = False
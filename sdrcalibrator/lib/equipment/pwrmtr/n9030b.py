@@ -1,6 +1,7 @@
 import vxi11, time, math
 
 from sdrcalibrator.lib.equipment.pwrmtr.pwrmtr_error import Power_Meter_Error
+from sdrcalibrator.lib.utils.scpi_set_policy import SCPI_Set_Policy
 
 
 class Power_Meter(object):
@@ -16,6 +17,13 @@ class Power_Meter(object):
     PWRMTR_DEFAULT_MIN_ATTENUATION = 6
     PWRMTR_DEFAULT_MAX_ATTENUATION = 70
     PWRMTR_DEFAULT_PERFORM_CALIBRATIONS_DURING_RUN = False
+    PWRMTR_DEFAULT_VERIFICATION_POLICY = 'always' # 'always', 'on-change' or 'sampled'
+    PWRMTR_DEFAULT_VERIFICATION_SAMPLE_INTERVAL = 10 # Sets per readback when sampled
+
+    # Internal constants
+    ESR_OPERATION_COMPLETE = 0x01
+    ESR_COMMAND_ERRORS = 0x3C # Query, device dependent, execution and command errors
+    COMPLETION_POLL_INTERVAL = 0.001 # seconds
 
     def debug_stop(self):
         raise Power_Meter_Error(
@@ -26,6 +34,7 @@ class Power_Meter(object):
 
     def __init__(self):
         self.alive = False
+        self.set_policy = SCPI_Set_Policy()
 
     def connect(self, connect_params):
         # Save the connection variables
@@ -99,7 +108,27 @@ class Power_Meter(object):
             self.max_attenuation = connect_params['max_attenuation']
         except KeyError:
             self.max_attenuation = self.PWRMTR_DEFAULT_MAX_ATTENUATION
+        try: # When parameter sets are read back
+            verification_policy = connect_params['verification_policy']
+        except KeyError:
+            verification_policy = self.PWRMTR_DEFAULT_VERIFICATION_POLICY
+        try: # Sets per readback with the sampled verification policy
+            verification_sample_interval = connect_params['verification_sample_interval']
+        except KeyError:
+            verification_sample_interval = self.PWRMTR_DEFAULT_VERIFICATION_SAMPLE_INTERVAL
+        if verification_policy not in SCPI_Set_Policy.POLICIES:
+            raise Power_Meter_Error(
+                    0,
+                    "Unknown verification policy",
+                    (
+                        "Verification policy \"{}\" is not one of {}"
+                    ).format(verification_policy, SCPI_Set_Policy.POLICIES)
+                )
+        self.set_policy = SCPI_Set_Policy(verification_policy, verification_sample_interval)
         self.pwrmtr.timeout = self.command_timeout
+
+        # Clear the event status so completion polling starts fresh
+        self.pwrmtr.write('*CLS')
         
         # Reset the system to its preset state
         self.preset()
@@ -157,19 +186,14 @@ class Power_Meter(object):
         time.sleep(0.5)
 
         # Start a measurement
-        self.wait_for_completion()
-        self.pwrmtr.write(":INIT:REST")
-        self.wait_for_completion()
+        self.write_and_wait(":INIT:REST")
 
         # Find the max power
-        self.wait_for_completion()
-        self.pwrmtr.write(":CALC:MARK1:MAX")
-        self.wait_for_completion()
+        self.write_and_wait(":CALC:MARK1:MAX")
 
         # Read the max power
-        self.wait_for_completion()
         max_power = float(self.pwrmtr.ask("CALC:MARK1:Y?"))
-        self.wait_for_completion()
+        self.set_policy.count_round_trips("CALC:MARK1:Y?")
 
         # Return the power level
         return max_power
@@ -207,7 +231,53 @@ class Power_Meter(object):
         # Return the attenuation
         return ideal_attenuation
     
+    # Write a command followed by *OPC and poll the event status register until it completes
+    # (two round-trips for most commands, instead of an *OPC? before and after)
+    # *CLS first, so error bits latched by earlier unpoliced commands are not blamed on this one
+    def write_and_wait(self, cmd, count_as=None):
+        if count_as is None:
+            count_as = cmd
+        self.pwrmtr.write("*CLS;{};*OPC".format(cmd))
+        round_trips = 1
+        deadline = time.time() + self.command_timeout
+        try:
+            while True:
+                esr = int(self.pwrmtr.ask('*ESR?'))
+                round_trips += 1
+                if esr & self.ESR_COMMAND_ERRORS:
+                    raise Power_Meter_Error(
+                        0,
+                        "Command failed",
+                        (
+                            "{} reported an error:\r\n" +
+                            "    Command: \"{}\"\r\n" +
+                            "    Event status: {}"
+                        ).format(self.PWRMTR_NAME,cmd,esr)
+                    )
+                if esr & self.ESR_OPERATION_COMPLETE:
+                    return
+                if time.time() > deadline:
+                    raise Power_Meter_Error(
+                        0,
+                        "Command did not complete",
+                        (
+                            "{} did not complete within {}s:\r\n" +
+                            "    Command: \"{}\""
+                        ).format(self.PWRMTR_NAME,self.command_timeout,cmd)
+                    )
+                time.sleep(self.COMPLETION_POLL_INTERVAL)
+        finally:
+            self.set_policy.count_round_trips(count_as, round_trips)
+
+    # Sets and round-trips spent per command
+    def get_round_trip_summary(self):
+        return self.set_policy.summary()
+
     def set_and_check_parameter(self, cmd, set_val, vartype='str', param_val=None, ask_cmd=None):
+        # Skip values already set and verified (on-change policy)
+        if self.set_policy.is_applied(cmd, set_val):
+            return
+
         # If no designated response is set, assume the same as set value
         if param_val is None:
             param_val = set_val
@@ -215,18 +285,17 @@ class Power_Meter(object):
         # If no designated ask command is set, assume its "[cmd]?"
         if ask_cmd is None:
             ask_cmd = "{}?".format(cmd)
-        
-        # Wait for anything prior to finish
-        self.wait_for_completion()
 
-        # Set the parameter
-        cmd = "{} {}".format(cmd,set_val)
-        self.pwrmtr.write(cmd)
-        self.wait_for_completion()
+        # Set the parameter and wait for it (and anything prior) to finish
+        set_cmd = "{} {}".format(cmd,set_val)
+        self.write_and_wait(set_cmd, count_as=cmd)
 
-        # Read the value back
+        # Only read the value back when the verification policy asks for it
+        if not self.set_policy.should_verify(cmd):
+            self.set_policy.record(cmd, set_val)
+            return
         actual_param_val = self.pwrmtr.ask(ask_cmd)
-        self.wait_for_completion()
+        self.set_policy.count_round_trips(cmd)
 
         # Convert to float if necessary
         if vartype == "int":
@@ -242,11 +311,10 @@ class Power_Meter(object):
                     "    Command: \"{}\"\r\n" +
                     "    Expected value: \"{}\"\r\n" +
                     "    Actual value:   \"{}\""
-                ).format(cmd,param_val,actual_param_val)
+                ).format(set_cmd,param_val,actual_param_val)
             )
         else:
-            #print("{} -> {}".format(cmd,param_val))
-            pass
+            self.set_policy.record(cmd, set_val)
     
     def calibrate_as_needed(self, forced_calibration=False):
         # Check if a calibration is necessary
@@ -269,6 +337,8 @@ class Power_Meter(object):
                 )
     
     def preset(self):
+        # The instrument state is no longer known
+        self.set_policy.invalidate()
         # Set the signal analyzer to preset
         self.pwrmtr.write('*RST')
         # Restore autoalignment
@@ -330,7 +330,7 @@ class SDR(object):
     """ Take IQ samples """
     # TODO
     # USER MODIFY - should return time domain array of IQ data
-    def take_iq_samples(self, n, n_skip, retries = 5, err=False):
+    def take_iq_samples(self, n, n_skip, retries = 5, err=False, out=None):
         # Raise error if requested
         if err:
             ehead = "Failed to acquire IQ samples"
@@ -357,10 +357,20 @@ class SDR(object):
         plt.plot(td[0], label="I") 
         plt.plot(td[1], label="Q")
         plt.show()
+
+        # Fill the caller's buffer with complex IQ if one was given
+        if out is not None:
+            out.real = td[0]
+            out.imag = td[1]
+            return out
         
         # Return a dummy array
         return td
 
+    """ The ADALM2000 samples its inputs directly, with no LO or AGC to settle """
+    def wait_until_ready(self, timeout):
+        return True
+
     """ Round the frequency according to SDR resolution """
     # TODO
     def frequency_round(self, f):
@@ -11,6 +11,7 @@ ADALM Pluto Driver Installation Notes
 
 import numpy as np
 from sdrcalibrator.lib.equipment.sdr.sdr_error import SDR_Error
+from sdrcalibrator.lib.equipment.sdr.sdr_settling import wait_for_stable_probe
 
 import iio
 import time
@@ -40,6 +41,7 @@ class SDR(object):
     SDR_ADC_BITS = 12 # bits
     SDR_PLUTO_VDDA1P3_BB = 1.3 # volts
     SDR_VIN_RANGE = [0.05, SDR_PLUTO_VDDA1P3_BB-0.05] # volts
+    SDR_DEFAULT_RX_CHUNK_SIZE = 65536 # samples per rx() buffer, kept fixed between points
 
 
     # USER MODIFY any additional sdr constants that are specific to an individual SDR (rather than the whole class)
@@ -53,6 +55,7 @@ class SDR(object):
         self.auto_dc_offset = self.SDR_DEFAULT_AUTO_DC_OFFSET
         self.auto_iq_balance = self.SDR_DEFAULT_AUTO_IQ_IMBALANCE
         self.gain = self.SDR_DEFAULT_GAIN
+        self.rx_chunk_size = self.SDR_DEFAULT_RX_CHUNK_SIZE
 
         # USER MODIFY with any routines SDR needs to run at startup
         print("CALLED INITIALIZE PLUTO")
@@ -125,6 +128,13 @@ class SDR(object):
         # Set any SDR variables or context that need to be used in other methods
         self.sdr = adi.Pluto(pluto_addr) # won't get here if no pluto 
 
+        # Use one fixed buffer size so the kernel buffers are reused between points
+        try:
+            self.rx_chunk_size = int(connect_params['rx_chunk_size'])
+        except KeyError:
+            self.rx_chunk_size = self.SDR_DEFAULT_RX_CHUNK_SIZE
+        self.sdr.rx_buffer_size = self.rx_chunk_size
+
         # TODO: calculate I/Q autoimbalance here
 
         # If no error was requested, return success
@@ -324,7 +334,7 @@ class SDR(object):
 
     """
     # USER MODIFY - Should return 2D time-domain array of I data and Q data
-    def take_iq_samples(self, n, n_skip, retries = 5, err=False):
+    def take_iq_samples(self, n, n_skip, retries = 5, err=False, out=None):
         print("TAKING IQ AMPLES IN ADALM PLUTO")
         # Raise error if requested
         if err:
@@ -335,36 +345,37 @@ class SDR(object):
             ebody += "Actual IQ data length: 0"
             raise SDR_Error(30, ehead, ebody)
         
-        # TODO: get data 
-
-        # get the skip samples - skips at least this many samples
+        # Flush the conditioning samples one buffer at a time (skips at least this many samples)
         print("GETTING CONDITIONING SAMPLES OF LENGTH:", n_skip)
-        self.sdr.rx_buffer_size = n_skip+n
-        self.sdr.rx() # take samples off pluto and fill buffer 
-
-        # # get the actual samples 
-        # print("GETTING ACTUAL SAMPLES OF LENGTH:", n)
-        # self.sdr.rx_buffer_size = n
-        td_all = self.sdr.rx() 
-
-        td = td_all[n_skip:n+n_skip]
-        print("ACTUAL SAMPLES R OF LENGTH:", len(td))
-        print("SDR GAIN IS SET TO", self.sdr.rx_hardwaregain_chan0)
-        print("WANTED SETTING OF", self.sdr.gain_control_mode_chan0)
+        for i in range(int(np.ceil(float(n_skip)/self.rx_chunk_size))):
+            self.sdr.rx()
+
+        # Fill the output from consecutive buffers
+        data_volts = np.empty(n, dtype=np.complex64) if out is None else out
+        num_filled = 0
+        while num_filled < n:
+            td = self.sdr.rx()
+            num_copied = min(len(td), n-num_filled)
+            data_volts[num_filled:num_filled+num_copied] = td[:num_copied]
+            num_filled += num_copied
+        print("ACTUAL SAMPLES R OF LENGTH:", num_filled)
         
-        # convert the data to volts
+        # convert the data to volts (in place)
         n_bits_ADC = 12
         max_voltage = 0.62 #0.625 # go back to the datasheet and check this voltage swing
         voltage_swing = 2*max_voltage
         n_voltage_steps = 2**(n_bits_ADC)
         volts_per_bit = voltage_swing/(n_voltage_steps-1)
-        data_volts = td*volts_per_bit/np.sqrt(10**(self.sdr.rx_hardwaregain_chan0/10))
+        data_volts *= volts_per_bit/np.sqrt(10**(self.sdr.rx_hardwaregain_chan0/10))
 
         # TODO: make wrapper to retry filling the buffer
         
-        # Return a dummy array
         return data_volts
 
+    """ Wait until short probe captures agree on DC offset and power """
+    def wait_until_ready(self, timeout):
+        return wait_for_stable_probe(lambda n: self.take_iq_samples(n, 0), timeout)
+
     """ Round the frequency according to SDR resolution 
     used in error checking for setting frequency
     """
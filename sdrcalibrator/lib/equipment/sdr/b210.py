@@ -1,8 +1,13 @@
 # from gnuradio import analog, blocks, gr, uhd
 from gnuradio import uhd
 import numpy as np
+import time
+
+from sdrcalibrator.lib.equipment.sdr.uhd_rx_stream import RX_Streamer
+from sdrcalibrator.lib.equipment.sdr.uhd_tuning import tune_and_wait_for_lock
 
 from sdrcalibrator.lib.equipment.sdr.sdr_error import SDR_Error
+from sdrcalibrator.lib.equipment.sdr.sdr_settling import wait_for_stable_probe
 
 
 class SDR(object):
@@ -21,10 +26,26 @@ class SDR(object):
     SDR_DEFAULT_POWER_LIMIT = -15
     SDR_DEFAULT_POWER_SCALE_FACTOR = None
     SDR_DEFAULT_POWER_SCALE_FACTOR_FILE = False
+    SDR_DEFAULT_CONTINUOUS_STREAMING = False
+    SDR_DEFAULT_STREAM_BUFFER_SIZE = 2**23 # samples
+    SDR_DEFAULT_TRACK_LO_LOCK = False
+    SDR_DEFAULT_LIVE_CLOCK_CHANGE = True
+
+    # Internal constants
+    DRIVER_CONNECT_PARAMS = ['continuous_streaming', 'stream_buffer_size', 'live_clock_change', 'track_lo_lock'] # Not device search criteria
+    STREAM_READ_TIMEOUT_MARGIN = 1.0 # seconds
+    LO_LOCK_TIMEOUT = 1.0 # seconds
+    LO_LOCK_POLL_INTERVAL = 0.001 # seconds
 
     def __init__(self):
         self.dsp_freq = 0
         self.f0_tuning_threshold = self.SDR_DEFAULT_F0_TUNING_ERROR_THRESHOLD
+        self.streamer = None
+        self.valid_data_time = None # Device time the LO locked after the last tracked retune
+        self.valid_data_index = None # Stream sample index at valid_data_time
+        self.last_acquisition_index = None # Stream sample index of the last streamed acquisition
+        self.clock_switch_latencies = [] # Seconds per clock change on the live device
+        self.reconnect_latencies = [] # Seconds per clock change by reconnecting
 
     def connect(self, connect_params):
         # Save the connection parameters
@@ -37,9 +58,31 @@ class SDR(object):
         #for k, v in connect_params:
         #    search_criteria[k] = v
         for k in connect_params.keys():
+            if k in self.DRIVER_CONNECT_PARAMS:
+                continue
             search_criteria[k] = connect_params[k]
         found_devices = list(uhd.find_devices(search_criteria))
 
+        # Save the streaming options
+        try: # Keep one RX stream open between captures
+            self.continuous_streaming = connect_params['continuous_streaming']
+        except KeyError:
+            self.continuous_streaming = self.SDR_DEFAULT_CONTINUOUS_STREAMING
+        try: # Number of most recent samples kept by the streamer
+            self.stream_buffer_size = connect_params['stream_buffer_size']
+        except KeyError:
+            self.stream_buffer_size = self.SDR_DEFAULT_STREAM_BUFFER_SIZE
+        try: # Wait for LO lock after each retune and count settling from it (needs the timestamped stream)
+            self.track_lo_lock = connect_params['track_lo_lock']
+        except KeyError:
+            self.track_lo_lock = self.SDR_DEFAULT_TRACK_LO_LOCK
+        if self.track_lo_lock:
+            self.continuous_streaming = True
+        try: # Change the master clock without re-creating the device when possible
+            self.live_clock_change = connect_params['live_clock_change']
+        except KeyError:
+            self.live_clock_change = self.SDR_DEFAULT_LIVE_CLOCK_CHANGE
+
         # Ensure only a single device was found
         if len(found_devices) < 1:
             raise SDR_Error(
@@ -88,8 +131,42 @@ class SDR(object):
 
     # Handle the clock and sampling frequencies
     def set_clock_frequency(self, clk_freq):
-        #self.clk_freq = clk_freq
-        #return
+        # Nothing to do if the master clock is already there
+        actual_clk_freq = self.get_clock_frequency()
+        if self.frequency_round(clk_freq) == self.frequency_round(actual_clk_freq):
+            self.clk_freq = clk_freq
+            return actual_clk_freq
+
+        # Try changing the clock on the live device first
+        if self.live_clock_change:
+            actual_clk_freq = self.switch_clock_frequency(clk_freq)
+            if actual_clk_freq is not None:
+                return actual_clk_freq
+        return self.reconnect_with_clock_frequency(clk_freq)
+
+    # Change the master clock on the live device, returning None if UHD did not accept it
+    def switch_clock_frequency(self, clk_freq):
+        start_time = time.time()
+        try:
+            previous_freq = self.current_tuned_frequency()
+            self.stop_streaming()
+            self.usrp.set_clock_rate(clk_freq)
+            actual_clk_freq = self.get_clock_frequency()
+            if not self.frequency_round(clk_freq) == self.frequency_round(actual_clk_freq):
+                return None
+            self.clk_freq = clk_freq
+
+            # The DSP tuning depends on the clock, so retune (the gain is kept)
+            self.tune_to_frequency(previous_freq)
+        except Exception as e:
+            print("Failed to change the clock on the live device ({}). Reconnecting...".format(e))
+            return None
+        self.clock_switch_latencies.append(time.time()-start_time)
+        return actual_clk_freq
+
+    # Change the master clock by re-creating the device
+    def reconnect_with_clock_frequency(self, clk_freq):
+        start_time = time.time()
         # Save operating point for refresh the driver
         set_tries = 5
         for i in range(set_tries+1):
@@ -102,6 +179,7 @@ class SDR(object):
                 self.dsp_lo_shift = self.current_dsp_frequency()
 
                 # Delete and refresh the driver
+                self.stop_streaming()
                 del self.usrp
                 if not self.connect(self.connect_params):
                     raise RuntimeError
@@ -125,6 +203,7 @@ class SDR(object):
                 self.set_gain(previous_gain)
                 self.tune_to_frequency(previous_freq)
                 
+                self.reconnect_latencies.append(time.time()-start_time)
                 return actual_clk_freq
             except RuntimeError:
                 raise RuntimeError
@@ -135,6 +214,13 @@ class SDR(object):
     def get_clock_frequency(self):
         return self.usrp.get_clock_rate()
 
+    # Measured clock change latencies in seconds (live switches and reconnects)
+    def get_clock_change_latencies(self):
+        return {
+            'clock_switch': list(self.clock_switch_latencies),
+            'reconnect': list(self.reconnect_latencies)
+        }
+
     def set_sampling_frequency(self, samp_freq):
         self.usrp.set_samp_rate(samp_freq)
         self.samp_freq = samp_freq
@@ -213,7 +299,10 @@ class SDR(object):
 
         # Create and send the tune request
         tune_request = uhd.tune_request(self.f0, self.dsp_lo_shift)
-        tune_result = self.usrp.set_center_freq(tune_request)
+        if self.track_lo_lock:
+            tune_result = self.tracked_tune(tune_request)
+        else:
+            tune_result = self.usrp.set_center_freq(tune_request)
 
         # Extract the LO and DSP frequencies
         try:
@@ -261,6 +350,28 @@ class SDR(object):
         # Return the center frequency
         return self.f0
 
+    # Retune, wait for the LO to lock and mark where valid data begins in the stream
+    # Valid data begins at a device time, mapped to a stream index through the rx_time tags
+    def tracked_tune(self, tune_request):
+        self.start_streaming()
+        tune_result, self.valid_data_time = tune_and_wait_for_lock(
+                self.usrp,
+                tune_request,
+                self.f0,
+                self.LO_LOCK_TIMEOUT,
+                self.LO_LOCK_POLL_INTERVAL
+            )
+        self.valid_data_index = self.streamer.get_index_at(self.valid_data_time)
+        return tune_result
+
+    # Stream sample index where valid data begins after the last tracked retune
+    def get_valid_data_index(self):
+        return self.valid_data_index
+
+    # Stream sample index of the first sample of the last streamed acquisition
+    def get_last_acquisition_index(self):
+        return self.last_acquisition_index
+
     def current_tuned_frequency(self):
         return self.usrp.get_center_freq()
     
@@ -274,13 +385,52 @@ class SDR(object):
     def set_dsp_lo_shift(self, dsp_lo_shift):
         self.dsp_lo_shift = dsp_lo_shift
 
+    # Handle the continuous RX stream
+    def start_streaming(self):
+        if self.streamer is None:
+            self.streamer = RX_Streamer(self.usrp, self.stream_buffer_size)
+
+    def stop_streaming(self):
+        if self.streamer is not None:
+            self.streamer.stop()
+            self.streamer = None
+
+    # Current device time, the reference for take_iq_samples_after
+    def get_time_now(self):
+        return self.usrp.get_time_now().get_real_secs()
+
+    # Return the next n samples whose device timestamps are at or after t (default now)
+    def take_iq_samples_after(self, n, t=None, timeout=None, out=None):
+        if n > self.stream_buffer_size:
+            raise SDR_Error(
+                    31,
+                    "Requested more samples than the stream buffer holds",
+                    (
+                        "Requested samples: {}\r\n" +
+                        "Stream buffer size: {}"
+                    ).format(n, self.stream_buffer_size)
+                )
+        self.start_streaming()
+        if t is None:
+            t = self.get_time_now()
+        if timeout is None:
+            timeout = max(0, t-self.get_time_now()) + float(n)/self.streamer.get_sample_rate()
+            timeout += self.STREAM_READ_TIMEOUT_MARGIN
+        return self.streamer.take_samples_after(n, t, timeout, out)
+
     # Handle taking IQ samples
-    def take_iq_samples(self, n, n_skip, retries = 5):
+    # The conditioning samples stay in the same acquisition so the data follows them continuously,
+    # and only the tail is kept (copied into out if given). finite_acquisition still returns all
+    # n+n_skip samples, so peak memory is only O(n) with continuous_streaming
+    def take_iq_samples(self, n, n_skip, retries = 5, out=None):
+        if self.continuous_streaming:
+            return self.take_streamed_iq_samples(n, n_skip, retries, out=out)
         o_retries = retries
+        data = np.empty(n, dtype=np.complex64) if out is None else out
         while True:
             samples = self.usrp.finite_acquisition(n+n_skip)
-            data = np.array(samples[n_skip:])
-            if not len(data) == n:
+            num_kept = len(samples)-n_skip
+            if not num_kept == n:
                 if retries > 0:
                     retries = retries - 1
                 else:
@@ -292,18 +442,60 @@ class SDR(object):
                             "Actual IQ data length: {}".format(
                                 o_retries,
                                 n,
-                                len(data)
+                                num_kept
                             )
                         )
             else:
+                data[:] = samples[n_skip:]
                 return data
 
+    # Slice the samples from the open stream, skipping n_skip samples of settling time
+    def take_streamed_iq_samples(self, n, n_skip, retries = 5, out=None):
+        o_retries = retries
+        while True:
+            t = self.get_time_now() + float(n_skip)/self.get_sampling_frequency()
+            if self.track_lo_lock and self.valid_data_time is not None:
+                # The settling time is counted from the LO lock rather than from now
+                t = max(
+                        self.valid_data_time + float(n_skip)/self.get_sampling_frequency(),
+                        self.get_time_now()
+                    )
+            data = self.take_iq_samples_after(n, t, out=out)
+            if data is None:
+                if retries > 0:
+                    retries = retries - 1
+                else:
+                    raise SDR_Error(
+                            30,
+                            "Failed to acquire IQ samples",
+                            (
+                                "Streamed acquisition failed {} times in a row...\r\n" +
+                                "Samples were not received in time or were overwritten"
+                            ).format(o_retries)
+                        )
+            else:
+                self.last_acquisition_index = self.streamer.get_last_read_index()
+                return data
+
+    # Wait until the LO reports lock and short probe captures agree on DC offset and power
+    def wait_until_ready(self, timeout):
+        deadline = time.time() + timeout
+        while not self.usrp.get_sensor('lo_locked').to_bool():
+            if time.time() > deadline:
+                return False
+            time.sleep(self.LO_LOCK_POLL_INTERVAL)
+        return wait_for_stable_probe(
+                lambda n: self.take_iq_samples(n, 0),
+                max(0, deadline-time.time())
+            )
+
     # Handle rounding frequencies to reasonable values
     def frequency_round(self, f):
         return int(1e0 * round(f/1e0)) # Round to nearest Hz
 
     # Handle the powering down of the SDR
     def power_down(self):
+        self.stop_streaming()
         return
 
     # Ensure the device is powered down on deletion
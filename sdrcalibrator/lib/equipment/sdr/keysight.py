@@ -1,4 +1,5 @@
 import numpy as np
+import ctypes
 import time
 try:
     from sallinuxwrap import SALLinux
@@ -6,6 +7,7 @@ except ImportError:
     raise ImportError
 
 from sdrcalibrator.lib.equipment.sdr.sdr_error import SDR_Error
+from sdrcalibrator.lib.equipment.sdr.sdr_settling import wait_for_stable_probe
 
 
 class SDR(object):
@@ -33,6 +35,10 @@ class SDR(object):
     MAX_ATTENUATION = 40 # 62 with Surveyor 4D
     MIN_ATTENUATION = 0
     MIN_MEASUREMENT_WAIT_TIME = 0.3
+    POLL_INITIAL_INTERVAL = 0.001 # Poll interval while waiting for time data blocks (s)
+    POLL_BACKOFF_FACTOR = 2
+    POLL_MAX_INTERVAL = 0.05
+    MEASUREMENT_TIMEOUT_MARGIN = 2.0 # Added to twice the capture duration (s)
 
     points_measured = 0
 
@@ -74,6 +80,11 @@ class SDR(object):
             ret = SALLinux.salGetTuner(sensor, tuner)
             assert ret == SALLinux.SAL_ERR_NONE
             self.tuner = tuner
+            self.tuner_changes_pending = False
+            self.tuner_parameters_set = 0
+            self.tuner_parameters_read = 0
+            self.sampling_frequency = tuner.sampleRate
+            self.update_tuner_parameters(tuner)
 
             # Pull the serial number for the sensor
             serial_number_max_length = 50
@@ -101,13 +112,23 @@ class SDR(object):
     def get_serial_number(self):
         return self.serial_number
     
-    def update_tuner_parameters(self):
+    # The driver keeps a local copy of the tuner state which is authoritative between sets:
+    # the getters read the cached values and the sensor is only read back after a set
+    # (or an explicit refresh). Gain and sample rate changes are staged and sent to the
+    # sensor with the next tune (or anything that needs the tuner), so a point costs a
+    # single salSetTuner/salGetTuner pair.
+
+    # Read the tuner parameters back from the sensor (unless just read into current_tuner)
+    def update_tuner_parameters(self, current_tuner=None):
         # Get the current tuner for the sensor to retrieve parameters
-        current_tuner = SALLinux.salTunerParms()
-        SALLinux.salGetTuner(self.keysight_sensor, current_tuner)
+        if current_tuner is None:
+            current_tuner = SALLinux.salTunerParms()
+            SALLinux.salGetTuner(self.keysight_sensor, current_tuner)
+            self.tuner_parameters_read += 1 # Sensor round-trip counters (reads and sets)
 
         # Update the internal parameters
-        self.sampling_frequency = current_tuner.sampleRate
+        if current_tuner.sampleRate > 0:
+            self.sampling_frequency = current_tuner.sampleRate
         self.f0 = current_tuner.centerFrequency
         self.attenuation = current_tuner.attenuation        # This is mapped to gain
         self.gain = self.attenuation_to_gain(self.attenuation)
@@ -116,38 +137,49 @@ class SDR(object):
         self.preamp_enabled = current_tuner.preamp          # This is currently unused/default only
         self.sdram_writing = current_tuner.sdramWriting     # This is currently unused/default only
 
-    def set_sampling_frequency(self, samp_freq):
-        # Intify the sample rate (don't need sub-Hz resolution on this)
-        samp_freq = int(samp_freq)
-        print(samp_freq)
+    # Re-read the tuner state from the sensor (e.g. if something else changed it)
+    def refresh(self):
+        self.apply_tuner_changes()
+        self.update_tuner_parameters()
 
-        # Update the tuner to update the sensor
-        self.tuner.sampleRate = samp_freq
+    # Send any staged tuner changes to the sensor in one set and read the result back
+    def apply_tuner_changes(self):
+        if not self.tuner_changes_pending:
+            return
         ret = SALLinux.salSetTuner(self.keysight_sensor, self.tuner)
+        self.tuner_parameters_set += 1
 
         # Make sure there wasn't an error in updating the sensor
         assert ret == SALLinux.SAL_ERR_NONE
-
+        self.tuner_changes_pending = False
         self.update_tuner_parameters()
-        print(self.sampling_frequency)
-        
-        # Check back with the sensor to make sure that the sample frequency was set properly and return it
-        return self.get_sampling_frequency()
+
+    # Returns the sample rate the sensor accepted if verify is set (sending the staged changes now),
+    # otherwise None since nothing has been applied yet
+    def set_sampling_frequency(self, samp_freq, verify=False):
+        # Intify the sample rate (don't need sub-Hz resolution on this)
+        samp_freq = int(samp_freq)
+
+        # Stage the change (sent with the next tune or read)
+        if samp_freq != self.tuner.sampleRate:
+            self.tuner.sampleRate = samp_freq
+            self.tuner_changes_pending = True
+        if verify:
+            return self.get_sampling_frequency()
+        return None
 
     def get_sampling_frequency(self):
-        backup_sampling_frequency = self.sampling_frequency
-        self.update_tuner_parameters() # Retrieves all tuner parameters from the sensor
-        #print(self.sampling_frequency)
-        if self.sampling_frequency > 0:
-            return self.sampling_frequency
-        return backup_sampling_frequency
+        self.apply_tuner_changes()
+        return self.sampling_frequency
     
     def gain_to_attenuation(self, gain):
         return int(self.MAX_ATTENUATION-gain)
     def attenuation_to_gain(self, attenuation):
         return int(self.MAX_ATTENUATION-attenuation)
 
-    def set_gain(self, gain):
+    # Returns the gain the sensor accepted if verify is set (sending the staged changes now),
+    # otherwise None since nothing has been applied yet
+    def set_gain(self, gain, verify=False):
         # Intify the gain and convert to attenuation
         gain = int(gain)
         attenuation = self.gain_to_attenuation(gain)
@@ -160,56 +192,52 @@ class SDR(object):
             attenuation = self.MIN_ATTENUATION
         """
 
-        # Update the tuner to update the sensor
-        self.tuner.attenuation = attenuation
-        ret = SALLinux.salSetTuner(self.keysight_sensor, self.tuner)
-
-        self.update_tuner_parameters()
-        print(self.gain)
-
-        # Make sure there wasn't an error in updating the sensor
-        assert ret == SALLinux.SAL_ERR_NONE
-        
-        # Check back with the sensor to make sure that the sample frequency was set properly and return it
-        return self.get_gain()
+        # Stage the change (sent with the next tune or read)
+        if attenuation != self.tuner.attenuation:
+            self.tuner.attenuation = attenuation
+            self.tuner_changes_pending = True
+        if verify:
+            return self.get_gain()
+        return None
 
     def get_gain(self):
-        self.update_tuner_parameters() # Retrieves all tuner parameters from the sensor
+        self.apply_tuner_changes()
         return self.gain
     
     def get_attenuation(self):
-        self.update_tuner_parameters() # Retrieves all tuner parameters from the sensor
+        self.apply_tuner_changes()
         return self.attenuation
 
-    # Handle tuning the LO
+    # Handle tuning the LO (also sends any staged gain/sample rate changes)
     def tune_to_frequency(self, f):
         # Round the f0 to avoid errors when sweeping frequencies
         new_f0 = int(self.frequency_round(f))
 
         # Update the tuner to update the sensor
-        self.tuner.centerFrequency = new_f0
-        ret = SALLinux.salSetTuner(self.keysight_sensor, self.tuner)
-
-        # Make sure there wasn't an error in updating the sensor
-        assert ret == SALLinux.SAL_ERR_NONE
+        if new_f0 != self.tuner.centerFrequency:
+            self.tuner.centerFrequency = new_f0
+            self.tuner_changes_pending = True
+        self.apply_tuner_changes()
         
-        # Check back with the sensor to make sure that the sample frequency was set properly and return it
-        return self.current_tuned_frequency()
+        # Return the frequency the sensor reported back
+        return self.f0
 
     def current_tuned_frequency(self):
-        self.update_tuner_parameters() # Retrieves all tuner parameters from the sensor
+        self.apply_tuner_changes()
         return self.f0
     
     def current_lo_frequency(self):
-        self.update_tuner_parameters() # Retrieves all tuner parameters from the sensor
+        self.apply_tuner_changes()
         return self.f0
     
     def current_dsp_frequency(self):
-        self.update_tuner_parameters() # Retrieves all tuner parameters from the sensor
         return 0 # No DSP on this SDR
 
     # Handle taking IQ samples
-    def take_iq_samples(self, n, n_skip, retries = 5):
+    # The optional power scale factor (dB) is folded into the volts conversion
+    def take_iq_samples(self, n, n_skip, retries = 5, power_scale_factor = 0, out=None):
+        # Make sure the measurement uses the staged tuner settings
+        self.apply_tuner_changes()
         o_retries = retries
         while True:
             # Calculate the sample block size and expected number of blocks
@@ -219,11 +247,12 @@ class SDR(object):
                 block_size = self.MAX_SAMPLES_PER_BLOCK
             expected_num_blocks = int(np.ceil(n/block_size))
 
-            # Calculate the approximate wait time (and add a buffer)
+            # Calculate the approximate capture time (and add a buffer) to time out the measurement
             wait_time = float(n)/self.sampling_frequency
             wait_time *= 2
             if wait_time < self.MIN_MEASUREMENT_WAIT_TIME:
                 wait_time = self.MIN_MEASUREMENT_WAIT_TIME
+            deadline = time.time() + wait_time + self.MEASUREMENT_TIMEOUT_MARGIN
 
             # Create the time acquisition parameters object using the currently tuned parameters
             timedata_parms = SALLinux.salTimeDataParms3()
@@ -239,8 +268,7 @@ class SDR(object):
             assert ret == SALLinux.SAL_ERR_NONE
             self.measurement = measure_handle.value()
 
-            # Allow measurement to proceed and results to be processed
-            time.sleep(wait_time) # Possibly change to polling stateEventIndicator in data header, but this is fine for now
+            # Blocks are polled for below as the measurement proceeds
             # Use the following if we are doing a continuous measurement (i.e. setting numSamples = 0)
             #ret = SALLinux.salSendTimeDataCommand(self.measurement, SALLinux.salTimeDataCmd_abort)  # Do we need this one?
             #assert ret == SALLinux.SAL_ERR_NONE
@@ -274,15 +302,23 @@ class SDR(object):
             iq_data_points = block_size * 2 # individual I or Q points
             iq_data_bytes = iq_data_points * 2 # 2 bytes per data point
             iq_data = SALLinux.shortArray(iq_data_points) # Transfer buffer
-            i_wav = [] # Full python array for data
-            q_wav = [] # Full python array for data
+            iq_data_view = np.ctypeslib.as_array(
+                (ctypes.c_int16*iq_data_points).from_address(int(iq_data.cast()))
+            ) # Numpy view of the transfer buffer (no copy)
+            iq_wav = np.empty(2*n, dtype=np.int16) # Interleaved IQ for the full request
+            num_samples = 0 # Number of samples copied into iq_wav
             sal_scale_factor = 0
             self.last_sal_scale_factor = 0
 
             # Keep grabbing data until the end is reached
             retrieval_count = 0 # Number of retrieval attempts
             retrieved_blocks = 0 # Number of blocks successfully retrieved
+            poll_interval = self.POLL_INITIAL_INTERVAL
             while True:
+                # Give up on the measurement if the data never shows up
+                if time.time() > deadline:
+                    break # Just break out of the loop, error handling will happen later
+
                 retrieval_count += 1 # Increment the retrieval attempt counter
 
                 # Use count to prevent endless retrieval failures
@@ -298,6 +334,14 @@ class SDR(object):
                 # Try and grab the next block
                 ret = SALLinux.salGetTimeData(self.measurement, data_header, iq_data, iq_data_bytes)
 
+                # If the next block is not ready yet, wait a little longer each time and poll again
+                if ret == SALLinux.SAL_ERR_NO_DATA_AVAILABLE:
+                    retrieval_count -= 1 # Waiting is not a failed retrieval
+                    time.sleep(min(poll_interval, max(0, deadline-time.time())))
+                    poll_interval = min(poll_interval*self.POLL_BACKOFF_FACTOR, self.POLL_MAX_INTERVAL)
+                    continue
+                poll_interval = self.POLL_INITIAL_INTERVAL
+
                 # If there was an error, try again (retrieval count will prevent endless attempts)
                 if not ret == SALLinux.SAL_ERR_NONE:
                     print(str(ret))
@@ -305,10 +349,10 @@ class SDR(object):
 
                 # Check if there is data in the retrieved block
                 if data_header.numSamples > 0:
-                    # Pull out the data
-                    for i in range(data_header.numSamples):
-                        i_wav.append(iq_data[i*2])
-                        q_wav.append(iq_data[i*2+1])
+                    # Copy the block into the full buffer
+                    block_samples = min(data_header.numSamples, n-num_samples)
+                    iq_wav[2*num_samples:2*(num_samples+block_samples)] = iq_data_view[:2*block_samples]
+                    num_samples += block_samples
 
                     # Save the scale factor for later
                     sal_scale_factor = data_header.scaleToVolts
@@ -334,9 +378,13 @@ class SDR(object):
             # Check to make sure data was retrieved
             assert retrieved_blocks > 0
 
-            # Combine data into an IQ waveform and scale
-            full_iq = np.asarray(i_wav) + 1j*np.asarray(q_wav)
-            full_iq *= sal_scale_factor
+            # Convert to complex once and scale to volts (and power scale factor) in place
+            if out is not None and num_samples >= n:
+                full_iq = out
+                full_iq.view(out.real.dtype)[:] = iq_wav
+            else:
+                full_iq = iq_wav[:2*num_samples].astype(np.float32).view(np.complex64)
+            full_iq *= sal_scale_factor*10**(power_scale_factor/20.0)
 
             # Check to make sure enough data was retrieved
             if len(full_iq) < n:
@@ -347,20 +395,30 @@ class SDR(object):
                     continue
                 else:
                     # Dummy array to not kill compression...
-                    full_iq = np.zeros(n, dtype=np.complex) + 1e-6
+                    full_iq = np.zeros(n, dtype=np.complex64) + 1e-6
+                    if out is not None:
+                        out[:] = full_iq
+                        full_iq = out
                     #assert False
             
             self.points_measured += 1
             print("    Points measured: {}".format(self.points_measured))
 
             # Return the data (ensuring we only return what we need)
-            print(type(full_iq))
-            print(type(full_iq[0]))
             return full_iq[:n]
     
     def get_last_scale_factor(self):
         return self.last_sal_scale_factor
 
+    # Apply any staged tuner changes, then wait until short probe captures agree
+    def wait_until_ready(self, timeout):
+        deadline = time.time() + timeout
+        self.apply_tuner_changes()
+        return wait_for_stable_probe(
+                lambda n: self.take_iq_samples(n, 0),
+                max(0, deadline-time.time())
+            )
+
     # Handle rounding frequencies to reasonable values
     def frequency_round(self, f):
         return int(1e0 * round(f/1e0)) # Round to nearest Hz
@@ -267,7 +267,7 @@ class SDR(object):
 
     """
     # USER MODIFY - Should return 2D time-domain array of I data and Q data
-    def take_iq_samples(self, n, n_skip, retries = 5, err=False):
+    def take_iq_samples(self, n, n_skip, retries = 5, err=False, out=None):
         # Raise error if requested
         if err:
             ehead = "Failed to acquire IQ samples"
@@ -288,10 +288,18 @@ class SDR(object):
         # IFFT it back to the time domain
         td = np.fft.ifft(np.fft.ifftshift(fft))
 
+        # Fill the caller's buffer if one was given
+        if out is not None:
+            out[:] = td
+            return out
         
         # Return a dummy array
         return td
 
+    """ The mock SDR settles instantly """
+    def wait_until_ready(self, timeout):
+        return True
+
     """ Round the frequency according to SDR resolution 
     used in error checking for setting frequency
     """
@@ -3,6 +3,8 @@ import numpy as np
 import vxi11, time, math
 
 from sdrcalibrator.lib.equipment.sdr.sdr_error import SDR_Error
+import sdrcalibrator.lib.equipment.sdr.scpi_block as scpi_block
+from sdrcalibrator.lib.utils.scpi_set_policy import SCPI_Set_Policy
 
 
 class SDR(object):
@@ -29,9 +31,19 @@ class SDR(object):
     SDR_DEFAULT_MIN_ATTENUATION = 6
     SDR_DEFAULT_MAX_ATTENUATION = 70
     SDR_DEFAULT_PERFORM_CALIBRATIONS_DURING_RUN = False
+    SDR_DEFAULT_BINARY_TRANSFER = True
+    SDR_DEFAULT_TRANSFER_CHUNK_SIZE = 1048576 # bytes
+    SDR_DEFAULT_VERIFICATION_POLICY = 'always' # 'always', 'on-change' or 'sampled'
+    SDR_DEFAULT_VERIFICATION_SAMPLE_INTERVAL = 10 # Sets per readback when sampled
+
+    # Internal constants
+    ESR_OPERATION_COMPLETE = 0x01
+    ESR_COMMAND_ERRORS = 0x3C # Query, device dependent, execution and command errors
+    COMPLETION_POLL_INTERVAL = 0.001 # seconds
 
     def __init__(self):
         self.alive = False
+        self.set_policy = SCPI_Set_Policy()
 
     def connect(self, connect_params):
         # Save the connection variables
@@ -97,7 +109,35 @@ class SDR(object):
             self.max_attenuation = connect_params['max_attenuation']
         except KeyError:
             self.max_attenuation = self.SDR_DEFAULT_MAX_ATTENUATION
+        try: # Transfer IQ data as binary blocks instead of ASCII
+            self.binary_transfer = connect_params['binary_transfer']
+        except KeyError:
+            self.binary_transfer = self.SDR_DEFAULT_BINARY_TRANSFER
+        try: # Size of each read when pulling a binary block
+            self.transfer_chunk_size = connect_params['transfer_chunk_size']
+        except KeyError:
+            self.transfer_chunk_size = self.SDR_DEFAULT_TRANSFER_CHUNK_SIZE
+        try: # When parameter sets are read back
+            verification_policy = connect_params['verification_policy']
+        except KeyError:
+            verification_policy = self.SDR_DEFAULT_VERIFICATION_POLICY
+        try: # Sets per readback with the sampled verification policy
+            verification_sample_interval = connect_params['verification_sample_interval']
+        except KeyError:
+            verification_sample_interval = self.SDR_DEFAULT_VERIFICATION_SAMPLE_INTERVAL
+        if verification_policy not in SCPI_Set_Policy.POLICIES:
+            raise SDR_Error(
+                    0,
+                    "Unknown verification policy",
+                    (
+                        "Verification policy \"{}\" is not one of {}"
+                    ).format(verification_policy, SCPI_Set_Policy.POLICIES)
+                )
+        self.set_policy = SCPI_Set_Policy(verification_policy, verification_sample_interval)
         self.sdr.timeout = self.command_timeout
+
+        # Clear the event status so completion polling starts fresh
+        self.sdr.write('*CLS')
         
         # Reset the system to its preset state
         self.preset()
@@ -125,6 +165,7 @@ class SDR(object):
         self.wait_for_completion()
         self.sdr.write(':CONF:WAV:NDEF')
         self.wait_for_completion()
+        self.set_policy.invalidate()
 
         # Turn off averaging
         self.set_and_check_parameter(':SENS:WAV:AVER:STAT', "OFF", vartype="str", param_val="0")
@@ -135,11 +176,15 @@ class SDR(object):
         # Set IQ range to auto
         #self.set_and_check_parameter(':SELS:VOLT:IQ:RANG:AUTO', "ON")
 
-        # Set endianness of output data
-        self.set_and_check_parameter(':FORM:BORD', "NORM")
-
-        # Set format of output data
-        #self.set_and_check_parameter(':FORM', "REAL:32")
+        # Set endianness and format of output data
+        # Binary blocks are little endian so they can be viewed directly as complex64
+        if self.binary_transfer:
+            self.set_and_check_parameter(':FORM:BORD', "SWAP")
+            self.set_and_check_parameter(':FORM', "REAL,32")
+        else:
+            self.set_and_check_parameter(':FORM:BORD', "NORM")
+            self.sdr.write(':FORM ASC')
+            self.wait_for_completion()
 
         # Set the filter
         #self.set_and_check_parameter(':SENS:WAV:DIF:FILT:TYPE', "FLAT")
@@ -212,7 +257,7 @@ class SDR(object):
         return 0 # No DSP on this SDR
 
     # Handle taking IQ samples
-    def take_iq_samples(self, n, n_skip, retries = 5):
+    def take_iq_samples(self, n, n_skip, retries = 5, out=None):
         # Calculate and set the measurement time based on the sample rate
         time_buffer = 1.2
         time = (float(n+n_skip)/self.get_sampling_frequency())*time_buffer
@@ -222,37 +267,62 @@ class SDR(object):
         self.sdr.write(":INIT:WAV")
         self.wait_for_completion()
 
-        # Calculate the timeout time (emperical)
-        read_timeout = int(1.1*(n+n_skip)/14000)+1
-
         # Fetch the data from the buffer
-        samples_str = self.long_ask(":FETC:WAV0?", timeout=read_timeout)
+        if self.binary_transfer:
+            # Little endian to match :FORM:BORD SWAP, read in chunks so no long timeout is needed
+            self.sdr.write(":FETC:WAV0?")
+            samples = self.read_definite_length_block(dtype='<c8')
+        else:
+            # Calculate the timeout time (emperical)
+            read_timeout = int(1.1*(n+n_skip)/14000)+1
+            samples_str = self.long_ask(":FETC:WAV0?", timeout=read_timeout)
+            samples = np.asarray(samples_str.split(','), dtype=float).view(complex)
+        self.wait_for_completion()
 
-        # Fetch data statistics to get sample rate
-        data_statistics_str = self.sdr.ask(":FETC:WAV1?")
-        data_statistics_str_arr = data_statistics_str.split(',')
-        sample_time = float(data_statistics_str_arr[0])
+        # Fetch data statistics to get sample rate (also a binary block when binary transfer is on)
+        if self.binary_transfer:
+            self.sdr.write(":FETC:WAV1?")
+            sample_time = float(self.read_definite_length_block(dtype='<f4')[0])
+        else:
+            data_statistics_str = self.sdr.ask(":FETC:WAV1?")
+            data_statistics_str_arr = data_statistics_str.split(',')
+            sample_time = float(data_statistics_str_arr[0])
         self.samp_freq = 1/sample_time
 
-        # Convert data string to complex IQ
-        samples_str_arr = samples_str.split(',')
-        for i in range(len(samples_str_arr)):
-            samples_str_arr[i] = float(samples_str_arr[i])
-        samples = np.zeros(len(samples_str_arr)//2, dtype=complex)
-        for i in range(len(samples)):
-            samples[i] = np.complex(
-                samples_str_arr[2*i],
-                samples_str_arr[2*i+1]
-            )
-        
         # Remove unwanted samples and return data
         data = samples[n_skip:n_skip+n]
+        if not len(data) == n:
+            raise SDR_Error(
+                    30,
+                    "Failed to acquire IQ samples",
+                    (
+                        "Expected IQ data length: {}\r\n" +
+                        "Actual IQ data length: {}"
+                    ).format(n, len(data))
+                )
+        if out is not None:
+            out[:] = data
+            return out
         return data
 
+    # Wait for the analyzer to report all pending operations complete
+    def wait_until_ready(self, timeout, delay_time=0.01):
+        deadline = time.time() + timeout
+        while not self.sdr.ask('*OPC?').strip() == '1':
+            if time.time() > deadline:
+                return False
+            time.sleep(delay_time)
+        return True
+
     # Handle rounding frequencies to reasonable values
     def frequency_round(self, f):
         return int(1e0 * round(f/1e0)) # Round to nearest Hz
     
+    # Read an IEEE 488.2 definite length block ("#<n><length><data>") in chunks
+    # Each chunk completes within the command timeout, so no long timeout is needed
+    def read_definite_length_block(self, dtype=np.uint8):
+        return scpi_block.read_definite_length_block(self.sdr, self.SDR_NAME, dtype, self.transfer_chunk_size)
+
     # Handle long execution times for requests
     def long_ask(self, ask_string, timeout=60):
         self.sdr.timeout = timeout
@@ -289,8 +359,54 @@ class SDR(object):
         # Return the attenuation
         return ideal_attenuation
     
+    # Write a command followed by *OPC and poll the event status register until it completes
+    # (two round-trips for most commands, instead of an *OPC? before and after)
+    # *CLS first, so error bits latched by earlier unpoliced commands are not blamed on this one
+    def write_and_wait(self, cmd, count_as=None):
+        if count_as is None:
+            count_as = cmd
+        self.sdr.write("*CLS;{};*OPC".format(cmd))
+        round_trips = 1
+        deadline = time.time() + self.command_timeout
+        try:
+            while True:
+                esr = int(self.sdr.ask('*ESR?'))
+                round_trips += 1
+                if esr & self.ESR_COMMAND_ERRORS:
+                    raise SDR_Error(
+                        0,
+                        "Command failed",
+                        (
+                            "{} reported an error:\r\n" +
+                            "    Command: \"{}\"\r\n" +
+                            "    Event status: {}"
+                        ).format(self.SDR_NAME,cmd,esr)
+                    )
+                if esr & self.ESR_OPERATION_COMPLETE:
+                    return
+                if time.time() > deadline:
+                    raise SDR_Error(
+                        0,
+                        "Command did not complete",
+                        (
+                            "{} did not complete within {}s:\r\n" +
+                            "    Command: \"{}\""
+                        ).format(self.SDR_NAME,self.command_timeout,cmd)
+                    )
+                time.sleep(self.COMPLETION_POLL_INTERVAL)
+        finally:
+            self.set_policy.count_round_trips(count_as, round_trips)
+
+    # Sets and round-trips spent per command
+    def get_round_trip_summary(self):
+        return self.set_policy.summary()
+
     # Set a parameter, then check that it was set properly
     def set_and_check_parameter(self, cmd, set_val, vartype='str', param_val=None, ask_cmd=None):
+        # Skip values already set and verified (on-change policy)
+        if self.set_policy.is_applied(cmd, set_val):
+            return
+
         # If no designated response is set, assume the same as set value
         if param_val is None:
             param_val = set_val
@@ -298,18 +414,17 @@ class SDR(object):
         # If no designated ask command is set, assume its "[cmd]?"
         if ask_cmd is None:
             ask_cmd = "{}?".format(cmd)
-        
-        # Wait for anything prior to finish
-        self.wait_for_completion()
 
-        # Set the parameter
-        cmd = "{} {}".format(cmd,set_val)
-        self.sdr.write(cmd)
-        self.wait_for_completion()
+        # Set the parameter and wait for it (and anything prior) to finish
+        set_cmd = "{} {}".format(cmd,set_val)
+        self.write_and_wait(set_cmd, count_as=cmd)
 
-        # Read the value back
+        # Only read the value back when the verification policy asks for it
+        if not self.set_policy.should_verify(cmd):
+            self.set_policy.record(cmd, set_val)
+            return
         actual_param_val = self.sdr.ask(ask_cmd)
-        self.wait_for_completion()
+        self.set_policy.count_round_trips(cmd)
 
         # Convert to int/float if necessary
         if vartype == "int":
@@ -329,10 +444,10 @@ class SDR(object):
                     "    Command: \"{}\"\r\n" +
                     "    Expected value: \"{}\"\r\n" +
                     "    Actual value:   \"{}\""
-                ).format(cmd,param_val,actual_param_val)
+                ).format(set_cmd,param_val,actual_param_val)
             )
         else:
-            pass
+            self.set_policy.record(cmd, set_val)
     
     # Perform calibration as needed
     def calibrate_as_needed(self, forced_calibration=False):
@@ -357,6 +472,8 @@ class SDR(object):
 
     # Return to preset
     def preset(self):
+        # The instrument state is no longer known
+        self.set_policy.invalidate()
         # Set the signal analyzer to preset
         #self.sdr.write('*RST')
         # Restore autoalignment
@@ -3,6 +3,7 @@ import numpy as np
 import time
 
 from sdrcalibrator.lib.equipment.sdr.sdr_error import SDR_Error
+from sdrcalibrator.lib.equipment.sdr.sdr_settling import wait_for_stable_probe
 
 
 class SDR(object):
@@ -181,7 +182,7 @@ class SDR(object):
         return 0
 
     # Handle taking IQ samples
-    def take_iq_samples(self, n, n_skip, retries = 5):
+    def take_iq_samples(self, n, n_skip, retries = 5, out=None):
         print(
             f"acquire_time_domain_samples starting num_samples = {n}"
         )
@@ -216,6 +217,9 @@ class SDR(object):
                         print(error_message)
                         raise RuntimeError(error_message)
                 data = result_data[n_skip : n + n_skip]
+                if out is not None:
+                    out[:] = data
+                    return out
 
                 return data
             except Exception as e:
@@ -229,6 +233,10 @@ class SDR(object):
                     print(error_message)
                     raise RuntimeError(error_message)
 
+    # Wait until short probe captures agree on DC offset and power
+    def wait_until_ready(self, timeout):
+        return wait_for_stable_probe(lambda n: self.take_iq_samples(n, 0), timeout)
+
     # Handle rounding frequencies to reasonable values
     def frequency_round(self, f):
         return int(1e0 * round(f/1e0)) # Round to nearest Hz
@@ -1,8 +1,11 @@
 from gnuradio import analog, blocks, gr, uhd
 import numpy as np
+import threading
+import time
 from rtlsdr import RtlSdr
 
 from sdrcalibrator.lib.equipment.sdr.sdr_error import SDR_Error
+from sdrcalibrator.lib.equipment.sdr.sdr_settling import wait_for_stable_probe
 
 """
 Supported gain values (29): 
@@ -30,9 +33,16 @@ class SDR(object):
     SDR_DEFAULT_POWER_LIMIT = -15
     SDR_DEFAULT_POWER_SCALE_FACTOR = None
     SDR_DEFAULT_POWER_SCALE_FACTOR_FILE = False
+    SDR_DEFAULT_ASYNC_READS = True
+    SDR_DEFAULT_RING_BUFFER_SIZE = 2**25 # bytes (2 bytes per sample)
+
+    # Internal constants
+    ASYNC_BLOCK_SIZE = 2**15 # bytes per async transfer (multiple of 512)
+    ASYNC_READ_TIMEOUT_MARGIN = 1.0 # seconds
 
     def __init__(self):
         self.alive = False
+        self.reader = None
 
     def connect(self, connect_params):
         # Eventually handle multiple devices, for now, just connect to the first
@@ -64,6 +74,16 @@ class SDR(object):
         # Set the tuning thresholds
         self.configure_f0_tuning_threshold(self.SDR_DEFAULT_F0_TUNING_ERROR_THRESHOLD)
         self.configure_gain_tuning_threshold(self.SDR_DEFAULT_GAIN_TUNING_THRESHOLD)
+
+        # Save the acquisition options
+        try: # Read samples continuously in the background
+            self.async_reads = connect_params['async_reads']
+        except KeyError:
+            self.async_reads = self.SDR_DEFAULT_ASYNC_READS
+        try: # Size of the raw byte ring buffer
+            self.ring_buffer_size = connect_params['ring_buffer_size']
+        except KeyError:
+            self.ring_buffer_size = self.SDR_DEFAULT_RING_BUFFER_SIZE
     
     # Return the serial number for this SDR
     def get_serial_number(self):
@@ -167,8 +187,122 @@ class SDR(object):
     def current_dsp_frequency(self):
         return 0 # No DSP on this SDR
 
-    # Handle taking IQ samples (8294400 seems to be the max)
-    def take_iq_samples(self, n, n_skip, retries = 5):
+    # Handle taking IQ samples
+    def take_iq_samples(self, n, n_skip, retries = 5, out=None):
+        if not self.async_reads:
+            return self.take_blocking_iq_samples(n, n_skip, retries, out=out)
+        if 2*n > self.ring_buffer_size:
+            raise SDR_Error(
+                    31,
+                    "Requested more samples than the ring buffer holds",
+                    (
+                        "Requested samples: {}\r\n" +
+                        "Ring buffer size: {} samples"
+                    ).format(n, self.ring_buffer_size//2)
+                )
+        o_retries = retries
+        self.start_reader()
+
+        # Skip the conditioning samples by advancing the read pointer past them
+        with self.ring_cond:
+            start = self.ring_written + 2*n_skip
+        while True:
+            # Wait for the retained window (a timeout only restarts the wait, not the read)
+            end = start + 2*n
+            timeout = float(end-self.ring_written)/2/self.get_sampling_frequency()
+            timeout += self.ASYNC_READ_TIMEOUT_MARGIN
+            deadline = time.time() + timeout
+            with self.ring_cond:
+                while self.ring_written < end and self.reader_error is None:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self.ring_cond.wait(remaining)
+                # Bytes still being stored count as overwritten (the window is copied with the lock held)
+                overwritten = start < self.ring_reserved - self.ring_buffer_size
+                if self.ring_written >= end and not overwritten:
+                    return self.convert_ring_window(start, n, out)
+                reader_error = self.reader_error
+
+            # Handle a failed or late read
+            if retries > 0:
+                retries -= 1
+                if reader_error is not None or overwritten:
+                    # Restart the reader and take a fresh window after the conditioning samples
+                    self.stop_reader()
+                    self.start_reader()
+                    with self.ring_cond:
+                        start = self.ring_written + 2*n_skip
+                continue
+            raise SDR_Error(
+                    30,
+                    "Failed to acquire IQ samples",
+                    "Data acquisition failed {} times in a row... Latest acquisition error:\r\n{}".format(
+                        o_retries,
+                        str(reader_error) if reader_error is not None else "Timed out waiting for samples"
+                    )
+                )
+
+    # Convert the raw bytes for n samples starting at an absolute byte index to complex
+    # (complex64 unless a buffer of another precision is given)
+    def convert_ring_window(self, start, n, out=None):
+        if out is None:
+            out = np.empty(n, dtype=np.complex64)
+        iq = out.view(out.real.dtype) # Interleaved I/Q view of the output
+        i0 = start % self.ring_buffer_size
+        n0 = min(2*n, self.ring_buffer_size-i0)
+        iq[:n0] = self.ring[i0:i0+n0]
+        iq[n0:] = self.ring[:2*n-n0]
+        iq -= 127.5
+        iq /= 127.5
+        return out
+
+    # Handle the background reader filling the ring buffer
+    def start_reader(self):
+        if self.reader is not None:
+            return
+        self.ring = np.zeros(self.ring_buffer_size, dtype=np.uint8)
+        self.ring_written = 0
+        self.ring_reserved = 0 # Bytes stored or being stored (ring slots up to here may be overwritten)
+        self.ring_cond = threading.Condition()
+        self.reader_error = None
+        self.reader = threading.Thread(target=self.run_reader)
+        self.reader.daemon = True
+        self.reader.start()
+
+    def stop_reader(self):
+        if self.reader is None:
+            return
+        try:
+            self.sdr.cancel_read_async()
+        except Exception:
+            pass
+        self.reader.join()
+        self.reader = None
+
+    def run_reader(self):
+        try:
+            self.sdr.read_bytes_async(self.store_async_bytes, self.ASYNC_BLOCK_SIZE)
+        except Exception as e:
+            with self.ring_cond:
+                self.reader_error = e
+                self.ring_cond.notify_all()
+
+    # Reserve the ring slots under the lock before storing, so readers know they are being overwritten
+    def store_async_bytes(self, buffer, context):
+        raw = np.frombuffer(buffer, dtype=np.uint8)
+        with self.ring_cond:
+            self.ring_reserved = self.ring_written + len(raw)
+        i0 = self.ring_written % self.ring_buffer_size
+        n0 = min(len(raw), self.ring_buffer_size-i0)
+        self.ring[i0:i0+n0] = raw[:n0]
+        self.ring[:len(raw)-n0] = raw[n0:]
+        with self.ring_cond:
+            self.ring_written += len(raw)
+            self.ring_cond.notify_all()
+
+    # Handle taking IQ samples with blocking reads (8294400 seems to be the max)
+    def take_blocking_iq_samples(self, n, n_skip, retries = 5, out=None):
         o_retries = retries
         while True:
             try:
@@ -207,8 +341,15 @@ class SDR(object):
                             )
                         )
             else:
+                if out is not None:
+                    out[:] = data
+                    return out
                 return data
 
+    # Wait until short probe captures agree on DC offset and power
+    def wait_until_ready(self, timeout):
+        return wait_for_stable_probe(lambda n: self.take_iq_samples(n, 0), timeout)
+
     # Handle rounding frequencies to reasonable values
     def frequency_round(self, f):
         return int(1e0 * round(f/1e0)) # Round to nearest Hz
@@ -227,7 +368,9 @@ class SDR(object):
     # Handle the powering down of the SDR
     def power_down(self):
         if self.alive:
+            self.stop_reader()
             self.sdr.close()
+            self.alive = False
         return
 
     # Ensure the device is powered down on deletion
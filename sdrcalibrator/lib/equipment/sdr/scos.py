@@ -1,11 +1,15 @@
 import swagger_client
 from swagger_client.rest import ApiException
 from swagger_client import AdminScheduleEntry
-import json, tarfile, tempfile
+import json, tarfile, io
 import urllib3
 import time
+import threading
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 import numpy as np
-from matplotlib import pyplot as plt
 
 from sdrcalibrator.lib.equipment.sdr.sdr_error import SDR_Error
 
@@ -26,8 +30,20 @@ class SDR(object):
     SDR_DEFAULT_POWER_LIMIT = -15
     SDR_DEFAULT_POWER_SCALE_FACTOR = None
     SDR_DEFAULT_POWER_SCALE_FACTOR_FILE = False
+    SDR_DEFAULT_PIPELINE_ACQUISITIONS = False
 
-    # def __init__(self):
+    # Internal constants
+    SCOS_ACTION = "acquire_m4s_700MHz_Verizon_DL"
+    POLL_INITIAL_INTERVAL = 0.05 # seconds
+    POLL_BACKOFF_FACTOR = 2
+    POLL_MAX_INTERVAL = 1.0 # seconds
+    POLL_TIMEOUT = 60 # seconds
+    ARCHIVE_TIMEOUT = 10 # seconds to keep retrying an archive download
+
+    def __init__(self):
+        self.queued_schedule = None
+        self.cleanup_thread = None
+        self.acquisition_count = 0
 
     def connect(self, connect_params):
         # Create a swagger client configuration
@@ -57,11 +73,25 @@ class SDR(object):
                     "API error:\r\n{}".format(str(e))
                 )
 
+        # Queue the next acquisition while the current archive downloads
+        # NOTE: the queued capture starts before the next point is set up, so only
+        #       enable this for repeated captures of an unchanged measurement setup
+        try:
+            self.pipeline_acquisitions = connect_params['pipeline_acquisitions']
+        except KeyError:
+            self.pipeline_acquisitions = self.SDR_DEFAULT_PIPELINE_ACQUISITIONS
+
+        # Delete completed tasks in the background
+        self.cleanup_queue = queue.Queue()
+        self.cleanup_thread = threading.Thread(target=self.run_cleanup)
+        self.cleanup_thread.daemon = True
+        self.cleanup_thread.start()
+
         # Made it here with no errors => successfully connected
         return True
     
     # Handle taking IQ samples
-    def take_iq_samples(self, n, n_skip, retries = 5):
+    def take_iq_samples(self, n, n_skip, retries = 5, out=None):
         # Check that there isn't too many data points
         if n > 15e6:
             raise SDR_Error(
@@ -72,90 +102,72 @@ class SDR(object):
                     "to skip is ignored in SCOS so this is not contributing to the total samples.)"
                 )
 
-        # Create the action in scos
-        schedule_name = "sdrcal_{}".format(
-                time.strftime('%Y-%m-%d_%H_%M_%S')
-            )
-        schedule_entry = AdminScheduleEntry(
-            name=schedule_name, action="acquire_m4s_700MHz_Verizon_DL"#, relative_stop=1, interval=1
-        )
-        scos_response = self.api_instance.v1_schedule_create(schedule_entry)
+        # Use the acquisition queued during the previous point if there is one
+        if self.queued_schedule is not None:
+            schedule_name = self.queued_schedule
+            self.queued_schedule = None
+        else:
+            schedule_name = self.queue_acquisition()
 
         # Wait for completion of the action
-        time.sleep(1)
-        scos_response = self.api_instance.v1_schedule_read(schedule_name)
-        # wait for completion
-        while scos_response.is_active:
-            time.sleep(1)
-            scos_response = self.api_instance.v1_schedule_read(schedule_name)
-        
+        self.wait_for_schedule(schedule_name)
+
+        # Start the next acquisition so it runs while this archive downloads
+        if self.pipeline_acquisitions:
+            self.queued_schedule = self.queue_acquisition()
+
         # Get the data and sigmf from scos
-        got_sigmf = False
-        for i in range(retries):
-            try:
-                time.sleep(1.5)
-                scos_response = self.api_instance.v1_tasks_completed_archive(schedule_name, _preload_content=False)
-                sigmf_data = scos_response.data
-                got_sigmf = True
-                break
-            except Exception as e:
-                continue
-        if not got_sigmf:
+        sigmf_data = self.download_archive(schedule_name, retries)
+
+        # Delete the task/data in the background to prevent clogging the sensor
+        self.cleanup_queue.put(schedule_name)
+        
+        # Open the archive straight from the downloaded bytes
+        sigmf_buf = io.BytesIO(sigmf_data)
+        all_sigmf_tar = tarfile.open(fileobj=sigmf_buf)
+
+        # Extract the sigmf meta data
+        sigmf_meta_file = all_sigmf_tar.extractfile("{}_1/{}_1.sigmf-meta".format(schedule_name,schedule_name))
+        sigmf_meta_str  = sigmf_meta_file.read().decode("utf-8")
+        sigmf_meta      = json.loads(sigmf_meta_str)
+        
+        # Determine the correct data type
+        buf_datatype  = None
+        if sigmf_meta['global']['core:datatype'] == 'rf32_le': # Real 32bit float, little endian
+            buf_datatype  = np.dtype(np.float32)
+            buf_datatype = buf_datatype.newbyteorder('<')
+        if sigmf_meta['global']['core:datatype'] == 'rf32_be': # Real 32bit float, big endian
+            buf_datatype  = np.dtype(np.float32)
+            buf_datatype = buf_datatype.newbyteorder('>')
+        if sigmf_meta['global']['core:datatype'] == 'cf32_le': # Complex 32bit float, little endian
+            buf_datatype  = np.dtype(np.complex64)
+            buf_datatype = buf_datatype.newbyteorder('<')
+        if sigmf_meta['global']['core:datatype'] == 'cf32_be': # Complex 32bit float, big endian
+            buf_datatype  = np.dtype(np.complex64)
+            buf_datatype = buf_datatype.newbyteorder('>')
+        
+        # Panic if datatype not found
+        if buf_datatype is None:
             raise SDR_Error(
                 0,
-                "Failed to retrieve data from SCOS",
-                "Failted to retrieve data from SCOS {} consecutive times. Latest exception:\r\n".format(retries) + 
-                "{}".format(str(e))
+                "Unknown data type returned",
+                "SCOS sensor returned an unknown data type:\r\n" + 
+                "    Returned datatype: {}".format(sigmf_meta['global']['core:datatype'])
             )
 
-        # Delete the task/data to prevent clogging the sensor
-        scos_response = self.api_instance.v1_tasks_completed_delete(schedule_name)
-        scos_response = self.api_instance.v1_schedule_delete(schedule_name)
-        
-        # Write the data to a temporary file for extraction
-        with tempfile.NamedTemporaryFile() as all_sigmf_file:
-            all_sigmf_file.write(sigmf_data)
-            all_sigmf_tar = tarfile.open(all_sigmf_file.name)
-
-            # Extract the sigmf meta data
-            sigmf_meta_file = all_sigmf_tar.extractfile("{}_1/{}_1.sigmf-meta".format(schedule_name,schedule_name))
-            sigmf_meta_str  = sigmf_meta_file.read().decode("utf-8")
-            sigmf_meta      = json.loads(sigmf_meta_str)
-            
-            # Determine the correct data type
-            buf_datatype  = None
-            if sigmf_meta['global']['core:datatype'] == 'rf32_le': # Real 32bit float, little endian
-                buf_datatype  = np.dtype(np.float32)
-                buf_datatype = buf_datatype.newbyteorder('<')
-            if sigmf_meta['global']['core:datatype'] == 'rf32_be': # Real 32bit float, big endian
-                buf_datatype  = np.dtype(np.float32)
-                buf_datatype = buf_datatype.newbyteorder('>')
-            if sigmf_meta['global']['core:datatype'] == 'cf32_le': # Complex 32bit float, little endian
-                buf_datatype  = np.dtype(np.complex64)
-                buf_datatype = buf_datatype.newbyteorder('<')
-            if sigmf_meta['global']['core:datatype'] == 'cf32_be': # Complex 32bit float, big endian
-                buf_datatype  = np.dtype(np.complex64)
-                buf_datatype = buf_datatype.newbyteorder('>')
-            
-            # Panic if datatype not found
-            if buf_datatype is None:
-                raise SDR_Error(
-                    0,
-                    "Unknown data type returned",
-                    "SCOS sensor returned an unknown data type:\r\n" + 
-                    "    Returned datatype: {}".format(sigmf_meta['global']['core:datatype'])
-                )
-
-            # Extract the data
-            sigmf_data_file = all_sigmf_tar.extractfile("{}_1/{}_1.sigmf-data".format(schedule_name,schedule_name))
-            sigmf_data_buf  = sigmf_data_file.read()
-            sigmf_data      = np.frombuffer(sigmf_data_buf, dtype=buf_datatype)
-            
-            # Close the temporary files to trigger for deletion
-            sigmf_data_file.close()
-            sigmf_meta_file.close()
-            all_sigmf_tar.close()
-            all_sigmf_file.close()
+        # Extract the data
+        sigmf_data_member = all_sigmf_tar.getmember("{}_1/{}_1.sigmf-data".format(schedule_name,schedule_name))
+        if all_sigmf_tar.fileobj is sigmf_buf:
+            # Uncompressed archive, so view the member's bytes in place
+            sigmf_data = np.frombuffer(
+                sigmf_data,
+                dtype=buf_datatype,
+                count=sigmf_data_member.size//buf_datatype.itemsize,
+                offset=sigmf_data_member.offset_data
+            )
+        else:
+            sigmf_data = np.frombuffer(all_sigmf_tar.extractfile(sigmf_data_member).read(), dtype=buf_datatype)
+        all_sigmf_tar.close()
 
         # Grab the important metadata parameters
         self.set_sampling_frequency(sigmf_meta['global']['core:sample_rate'])
@@ -171,22 +183,13 @@ class SDR(object):
                 "    Metadata: {}\r\n".format(received_n_points) + 
                 "    Received: {}".format(len(sigmf_data))
             )
-        print(len(sigmf_data))
-        #Debug plot
-        fft_data = np.split(sigmf_data,5)
-        fft_freqs = np.arange(len(fft_data[0]), dtype=np.float32)
-        fft_freqs *= (self.get_sampling_frequency()/len(fft_data[0]))
-        fft_freqs -= (self.get_sampling_frequency()/2)
-        fft_freqs += self.current_tuned_frequency()
-        plt.plot(fft_freqs,fft_data[0])
-        plt.plot(fft_freqs,fft_data[1])
-        plt.plot(fft_freqs,fft_data[2])
-        plt.plot(fft_freqs,fft_data[3])
-        plt.show()
-        assert False
-
-        # Cut the data to the requested size
-        iq_data = sigmf_data[:n]
+
+        # Copy out only the requested samples (in native byte order) so the archive can be released
+        if out is not None and len(sigmf_data) >= n:
+            out[:] = sigmf_data[:n]
+            iq_data = out
+        else:
+            iq_data = sigmf_data[:n].astype(buf_datatype.newbyteorder('='))
         if not len(iq_data) == n:
             raise SDR_Error(
                 0,
@@ -204,6 +207,70 @@ class SDR(object):
         # Return the iq data
         return iq_data
     
+    # Create the action in scos and return the schedule name
+    def queue_acquisition(self):
+        self.acquisition_count += 1
+        schedule_name = "sdrcal_{}_{}".format(
+                time.strftime('%Y-%m-%d_%H_%M_%S'),
+                self.acquisition_count
+            )
+        schedule_entry = AdminScheduleEntry(
+            name=schedule_name, action=self.SCOS_ACTION#, relative_stop=1, interval=1
+        )
+        self.api_instance.v1_schedule_create(schedule_entry)
+        return schedule_name
+
+    # Poll the schedule entry with an exponentially increasing interval until it is done
+    def wait_for_schedule(self, schedule_name):
+        poll_interval = self.POLL_INITIAL_INTERVAL
+        deadline = time.time() + self.POLL_TIMEOUT
+        while self.api_instance.v1_schedule_read(schedule_name).is_active:
+            if time.time() > deadline:
+                raise SDR_Error(
+                    0,
+                    "SCOS acquisition timed out",
+                    "Schedule entry \"{}\" was still active after {} seconds".format(
+                        schedule_name,
+                        self.POLL_TIMEOUT
+                    )
+                )
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval*self.POLL_BACKOFF_FACTOR, self.POLL_MAX_INTERVAL)
+
+    # Download the archive, backing off between attempts while it is not yet available
+    def download_archive(self, schedule_name, retries):
+        poll_interval = self.POLL_INITIAL_INTERVAL
+        deadline = time.time() + self.ARCHIVE_TIMEOUT
+        latest_exception = None
+        attempts = 0
+        while attempts < retries or time.time() < deadline:
+            attempts += 1
+            try:
+                scos_response = self.api_instance.v1_tasks_completed_archive(schedule_name, _preload_content=False)
+                return scos_response.data
+            except Exception as e:
+                latest_exception = e
+                time.sleep(poll_interval)
+                poll_interval = min(poll_interval*self.POLL_BACKOFF_FACTOR, self.POLL_MAX_INTERVAL)
+        raise SDR_Error(
+            0,
+            "Failed to retrieve data from SCOS",
+            "Failted to retrieve data from SCOS {} consecutive times. Latest exception:\r\n".format(attempts) + 
+            "{}".format(str(latest_exception))
+        )
+
+    # Delete completed tasks and schedule entries as they are queued (None stops the thread)
+    def run_cleanup(self):
+        while True:
+            schedule_name = self.cleanup_queue.get()
+            if schedule_name is None:
+                return
+            try:
+                self.api_instance.v1_tasks_completed_delete(schedule_name)
+                self.api_instance.v1_schedule_delete(schedule_name)
+            except Exception:
+                print("Failed to delete SCOS schedule entry \"{}\"".format(schedule_name))
+
     """
     EVERY THING BELOW THIS LEVEL IS STILL A DUMMY FUNCTION
     EITHER WAITING FOR AN IMPLEMENTATION OR WITHOUT AN 
@@ -279,12 +346,28 @@ class SDR(object):
     def set_dsp_lo_shift(self, dsp_lo_shift):
         self.dsp_lo_shift = dsp_lo_shift
 
+    # The sensor applies the settings with each action, so it is always ready
+    def wait_until_ready(self, timeout):
+        return True
+
     # Handle rounding frequencies to reasonable values
     def frequency_round(self, f):
         return int(1e0 * round(f/1e0)) # Round to nearest Hz
 
     # Handle the powering down of the SDR
     def power_down(self):
+        if self.cleanup_thread is not None:
+            # Wait for any queued acquisition before deleting it
+            if self.queued_schedule is not None:
+                try:
+                    self.wait_for_schedule(self.queued_schedule)
+                except Exception:
+                    pass
+                self.cleanup_queue.put(self.queued_schedule)
+                self.queued_schedule = None
+            self.cleanup_queue.put(None)
+            self.cleanup_thread.join()
+            self.cleanup_thread = None
         return
 
     # Ensure the device is powered down on deletion
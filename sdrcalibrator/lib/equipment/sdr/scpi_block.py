@@ -0,0 +1,115 @@
+""" IEEE 488.2 definite length binary blocks ("#<n><length><data>") shared by the SCPI SDR drivers """
+import numpy as np
+
+from sdrcalibrator.lib.equipment.sdr.sdr_error import SDR_Error
+
+BLOCK_TERMINATORS = [b'', b'\n', b'\r\n'] # What may follow the data in the same message
+DEFAULT_CHUNK_SIZE = 1048576 # bytes
+
+
+# Read a block response in bounded chunks, so each read completes within the session timeout
+# however many samples were requested. The last read runs to the end of the message, so it
+# also takes the terminator whether or not the instrument sent one with the data.
+def read_definite_length_block(session, sdr_name, dtype=np.uint8, chunk_size=DEFAULT_CHUNK_SIZE):
+    header = read_exactly(session, 2, sdr_name)
+    num_digits = check_header(header, sdr_name)
+    length = read_exactly(session, num_digits, sdr_name)
+    num_bytes = check_length(header+length, num_digits, sdr_name)
+    check_itemsize(num_bytes, dtype, sdr_name)
+
+    # Read the data into a preallocated buffer, allowing for reads returning less than asked
+    block = bytearray(num_bytes)
+    view = memoryview(block)
+    bytes_read = 0
+    while num_bytes-bytes_read > chunk_size:
+        chunk = session.read_raw(chunk_size)
+        if len(chunk) == 0:
+            raise incomplete_error(bytes_read, num_bytes, sdr_name)
+        view[bytes_read:bytes_read+len(chunk)] = chunk
+        bytes_read += len(chunk)
+    rest = session.read_raw()
+    remaining = num_bytes-bytes_read
+    if len(rest) < remaining:
+        raise incomplete_error(bytes_read+len(rest), num_bytes, sdr_name)
+    view[bytes_read:] = rest[:remaining]
+    check_terminator(rest[remaining:], num_bytes, sdr_name)
+    return np.frombuffer(block, dtype=dtype)
+
+
+# Parse a whole block response, returning its data viewed as dtype without copying
+def parse_definite_length_block(raw, sdr_name, dtype=np.uint8):
+    num_digits = check_header(raw[0:2], sdr_name)
+    start = 2+num_digits
+    num_bytes = check_length(raw[0:start], num_digits, sdr_name)
+    if len(raw) < start+num_bytes:
+        raise incomplete_error(len(raw)-start, num_bytes, sdr_name)
+    check_terminator(raw[start+num_bytes:], num_bytes, sdr_name)
+    check_itemsize(num_bytes, dtype, sdr_name)
+    return np.frombuffer(raw, dtype=dtype, count=num_bytes//np.dtype(dtype).itemsize, offset=start)
+
+
+# Read exactly n bytes of the header (a read may return fewer bytes than asked for)
+def read_exactly(session, n, sdr_name):
+    data = b''
+    while len(data) < n:
+        chunk = session.read_raw(n-len(data))
+        if len(chunk) == 0:
+            raise SDR_Error(
+                0,
+                "Incomplete data from {}".format(sdr_name),
+                "Binary block header ended after {} bytes".format(len(data))
+            )
+        data += chunk
+    return data
+
+# Check the "#<n>" start of a block, returning the number of length digits
+def check_header(header, sdr_name):
+    num_digits = header[1:2]
+    if not header[0:1] == b'#' or not num_digits.isdigit() or num_digits == b'0':
+        raise SDR_Error(
+            0,
+            "Unexpected data from {}".format(sdr_name),
+            (
+                "Expected a definite length binary block...\r\n" +
+                "Header received: {}"
+            ).format(header[0:2])
+        )
+    return int(num_digits)
+
+# Check the "#<n><length>" header, returning the number of data bytes
+def check_length(header, num_digits, sdr_name):
+    length = header[2:2+num_digits]
+    if not len(length) == num_digits or not length.isdigit():
+        raise SDR_Error(
+            0,
+            "Unexpected data from {}".format(sdr_name),
+            (
+                "Binary block length is malformed...\r\n" +
+                "Header received: {}"
+            ).format(header)
+        )
+    return int(length)
+
+def check_itemsize(num_bytes, dtype, sdr_name):
+    itemsize = np.dtype(dtype).itemsize
+    if not num_bytes % itemsize == 0:
+        raise SDR_Error(
+            0,
+            "Unexpected data from {}".format(sdr_name),
+            "Binary block of {} bytes is not a whole number of {} byte values".format(num_bytes, itemsize)
+        )
+
+def check_terminator(trailer, num_bytes, sdr_name):
+    if not trailer in BLOCK_TERMINATORS:
+        raise SDR_Error(
+            0,
+            "Unexpected data from {}".format(sdr_name),
+            "Received {} bytes after the {} byte binary block".format(len(trailer), num_bytes)
+        )
+
+def incomplete_error(bytes_read, num_bytes, sdr_name):
+    return SDR_Error(
+        0,
+        "Incomplete data from {}".format(sdr_name),
+        "Received {} of {} bytes in binary block".format(bytes_read, num_bytes)
+    )
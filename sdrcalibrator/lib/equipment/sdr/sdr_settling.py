@@ -0,0 +1,31 @@
+""" Readiness check shared by the SDR drivers: wait until short probe captures agree """
+import numpy as np
+import time
+
+PROBE_SAMPLES = 16384 # Samples per probe capture
+
+
+# DC offset and mean power (dB) of a probe capture
+def probe_statistics(data):
+    data = np.asarray(data)
+    dc = np.mean(data, dtype=np.complex128)
+    power = np.mean(np.abs(data)**2, dtype=np.float64)
+    return dc, 10*np.log10(max(power, 1e-30))
+
+
+# Take probe captures with take_probe(n) until two in a row agree on DC offset and power
+# (AGC/DC-offset convergence). Returns True once settled, False if the timeout passed first
+def wait_for_stable_probe(take_probe, timeout, power_tolerance_dB=0.5, dc_tolerance=0.1):
+    deadline = time.time() + timeout
+    previous = None
+    while True:
+        dc, power = probe_statistics(take_probe(PROBE_SAMPLES))
+        if previous is not None:
+            # The DC tolerance is relative to the RMS level of the probe
+            rms = np.sqrt(10**(power/10))
+            if (abs(power-previous[1]) <= power_tolerance_dB and
+                    abs(dc-previous[0]) <= dc_tolerance*rms):
+                return True
+        if time.time() > deadline:
+            return False
+        previous = (dc, power)
@@ -0,0 +1,134 @@
+""" Continuous RX streaming for the gr-uhd based SDRs (B210, B205mini) """
+from gnuradio import gr
+import numpy as np
+import threading
+import time
+import pmt
+
+
+# Sink block keeping the most recent samples, indexed by absolute sample number
+class RX_Stream_Buffer(gr.sync_block):
+    def __init__(self, capacity, samp_rate):
+        gr.sync_block.__init__(
+                self,
+                name="rx_stream_buffer",
+                in_sig=[np.complex64],
+                out_sig=None
+            )
+        self.capacity = int(capacity)
+        self.ring = np.zeros(self.capacity, dtype=np.complex64)
+        self.num_written = 0
+        self.num_reserved = 0 # Samples written or being written (ring slots up to here may be overwritten)
+        self.samp_rate = samp_rate
+        self.time_ref = None        # Device time of the reference sample
+        self.time_ref_index = None  # Absolute index of the reference sample
+        self.last_read_index = None # Absolute index of the first sample of the last read
+        self.cond = threading.Condition()
+
+    def work(self, input_items, output_items):
+        in0 = input_items[0]
+        n = len(in0)
+        start = self.nitems_read(0)
+
+        # UHD tags the first sample after a start, overflow, retune or rate change
+        time_ref = None
+        for tag in self.get_tags_in_window(0, 0, n):
+            key = pmt.symbol_to_string(tag.key)
+            if key == 'rx_time':
+                secs, frac_secs = pmt.to_python(tag.value)
+                time_ref = (secs + frac_secs, tag.offset)
+            elif key == 'rx_rate':
+                self.samp_rate = pmt.to_double(tag.value)
+
+        # Reserve the slots first, so readers know they are being overwritten
+        with self.cond:
+            self.num_reserved = start + n
+
+        # Copy into the ring buffer (only the tail if the block is larger than the ring)
+        if n > self.capacity:
+            in0 = in0[n-self.capacity:]
+        i0 = (start + n - len(in0)) % self.capacity
+        n0 = min(len(in0), self.capacity-i0)
+        self.ring[i0:i0+n0] = in0[:n0]
+        self.ring[:len(in0)-n0] = in0[n0:]
+
+        # Publish the new samples
+        with self.cond:
+            if time_ref is not None:
+                self.time_ref, self.time_ref_index = time_ref
+            self.num_written = start + n
+            self.cond.notify_all()
+        return n
+
+    # Absolute index of the first sample at or after device time t (call with cond held)
+    def time_to_index(self, t):
+        return self.time_ref_index + max(0, int(np.ceil((t-self.time_ref)*self.samp_rate)))
+
+    # Absolute index of the first sample at or after device time t, None before the first timestamp
+    def index_at(self, t):
+        with self.cond:
+            if self.time_ref is None:
+                return None
+            return self.time_to_index(t)
+
+    # Copy out the n samples starting at the first sample at or after device time t
+    # Returns None if the samples did not arrive in time or were overwritten before or while copying
+    def read_after(self, n, t, timeout, out=None):
+        deadline = time.time() + timeout
+        with self.cond:
+            while True:
+                if self.time_ref is not None:
+                    start = self.time_to_index(t)
+                    if self.num_written >= start + n:
+                        break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.cond.wait(remaining)
+            if start < self.num_reserved - self.capacity:
+                return None
+
+        # Copy without holding up the writer, then check the window was not overwritten meanwhile
+        i0 = start % self.capacity
+        n0 = min(n, self.capacity-i0)
+        data = np.empty(n, dtype=np.complex64) if out is None else out
+        data[:n0] = self.ring[i0:i0+n0]
+        data[n0:] = self.ring[:n-n0]
+        with self.cond:
+            if start < self.num_reserved - self.capacity:
+                return None
+            self.last_read_index = start
+        return data
+
+
+# Long-lived streamer: the usrp_source runs in a flowgraph feeding the ring buffer
+class RX_Streamer(object):
+    def __init__(self, usrp, buffer_size):
+        self.usrp = usrp
+        self.buffer = RX_Stream_Buffer(buffer_size, self.usrp.get_samp_rate())
+        self.tb = gr.top_block()
+        self.tb.connect(self.usrp, self.buffer)
+        self.tb.start()
+
+    # Current device time in seconds
+    def get_time_now(self):
+        return self.usrp.get_time_now().get_real_secs()
+
+    def get_sample_rate(self):
+        return self.buffer.samp_rate
+
+    def take_samples_after(self, n, t, timeout, out=None):
+        return self.buffer.read_after(n, t, timeout, out)
+
+    # Absolute sample index of device time t in the stream
+    def get_index_at(self, t):
+        return self.buffer.index_at(t)
+
+    # Absolute sample index of the first sample returned by the last take
+    def get_last_read_index(self):
+        return self.buffer.last_read_index
+
+    def stop(self):
+        self.tb.stop()
+        self.tb.wait()
+        self.tb.disconnect_all()
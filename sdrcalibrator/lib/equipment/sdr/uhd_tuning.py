@@ -0,0 +1,29 @@
+""" LO retuning with lock tracking for the gr-uhd based SDRs (B210, B205mini) """
+import time
+
+from sdrcalibrator.lib.equipment.sdr.sdr_error import SDR_Error
+
+
+# Retune straight away and wait for the LO to report lock, returning the tune result and the
+# device time valid data begins at.
+# The retune is not scheduled with set_command_time: B2xx devices do not guarantee that the
+# AD9361 RF retune honors command time, so a scheduled retune may run immediately or late.
+# set_center_freq returns once the retune has been applied, so any lock reading after it is for
+# the new frequency. The device time is read after the first locked reading, so no sample
+# timestamped at or after it predates the lock.
+def tune_and_wait_for_lock(usrp, tune_request, f0, timeout, poll_interval):
+    tune_result = usrp.set_center_freq(tune_request)
+    deadline = time.time() + timeout
+    while not usrp.get_sensor('lo_locked').to_bool():
+        if time.time() > deadline:
+            raise SDR_Error(
+                    22,
+                    "LO did not lock after retune",
+                    (
+                        "Requested f0 frequency: {}MHz\r\n" +
+                        "Lock timeout: {}s"
+                    ).format(f0/1e6, timeout)
+                )
+        time.sleep(poll_interval)
+    valid_data_time = usrp.get_time_now().get_real_secs()
+    return tune_result, valid_data_time
@@ -1,9 +1,10 @@
 # from __future__ import division, print_function
 import time
 from gnuradio import eng_notation
-import pyvisa as visa
 
+import sdrcalibrator.lib.equipment.visa_sessions as visa_sessions
 from sdrcalibrator.lib.equipment.siggen.siggen_error import Signal_Generator_Error
+from sdrcalibrator.lib.equipment.siggen.siggen_settling import Settling_Tracker
 
 
 class Signal_Generator(object):
@@ -13,15 +14,21 @@ class Signal_Generator(object):
     SIGGEN_DEFAULT_CONNECT_TIMEOUT = 5000
     SIGGEN_DEFAULT_RF_ON_SETTLING_TIME = 1
     SIGGEN_DEFAULT_RF_OFF_SETTLING_TIME = 0
+    SIGGEN_DEFAULT_SETTLING_MODEL_FILE = None
     SIGGEN_DEFAULT_MAX_OUTPUT_POWER = 10
 
+    # List sweep constants
+    LIST_SWEEP_DWELL_TIME = 0.001 # Points are advanced by trigger, so dwell as little as possible
+    LIST_SWEEP_TRIGGER_SOURCES = {
+        'bus': 'BUS', # Advanced with *TRG
+        'software': 'KEY' # Advanced with :TRIGger
+    }
+    LIST_SWEEP_MATCH_TOLERANCE = 1e-6 # Tolerance for a requested value to be a list point
+
     def __init__(self):
         self.alive = False
 
     def connect(self, connect_params):
-        # Create the Visa resource manager
-        rm = visa.ResourceManager('@py')
-
         # Save the connection variables
         self.ip_addr = connect_params['ip_addr']
         self.port = connect_params['port']
@@ -30,9 +37,9 @@ class Signal_Generator(object):
         except KeyError:
             self.connect_timeout = self.SIGGEN_DEFAULT_CONNECT_TIMEOUT
 
-        # Attempt to connect to the machine
+        # Attempt to connect to the machine (reusing an open session)
         try:
-            self.siggen = rm.open_resource("TCPIP0::{}::{}::INSTR".format(
+            self.siggen = visa_sessions.open_session("TCPIP0::{}::{}::INSTR".format(
                     self.ip_addr, self.port
                 ), open_timeout=self.connect_timeout)
         except Exception as e:
@@ -45,6 +52,9 @@ class Signal_Generator(object):
                 )
         self.alive = True
 
+        # Track transitions to know how long the output needs to settle
+        self.settling = Settling_Tracker()
+
         # Set the system to preset for repeatability
         self.preset()
 
@@ -64,34 +74,124 @@ class Signal_Generator(object):
     # Put the signal generator back to its preset state
     def preset(self):
         self.siggen.write(':SYSTem:PRESet')
+        self.settling.reset()
+        self.list_sweep = None
 
     # Handle turning on and off the RF output
     def rf_on(self, settling_time=None):
         if settling_time is None:
-            settling_time = self.rf_on_settling_time
+            settling_time = self.settling.rf_settling_time('rf_on', self.rf_on_settling_time)
         self.siggen.write(':OUTPut:STATe ON')
+        self.settling.rf_switched(True)
         time.sleep(settling_time)
 
     def rf_off(self, settling_time=None):
         if settling_time is None:
-            settling_time = self.rf_off_settling_time
+            settling_time = self.settling.rf_settling_time('rf_off', self.rf_off_settling_time)
         self.siggen.write(':OUTPut:STATe OFF')
+        self.settling.rf_switched(False)
         time.sleep(settling_time)
 
     # Handle setting the frequency and power of the output signal
     def tune_to_frequency(self, freq):
+        # Step a loaded list sweep instead if this is its next point
+        if self.on_list_point('frequencies', freq):
+            return
         self.siggen.write(
                 ":FREQuency {}HZ".format(eng_notation.num_to_str(freq))
             )
+        self.settling.frequency_changed(freq)
 
     def set_power(self, power):
         # Software limit the output power
         if power > self.max_output_power:
             power = self.max_output_power
+        # Step a loaded list sweep instead if this is its next point
+        if self.on_list_point('powers', power):
+            return
         # Set the actual output power
         self.siggen.write(
                 ":POWer {}DBM".format(power)
             )
+        self.settling.power_changed(power)
+
+    # Preload a list sweep of output powers and/or frequencies, advanced one point per trigger
+    # ('bus' for *TRG, 'software' for :TRIGger). The output starts at the first point and
+    # set_power/tune_to_frequency calls for the next point step the list instead of reprogramming
+    def load_list_sweep(self, powers=None, frequencies=None, trigger='bus'):
+        self.stop_list_sweep()
+        if powers is not None:
+            powers = [min(p, self.max_output_power) for p in powers]
+        self.siggen.write(':LIST:TYPE LIST')
+        if powers is not None:
+            self.siggen.write(':LIST:POWer {}'.format(','.join("{}".format(p) for p in powers)))
+        if frequencies is not None:
+            self.siggen.write(':LIST:FREQuency {}'.format(','.join("{}".format(f) for f in frequencies)))
+        self.siggen.write(':LIST:DWELl {}'.format(self.LIST_SWEEP_DWELL_TIME))
+        self.siggen.write(':LIST:DIRection UP')
+        self.siggen.write(':LIST:MODE AUTO')
+        self.siggen.write(':LIST:TRIGger:SOURce {}'.format(self.LIST_SWEEP_TRIGGER_SOURCES[trigger]))
+        self.siggen.write(':TRIGger:SOURce IMMediate')
+        self.siggen.write(':INITiate:CONTinuous OFF')
+        if powers is not None:
+            self.siggen.write(':POWer:MODE LIST')
+        if frequencies is not None:
+            self.siggen.write(':FREQuency:MODE LIST')
+        # Wait for the list to be loaded before arming (the armed sweep stays pending until its last trigger)
+        self.siggen.query('*OPC?')
+        self.siggen.write(':INITiate')
+        self.list_sweep = {
+            'powers': powers,
+            'frequencies': frequencies,
+            'trigger': trigger,
+            'index': 0
+        }
+        if powers is not None:
+            self.settling.power_changed(powers[0])
+        if frequencies is not None:
+            self.settling.frequency_changed(frequencies[0])
+
+    # Step the list sweep to its next point
+    def trigger_list_point(self):
+        if self.list_sweep['trigger'] == 'bus':
+            self.siggen.write('*TRG')
+        else:
+            self.siggen.write(':TRIGger')
+        self.list_sweep['index'] += 1
+        i = self.list_sweep['index']
+        if self.list_sweep['powers'] is not None:
+            self.settling.power_changed(self.list_sweep['powers'][i])
+        if self.list_sweep['frequencies'] is not None:
+            self.settling.frequency_changed(self.list_sweep['frequencies'][i])
+
+    # Return to a fixed CW output, held at the current list point
+    def stop_list_sweep(self):
+        if self.list_sweep is None:
+            return
+        sweep = self.list_sweep
+        self.list_sweep = None
+        i = sweep['index']
+        if sweep['frequencies'] is not None:
+            self.tune_to_frequency(sweep['frequencies'][i])
+            self.siggen.write(':FREQuency:MODE FIXed')
+        if sweep['powers'] is not None:
+            self.set_power(sweep['powers'][i])
+            self.siggen.write(':POWer:MODE FIXed')
+
+    # Whether the list sweep is at a value, triggering it if the value is its next point
+    # (a value off the list stops the sweep so it can be set directly)
+    def on_list_point(self, key, value):
+        if self.list_sweep is None or self.list_sweep[key] is None:
+            return False
+        values = self.list_sweep[key]
+        i = self.list_sweep['index']
+        if abs(values[i]-value) < self.LIST_SWEEP_MATCH_TOLERANCE:
+            return True
+        if i+1 < len(values) and abs(values[i+1]-value) < self.LIST_SWEEP_MATCH_TOLERANCE:
+            self.trigger_list_point()
+            return True
+        self.stop_list_sweep()
+        return False
 
     # Handle configuring settling times
     def configure_rf_on_settling_time(self, t):
@@ -100,13 +200,17 @@ class Signal_Generator(object):
     def configure_rf_off_settling_time(self, t):
         self.rf_off_settling_time = t
 
+    # Use a characterized settling model in place of the fixed settling times
+    def configure_settling_model(self, model):
+        self.settling.model = model
+
     # Handle deletion of the signal generator:
     #   ensure it's back in preset and RF is off
     def power_down(self):
         if self.alive:
             self.preset()
             self.rf_off()
-            self.siggen.close()
+            visa_sessions.release_session(self.siggen)
             self.alive = False
 
     # Ensure the device is powered down on deletion
@@ -1,9 +1,10 @@
 # from __future__ import division, print_function
 import time
 from gnuradio import eng_notation
-import visa
 
+import sdrcalibrator.lib.equipment.visa_sessions as visa_sessions
 from sdrcalibrator.lib.equipment.siggen.siggen_error import Signal_Generator_Error
+from sdrcalibrator.lib.equipment.siggen.siggen_settling import Settling_Tracker
 
 # Dummys for now
 import numpy as np
@@ -18,6 +19,7 @@ class Signal_Generator(object):
     SIGGEN_DEFAULT_CONNECT_TIMEOUT = 5000
     SIGGEN_DEFAULT_RF_ON_SETTLING_TIME = 1
     SIGGEN_DEFAULT_RF_OFF_SETTLING_TIME = 0
+    SIGGEN_DEFAULT_SETTLING_MODEL_FILE = None
     SIGGEN_DEFAULT_MAX_OUTPUT_POWER = 10
     SIGGEN_ADC_BITS = 14
 
@@ -94,9 +96,6 @@ class Signal_Generator(object):
 
         
     def connect(self, connect_params):
-        # Create the Visa resource manager
-        rm = visa.ResourceManager('@py')
-
         # Save the connection variables
         self.ip_addr = connect_params['ip_addr']
         self.port = connect_params['port']
@@ -105,9 +104,9 @@ class Signal_Generator(object):
         except KeyError:
             self.connect_timeout = self.SIGGEN_DEFAULT_CONNECT_TIMEOUT
 
-        # Attempt to connect to the machine
+        # Attempt to connect to the machine (reusing an open session)
         try:
-            self.siggen = rm.open_resource("TCPIP0::{}::{}::INSTR".format(
+            self.siggen = visa_sessions.open_session("TCPIP0::{}::{}::INSTR".format(
                     self.ip_addr, self.port
                 ), open_timeout=self.connect_timeout)
         except Exception as e:
@@ -120,6 +119,9 @@ class Signal_Generator(object):
                 )
         self.alive = True
 
+        # Track transitions to know how long the output needs to settle
+        self.settling = Settling_Tracker()
+
         # Set the system to preset for repeatability
         self.preset()
 
@@ -141,22 +143,25 @@ class Signal_Generator(object):
         # Ensure all modulations are off
         self.siggen.write(':SOURce:RADio:ALL:OFF')
         self.siggen.write(':OUTPut:MODulation:STATe OFF')
+        self.settling.reset()
 
     # Handle turning on and off the RF output
     def rf_on(self, settling_time=None):
         if settling_time is None:
-            settling_time = self.rf_on_settling_time
+            settling_time = self.settling.rf_settling_time('rf_on', self.rf_on_settling_time)
         self.siggen.write(':SOURce:RADio:ARB:STATe ON')
         self.siggen.write(':OUTPut:MODulation:STATe ON')
         self.siggen.write(':OUTPut:STATe ON')
+        self.settling.rf_switched(True)
         time.sleep(settling_time)
 
     def rf_off(self, settling_time=None):
         if settling_time is None:
-            settling_time = self.rf_off_settling_time
+            settling_time = self.settling.rf_settling_time('rf_off', self.rf_off_settling_time)
         self.siggen.write(':SOURce:RADio:ARB:STATe OFF')
         self.siggen.write(':OUTPut:MODulation:STATe OFF')
         self.siggen.write(':OUTPut:STATe OFF')
+        self.settling.rf_switched(False)
         time.sleep(settling_time)
 
     # Handle setting the frequency and power of the output signal
@@ -182,6 +187,7 @@ class Signal_Generator(object):
         self.siggen.write(
                 ":SOURce:FREQuency {}HZ".format(eng_notation.num_to_str(freq))
             )
+        self.settling.frequency_changed(freq)
 
     def set_power(self, power):
         # Software limit the output power
@@ -191,6 +197,7 @@ class Signal_Generator(object):
         self.siggen.write(
                 ":POWer:LEVel:AMPLitude {}DBM".format(power)
             )
+        self.settling.power_changed(power)
 
     # Handle configuring settling times
     def configure_rf_on_settling_time(self, t):
@@ -199,13 +206,17 @@ class Signal_Generator(object):
     def configure_rf_off_settling_time(self, t):
         self.rf_off_settling_time = t
 
+    # Use a characterized settling model in place of the fixed settling times
+    def configure_settling_model(self, model):
+        self.settling.model = model
+
     # Handle deletion of the signal generator:
     #   ensure it's back in preset and RF is off
     def power_down(self):
         if self.alive:
             #self.preset()
             #self.rf_off()
-            self.siggen.close()
+            visa_sessions.release_session(self.siggen)
             self.alive = False
 
     # Ensure the device is powered down on deletion
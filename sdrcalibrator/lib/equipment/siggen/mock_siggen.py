@@ -3,6 +3,7 @@
 import time
 
 from sdrcalibrator.lib.equipment.siggen.siggen_error import Signal_Generator_Error
+from sdrcalibrator.lib.equipment.siggen.siggen_settling import Settling_Tracker
 
 
 class Signal_Generator(object):
@@ -12,6 +13,8 @@ class Signal_Generator(object):
     SIGGEN_DEFAULT_CONNECT_TIMEOUT = 5000
     SIGGEN_DEFAULT_RF_ON_SETTLING_TIME = 1
     SIGGEN_DEFAULT_RF_OFF_SETTLING_TIME = 0
+    SIGGEN_DEFAULT_SETTLING_MODEL_FILE = None
+    LIST_SWEEP_MATCH_TOLERANCE = 1e-6
 
     """ Initialize the signal generator """
     def __init__(self):
@@ -28,6 +31,9 @@ class Signal_Generator(object):
         # "Connect to the siggen"
         self.alive = True
 
+        # Track transitions to know how long the output needs to settle
+        self.settling = Settling_Tracker()
+
         # Set the system to preset for repeatability
         self.preset()
 
@@ -40,13 +46,15 @@ class Signal_Generator(object):
 
     """ Put siggen in its preset state """
     def preset(self):
+        self.list_sweep = None
         return
 
     """ Turn on the output RF """
     def rf_on(self, settling_time=None, actually_settle=False):
         # Determine the settling time
         if settling_time is None:
-            settling_time = self.rf_on_settling_time
+            settling_time = self.settling.rf_settling_time('rf_on', self.rf_on_settling_time)
+        self.settling.rf_switched(True)
 
         # Only settle if for some reason a test absolutely needs this
         if actually_settle:
@@ -56,7 +64,8 @@ class Signal_Generator(object):
     def rf_off(self, settling_time=None, actually_settle=False):
         # Determine the settling time
         if settling_time is None:
-            settling_time = self.rf_off_settling_time
+            settling_time = self.settling.rf_settling_time('rf_off', self.rf_off_settling_time)
+        self.settling.rf_switched(False)
 
         # Only settle if for some reason a test absolutely needs this
         if actually_settle:
@@ -64,12 +73,46 @@ class Signal_Generator(object):
 
     """ Set the frequency of the RF output """
     def tune_to_frequency(self, freq):
+        self.on_list_point('frequencies', freq)
         return
 
     """ Set the power of the RF output """
     def set_power(self, power):
+        self.on_list_point('powers', power)
         return
 
+    """ Preload a list sweep of powers and/or frequencies advanced by trigger """
+    def load_list_sweep(self, powers=None, frequencies=None, trigger='bus'):
+        self.stop_list_sweep()
+        self.list_sweep = {
+            'powers': powers,
+            'frequencies': frequencies,
+            'trigger': trigger,
+            'index': 0
+        }
+
+    """ Step the list sweep to its next point """
+    def trigger_list_point(self):
+        self.list_sweep['index'] += 1
+
+    """ Return to a fixed CW output """
+    def stop_list_sweep(self):
+        self.list_sweep = None
+
+    """ Whether the list sweep is at a value, triggering it if the value is its next point """
+    def on_list_point(self, key, value):
+        if self.list_sweep is None or self.list_sweep[key] is None:
+            return False
+        values = self.list_sweep[key]
+        i = self.list_sweep['index']
+        if abs(values[i]-value) < self.LIST_SWEEP_MATCH_TOLERANCE:
+            return True
+        if i+1 < len(values) and abs(values[i+1]-value) < self.LIST_SWEEP_MATCH_TOLERANCE:
+            self.trigger_list_point()
+            return True
+        self.stop_list_sweep()
+        return False
+
     """ Set the rf_on() settling time """
     def configure_rf_on_settling_time(self, t):
         self.rf_on_settling_time = t
@@ -78,6 +121,10 @@ class Signal_Generator(object):
     def configure_rf_off_settling_time(self, t):
         self.rf_off_settling_time = t
 
+    """ Use a characterized settling model in place of the fixed settling times """
+    def configure_settling_model(self, model):
+        self.settling.model = model
+
     """ Power down the signal generator """
     def power_down(self):
         if self.alive:
@@ -0,0 +1,125 @@
+""" Learned settling times for signal generator transitions
+
+A settling model holds the output settling time measured (by the
+siggen_settling test) for each kind of transition against its step size:
+frequency jumps in Hz, power jumps in dB and the RF output switching on or
+off. The signal generator drivers use it through a Settling_Tracker to wait
+only as long as each transition needs. Transitions the model does not cover
+fall back to the configured settling times.
+"""
+import json
+import time
+
+TRANSITIONS = ['rf_on', 'rf_off', 'frequency', 'power']
+DEFAULT_SAFETY_MARGIN = 1.25 # Measured settling times are scaled by this when applied
+
+
+class Settling_Model(object):
+    def __init__(self, siggen_name=None, safety_margin=DEFAULT_SAFETY_MARGIN):
+        self.siggen_name = siggen_name
+        self.safety_margin = safety_margin
+        self.points = dict((t, []) for t in TRANSITIONS) # transition -> [(step size, settling time)]
+
+    # Record a measured settling time for a step (RF on/off transitions have a step of 0)
+    def add_measurement(self, transition, step, settling_time):
+        self.points[transition].append((abs(step), settling_time))
+        self.points[transition].sort()
+
+    # Minimum safe delay for a step, or None if the step is larger than any characterized
+    # Uses the worst time measured for steps up to the first characterized step at least as large
+    def settling_time(self, transition, step=0):
+        points = self.points.get(transition, [])
+        step = abs(step)
+        if not points or step > points[-1][0]:
+            return None
+        bound = [s for s, t in points if s >= step][0]
+        return self.safety_margin * max(t for s, t in points if s <= bound)
+
+    # Serialize to the on-disk JSON format
+    def to_json_dict(self):
+        return {
+            'siggen_name': self.siggen_name,
+            'safety_margin': self.safety_margin,
+            'settling_times': dict(
+                    (t, [{'step': s, 'settling_time': st} for s, st in self.points[t]])
+                    for t in TRANSITIONS
+                )
+        }
+
+    def save(self, fname):
+        with open(fname, 'w+') as f:
+            json.dump(self.to_json_dict(), f, indent=4)
+            f.close()
+
+    @classmethod
+    def load(cls, fname):
+        with open(fname, 'r') as f:
+            data = json.load(f)
+            f.close()
+        model = cls(data.get('siggen_name'), data.get('safety_margin', DEFAULT_SAFETY_MARGIN))
+        for transition, points in data['settling_times'].items():
+            for pt in points:
+                model.add_measurement(transition, pt['step'], pt['settling_time'])
+        return model
+
+
+class Settling_Tracker(object):
+
+    """ Follows a signal generator's state to know how long its output needs to settle """
+    def __init__(self, model=None):
+        self.model = model
+        self.reset()
+
+    # Forget the output state (after a preset)
+    def reset(self):
+        self.frequency = None
+        self.power = None
+        self.rf_is_on = False
+        self.settled_at = 0 # When the characterized changes made so far have settled
+        self.uncharacterized_change = False # A change the model has no delay for is pending
+
+    def frequency_changed(self, freq):
+        self.step_changed('frequency', self.frequency, freq)
+        self.frequency = freq
+
+    def power_changed(self, power):
+        self.step_changed('power', self.power, power)
+        self.power = power
+
+    # Note a frequency/power step, waiting for it to settle straight away if the output is on
+    def step_changed(self, transition, old, new):
+        if self.model is None or old == new:
+            return
+        t = None
+        if old is not None:
+            t = self.model.settling_time(transition, new-old)
+        if t is None:
+            self.uncharacterized_change = True
+            return
+        self.settled_at = max(self.settled_at, time.time()+t)
+        if self.rf_is_on:
+            self.wait_for_changes()
+
+    def wait_for_changes(self):
+        time.sleep(max(0, self.settled_at-time.time()))
+
+    # Delay after switching the RF output on or off
+    # With a model: its delay for the transition, extended to cover pending frequency/power changes
+    # when switching on, or the configured delay if any of them could not be characterized
+    def rf_settling_time(self, transition, configured_time):
+        if self.model is None:
+            return configured_time
+        t = self.model.settling_time(transition)
+        if t is None:
+            t = configured_time
+        if transition == 'rf_on':
+            if self.uncharacterized_change:
+                t = max(t, configured_time)
+            t = max(t, self.settled_at-time.time())
+        return t
+
+    # Note the RF output was switched (pending changes are covered by the delay switching it on)
+    def rf_switched(self, on):
+        self.rf_is_on = on
+        if on:
+            self.uncharacterized_change = False
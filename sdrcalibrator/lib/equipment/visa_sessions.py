@@ -0,0 +1,98 @@
+""" Process-wide VISA sessions shared by the VISA based equipment drivers
+
+One ResourceManager is kept per backend and instrument sessions stay open
+after a driver releases them, so dependency tests and repeated equipment
+initializations reuse them instead of reopening. Resources are only
+enumerated when asked for.
+"""
+import atexit
+import threading
+
+import pyvisa as visa
+
+DEFAULT_BACKEND = '@py'
+
+resource_managers = {} # backend -> ResourceManager
+resource_lists = {} # backend -> cached list_resources() result
+sessions = {} # (backend, resource string) -> open session
+sessions_lock = threading.Lock()
+
+
+# Return the ResourceManager for a backend, creating it on first use
+def get_resource_manager(backend=DEFAULT_BACKEND):
+    with sessions_lock:
+        if backend not in resource_managers:
+            resource_managers[backend] = visa.ResourceManager(backend)
+        return resource_managers[backend]
+
+
+# Enumerate the resources on a backend (scanned once unless a refresh is requested)
+def list_resources(backend=DEFAULT_BACKEND, refresh=False):
+    rm = get_resource_manager(backend)
+    with sessions_lock:
+        if refresh or backend not in resource_lists:
+            resource_lists[backend] = rm.list_resources()
+        return resource_lists[backend]
+
+
+# Check a session opened earlier is still usable
+def session_is_open(session):
+    try:
+        session.session
+        return True
+    except Exception:
+        return False
+
+
+# Open a resource, or reuse the session already open to it
+def open_session(resource_string, backend=DEFAULT_BACKEND, open_timeout=None):
+    key = (backend, resource_string)
+    with sessions_lock:
+        session = sessions.get(key)
+    if session is not None and session_is_open(session):
+        return session
+
+    # Open outside the lock so instruments can be connected to in parallel
+    rm = get_resource_manager(backend)
+    if open_timeout is None:
+        session = rm.open_resource(resource_string)
+    else:
+        session = rm.open_resource(resource_string, open_timeout=open_timeout)
+    with sessions_lock:
+        sessions[key] = session
+    return session
+
+
+# Hand a session back when a driver is done with it (kept open for reuse unless close is set)
+def release_session(session, close=False):
+    if not close:
+        return
+    with sessions_lock:
+        for key in [k for k, s in sessions.items() if s is session]:
+            del sessions[key]
+    try:
+        session.close()
+    except Exception:
+        pass
+
+
+# Close every session and resource manager (run at exit)
+def close_all():
+    with sessions_lock:
+        open_sessions = list(sessions.values())
+        rms = list(resource_managers.values())
+        sessions.clear()
+        resource_managers.clear()
+        resource_lists.clear()
+    for session in open_sessions:
+        try:
+            session.close()
+        except Exception:
+            pass
+    for rm in rms:
+        try:
+            rm.close()
+        except Exception:
+            pass
+
+atexit.register(close_all)
@@ -2,7 +2,6 @@ import numpy as np
 from matplotlib import pyplot as plt
 from copy import copy, deepcopy
 import datetime, json
-import time
 
 import sdrcalibrator.lib.utils.common as utils
 from sdrcalibrator.lib.utils.sdr_test_class import SDR_Test_Class
@@ -228,13 +227,13 @@ class SDR_Test(SDR_Test_Class):
                 # Set SDR sample rate and clock frequency
                 self.logger.log("Setting SDR clock frequency to {}... ".format(
                     self.logger.to_MHz(self.profile.test_clock_frequencies[k])))
-                self.sdr.set_clock_frequency(self.profile.test_clock_frequencies[k])
+                self.apply_sdr_setting('clock_frequency', self.profile.test_clock_frequencies[k])
                 self.logger.logln("Done!")
                 self.logger.log("Setting SDR sample rate to {}... ".format(
                     self.logger.to_MHz(self.profile.test_sample_rates[k])))
-                self.sdr.set_sampling_frequency(self.profile.test_sample_rates[k])
+                self.apply_sdr_setting('sampling_frequency', self.profile.test_sample_rates[k])
                 self.logger.logln("Done!")
-                time.sleep(1)
+                self.wait_for_sdr_ready()
 
                 # Run the noise power measurements
                 self.dependency_test_profile_adjustments = {
@@ -294,13 +293,13 @@ class SDR_Test(SDR_Test_Class):
                 # Set SDR sample rate and clock frequency
                 self.logger.log("Setting SDR clock frequency to {}... ".format(
                     self.logger.to_MHz(self.profile.test_clock_frequencies[k])))
-                self.sdr.set_clock_frequency(self.profile.test_clock_frequencies[k])
+                self.apply_sdr_setting('clock_frequency', self.profile.test_clock_frequencies[k])
                 self.logger.logln("Done!")
                 self.logger.log("Setting SDR sample rate to {}... ".format(
                     self.logger.to_MHz(self.profile.test_sample_rates[k])))
-                self.sdr.set_sampling_frequency(self.profile.test_sample_rates[k])
+                self.apply_sdr_setting('sampling_frequency', self.profile.test_sample_rates[k])
                 self.logger.logln("Done!")
-                time.sleep(1)
+                self.wait_for_sdr_ready()
 
                 # Run the scale factor measurements
                 self.dependency_test_profile_adjustments = {
@@ -371,13 +370,13 @@ class SDR_Test(SDR_Test_Class):
                 # Set SDR sample rate and clock frequency
                 self.logger.log("Setting SDR clock frequency to {}... ".format(
                     self.logger.to_MHz(self.profile.test_clock_frequencies[k])))
-                self.sdr.set_clock_frequency(self.profile.test_clock_frequencies[k])
+                self.apply_sdr_setting('clock_frequency', self.profile.test_clock_frequencies[k])
                 self.logger.logln("Done!")
                 self.logger.log("Setting SDR sample rate to {}... ".format(
                     self.logger.to_MHz(self.profile.test_sample_rates[k])))
-                self.sdr.set_sampling_frequency(self.profile.test_sample_rates[k])
+                self.apply_sdr_setting('sampling_frequency', self.profile.test_sample_rates[k])
                 self.logger.logln("Done!")
-                time.sleep(1)
+                self.wait_for_sdr_ready()
 
                 # Run the bandwidth measurements
                 self.dependency_test_profile_adjustments = {
@@ -460,13 +459,13 @@ class SDR_Test(SDR_Test_Class):
                 # Set SDR sample rate and clock frequency
                 self.logger.log("Setting SDR clock frequency to {}... ".format(
                     self.logger.to_MHz(self.profile.test_clock_frequencies[k])))
-                self.sdr.set_clock_frequency(self.profile.test_clock_frequencies[k])
+                self.apply_sdr_setting('clock_frequency', self.profile.test_clock_frequencies[k])
                 self.logger.logln("Done!")
                 self.logger.log("Setting SDR sample rate to {}... ".format(
                     self.logger.to_MHz(self.profile.test_sample_rates[k])))
-                self.sdr.set_sampling_frequency(self.profile.test_sample_rates[k])
+                self.apply_sdr_setting('sampling_frequency', self.profile.test_sample_rates[k])
                 self.logger.logln("Done!")
-                time.sleep(1)
+                self.wait_for_sdr_ready()
 
                 # Run the compression measurements
                 self.dependency_test_profile_adjustments = {
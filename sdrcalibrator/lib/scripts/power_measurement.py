@@ -36,6 +36,9 @@ class SDR_Test(SDR_Test_Class):
         }
         super(SDR_Test, self).__init__(profile, logger)
 
+        # Set by tests which compute the powers themselves (e.g. in a DSP worker)
+        self.defer_power_computation = False
+
     # Check the profile
     def check_profile(self):
         super(SDR_Test, self).check_profile()
@@ -50,6 +53,22 @@ class SDR_Test(SDR_Test_Class):
 
     # Run the equipment for the test
     def run_test(self):
+        self.acquire_iq_data()
+
+        # Leave the computation to the caller if it is pipelining the DSP
+        if self.defer_power_computation:
+            return
+
+        # Calculate the power each way
+        self.logger.logln("Computing the SDR measured power... ")
+        self.logger.stepin()
+        for k, v in self.compute_measured_powers(self.iq_data, self.actual_f0, self.fs).items():
+            setattr(self, k, v)
+        self.log_measured_powers(self)
+        self.logger.stepout()
+
+    # Acquire the IQ data along with the tuning and stimulus parameters
+    def acquire_iq_data(self):
         
         # Calculate the number of bins if necessary
         self.calculate_fft_num_bins()
@@ -66,51 +85,69 @@ class SDR_Test(SDR_Test_Class):
                 self.iq_dump,
                 self.dependency_test_profile_adjustments
             )
-        self.iq_data = self.iq_dump.iq_data
+        self.iq_data = np.array(self.iq_dump.iq_data) # Copy out of the pooled acquisition buffer
         self.f_f0 = self.iq_dump.f_f0
         self.actual_f0 = self.iq_dump.actual_f0
         self.f_lo = self.sdr.current_lo_frequency()
         self.f_dsp = self.sdr.current_dsp_frequency()
+        self.fs = self.sdr.get_sampling_frequency()
         self.recover_stimulus_parameters_from_dependency_test(self.iq_dump)
 
-        # Calculate the power each way
-        self.logger.logln("Computing the SDR measured power... ")
-        self.logger.stepin()
-        tdip = self.compute_time_domain_averaged_power(
-                self.iq_data
-            )
-        self.time_domain_averaged_power = tdip
-        self.logger.logln("Time domain average: {} dBm".format(tdip))
-        fft, fft_freqs = self.compute_avg_dBm_fft(
-                self.iq_data,
-                self.actual_f0,
-                self.profile.fft_averaging_number
+    # Snapshot of the settings the power computation depends on
+    # (taken with the acquisition, so a DSP worker is not affected by the next point's setup)
+    def get_dsp_settings(self):
+        return {
+            'fft_averaging_number': self.profile.fft_averaging_number,
+            'fft_number_of_bins': self.profile.fft_number_of_bins,
+            'sdr_sampling_frequency': self.profile.sdr_sampling_frequency,
+            'fft_window': self.fft_window,
+            'spectrum_dtype': self.get_precision_dtypes()[1]
+        }
+
+    # Compute the SDR measured power each way
+    # (no logging, equipment or test state access with a settings snapshot, so this can run in a DSP worker)
+    def compute_measured_powers(self, iq_data, f0, fs, dsp=None):
+        if dsp is None:
+            dsp = self.get_dsp_settings()
+        r = {}
+        r['time_domain_averaged_power'] = self.compute_time_domain_averaged_power(
+                iq_data
             )
-        fdip = self.compute_freq_domain_integrated_power(
-                self.iq_data
+        r['freq_domain_integrated_power'] = self.compute_freq_domain_integrated_power(
+                iq_data,
+                dsp['fft_number_of_bins'],
+                dsp['sdr_sampling_frequency'],
+                dsp['fft_window']
             )
-        self.freq_domain_integrated_power = fdip
-        self.logger.logln("Freq domain integrated: {} dBm".format(fdip))
         #fft, fft_freqs = self.compute_avg_dBm_fft(
-        #        self.iq_data,
-        #        self.actual_f0,
-        #        self.profile.fft_averaging_number
+        #        iq_data,
+        #        f0,
+        #        self.profile.fft_averaging_number,
+        #        fs
         #    )
         fft, fft_freqs = self.compute_avg_fft(
-                self.iq_data,
-                self.actual_f0,
-                self.profile.fft_averaging_number
+                iq_data,
+                f0,
+                dsp['fft_averaging_number'],
+                fs,
+                dsp['fft_window'],
+                dsp['spectrum_dtype']
             )
         fft = self.normalize_dBm_fft(fft)
-        self.fft, self.fft_freqs = fft, fft_freqs
+        r['fft'], r['fft_freqs'] = fft, fft_freqs
         nfmp, nfmp_freq = self.compute_normalized_fft_maximum_power_from_fft(
-                self.fft,
-                self.fft_freqs
+                fft,
+                fft_freqs
             )
-        self.normalized_fft_maximum_power = nfmp
-        self.normalized_fft_maximum_power_freq = nfmp_freq
-        self.logger.logln("Normalized FFT max: {} dBm".format(nfmp))
-        self.logger.stepout()
+        r['normalized_fft_maximum_power'] = nfmp
+        r['normalized_fft_maximum_power_freq'] = nfmp_freq
+        return r
+
+    # Log the computed powers of a measurement
+    def log_measured_powers(self, r):
+        self.logger.logln("Time domain average: {} dBm".format(r.time_domain_averaged_power))
+        self.logger.logln("Freq domain integrated: {} dBm".format(r.freq_domain_integrated_power))
+        self.logger.logln("Normalized FFT max: {} dBm".format(r.normalized_fft_maximum_power))
 
     # Save data or construct plot if required
     def save_data(self):
@@ -71,12 +71,7 @@ class SDR_Test(SDR_Test_Class):
     def run_test(self):
         print("RUNNING SDR CONNECTION TEST")
 
-        # Setup stimulus if using it
-        self.f_f0 = self.profile.freq_f0
-        if self.using_stimulus:
-            self.f_f0 = self.setup_stimulus(self.profile.freq_f0, self.profile.power_level)
-        
-        # Tune the SDR the correct frequency
-        self.actual_f0 = self.tune_sdr_to_frequency(self.f_f0)
+        # Setup stimulus if using it and tune the SDR the correct frequency
+        self.f_f0, self.actual_f0 = self.configure_point(self.profile.freq_f0, self.profile.power_level)
 
     
\ No newline at end of file
@@ -0,0 +1,224 @@
+import numpy as np
+import time
+
+from sdrcalibrator.lib.utils.sdr_test_class import SDR_Test_Class
+from sdrcalibrator.lib.utils.sdr_test_error import SDR_Test_Error
+from sdrcalibrator.lib.equipment.sdr.sdr_settling import PROBE_SAMPLES, probe_statistics
+from sdrcalibrator.lib.equipment.siggen.siggen_settling import Settling_Model
+import sdrcalibrator.lib.utils.error as Error
+
+
+class SDR_Test(SDR_Test_Class):
+
+    # Test specific constants
+    TEST_NAME = "Signal Generator Settling Characterization"
+    DETECTORS = {
+        'power_meter': 'pwrmtr',
+        'sdr': 'sdr'
+    }
+
+    # Test constructor
+    def __init__(self, profile, logger=None):
+        self.TEST_PROFILE_DEFINITIONS = {
+            'required_tests': [],
+            'required_profile_parameters': [
+                'test_type',
+                'freq_f0',
+                'power_level'
+            ],
+            'required_equipment': [
+                'siggen',
+                'switch'
+            ],
+            'possible_functionality': [],
+            'profile_parameter_defaults': {
+                'test_settling_detector': 'power_meter',
+                'test_settling_frequency_steps': [1e6, 10e6, 100e6, 1e9],
+                'test_settling_power_steps': [1, 3, 10, 20],
+                'test_settling_repeats': 3,
+                'test_settling_observation_time': 2,
+                'test_settling_reference_time': None,
+                'test_settling_tolerance': 0.1,
+                'test_settling_rf_off_drop': 20,
+                'logging_quiet_mode': False,
+                'logging_save_settling_model': True,
+                'logging_save_log_file': False
+            },
+            'forced_profile_parameters': {
+                'fft_number_of_bins': False,
+                'freq_offset_f0_and_cw': 0,
+                'power_stimulus': None,
+                'power_verification': None,
+                'siggen_settling_model_file': None
+            }
+        }
+        super(SDR_Test, self).__init__(profile, logger)
+
+    # Check the profile
+    def check_profile(self):
+        # Add the equipment used to detect the output
+        detector = 'power_meter'
+        if self.profile_parameter_exists('test_settling_detector'):
+            detector = self.profile.test_settling_detector
+        if detector not in self.DETECTORS:
+            raise SDR_Test_Error(
+                    10,
+                    "Unknown settling detector '{}'".format(detector),
+                    "The profile parameter 'test_settling_detector' must be one of\r\n" +
+                    "{}".format(sorted(self.DETECTORS.keys()))
+                )
+        self.PROFILE_DEFINITIONS['required_equipment'].append(self.DETECTORS[detector])
+        super(SDR_Test, self).check_profile()
+
+    # Initialize the test
+    def initialize_test(self):
+        super(SDR_Test, self).initialize_test()
+
+    # Initialize equipment for the test
+    def initialize_equipment(self):
+        super(SDR_Test, self).initialize_equipment()
+
+    # Run the equipment for the test
+    def run_test(self):
+        self.model = Settling_Model(self.siggen.SIGGEN_NAME)
+        self.measurements = []
+        self.reference_time = self.profile.test_settling_reference_time
+        if self.reference_time is None:
+            self.reference_time = self.profile.siggen_rf_on_settling_time
+
+        # Characterize against the fixed settling times only
+        self.siggen.configure_settling_model(None)
+
+        # Route the signal generator to the detector
+        self.logger.log("Turning switch to the {}... ".format(self.profile.test_settling_detector))
+        if self.profile.test_settling_detector == 'power_meter':
+            self.switch.select_meter()
+        else:
+            self.switch.select_sdr()
+        self.logger.logln("Done!")
+
+        # Start from the base CW
+        f0 = self.profile.freq_f0
+        p0 = self.profile.power_level
+        self.logger.log("Setting up {} CW at {}... ".format(
+                self.logger.to_dBm(p0), self.logger.to_MHz(f0)))
+        self.siggen.tune_to_frequency(f0)
+        self.siggen.set_power(p0)
+        self.logger.logln("Done!")
+        self.tune_detector(f0)
+
+        for n in range(self.profile.test_settling_repeats):
+            self.logger.logln("Characterizing transitions (pass {} of {})...".format(
+                    n+1, self.profile.test_settling_repeats))
+            self.logger.stepin()
+
+            # RF output switching on and off
+            self.siggen.rf_off(settling_time=self.reference_time)
+            self.measure_transition('rf_on', 0, lambda: self.siggen.rf_on(settling_time=0))
+            time.sleep(self.reference_time)
+            p_on = self.take_reading()
+            self.measure_transition(
+                    'rf_off', 0, lambda: self.siggen.rf_off(settling_time=0),
+                    lambda p, final: p <= p_on-self.profile.test_settling_rf_off_drop
+                )
+
+            # Power steps down from the base power and back up (never above it)
+            self.siggen.rf_on(settling_time=self.reference_time)
+            for step in self.profile.test_settling_power_steps:
+                self.measure_transition('power', step, lambda: self.siggen.set_power(p0-step))
+                time.sleep(self.reference_time)
+                self.measure_transition('power', step, lambda: self.siggen.set_power(p0))
+                time.sleep(self.reference_time)
+
+            # Frequency steps up from the base frequency and back, the detector tuned ahead of the step
+            for step in self.profile.test_settling_frequency_steps:
+                self.tune_detector(f0+step)
+                self.measure_transition('frequency', step, lambda: self.siggen.tune_to_frequency(f0+step))
+                time.sleep(self.reference_time)
+                self.tune_detector(f0)
+                self.measure_transition('frequency', step, lambda: self.siggen.tune_to_frequency(f0))
+                time.sleep(self.reference_time)
+            self.siggen.rf_off()
+
+            self.logger.stepout()
+
+        # Summarize the model
+        self.logger.logln("Minimum safe delays:")
+        self.logger.stepin()
+        for transition, steps in [
+                    ('rf_on', [0]),
+                    ('rf_off', [0]),
+                    ('power', self.profile.test_settling_power_steps),
+                    ('frequency', self.profile.test_settling_frequency_steps)
+                ]:
+            for step in sorted(steps):
+                t = self.model.settling_time(transition, step)
+                if t is None:
+                    self.logger.logln("{} step of {}: not characterized (configured settling time applies)".format(
+                            transition, step))
+                else:
+                    self.logger.logln("{} step of {}: {:.3f}s".format(transition, step, t))
+        self.logger.stepout()
+
+    # Tune the detector to where the output is expected
+    def tune_detector(self, f):
+        if self.profile.test_settling_detector == 'power_meter':
+            self.pwrmtr.tune_to_frequency(f)
+        else:
+            self.tune_sdr_to_frequency(f)
+
+    # Take one power reading (dBm from the power meter, uncalibrated dB from the SDR)
+    def take_reading(self):
+        if self.profile.test_settling_detector == 'power_meter':
+            return self.pwrmtr.take_measurement(self.profile.power_level)
+        try:
+            return probe_statistics(self.sdr.take_iq_samples(PROBE_SAMPLES, 0))[1]
+        except self.SDR_Error_Class as e:
+            Error.error_out(self.logger, e)
+
+    # Make a transition and read the output until the observation time has passed
+    # The settling time is when the first reading of the final run within tolerance of the final level
+    # was taken (the output was only known to be settled then). Transitions that did not settle are
+    # left out of the model so the configured settling time applies to them
+    def measure_transition(self, transition, step, make_transition, is_settled=None):
+        if is_settled is None:
+            is_settled = lambda p, final: abs(p-final) <= self.profile.test_settling_tolerance
+        self.logger.log("Measuring {} step of {}... ".format(transition, step))
+        readings = []
+        start_time = time.time()
+        make_transition()
+        while not readings or readings[-1][0] < self.profile.test_settling_observation_time:
+            p = self.take_reading()
+            readings.append((time.time()-start_time, p))
+
+        # Take the final level from the last quarter of the readings
+        final = np.mean([p for t, p in readings[-max(1, len(readings)//4):]])
+        settling_time = None
+        for t, p in readings:
+            if not is_settled(p, final):
+                settling_time = None
+            elif settling_time is None:
+                settling_time = t
+        if settling_time is None or settling_time >= readings[-1][0]:
+            self.logger.logln("Did not settle within {}s!".format(self.profile.test_settling_observation_time))
+            self.measurements.append((transition, step, None, len(readings)))
+            return
+        self.logger.logln("{:.3f}s".format(settling_time))
+        self.model.add_measurement(transition, step, settling_time)
+        self.measurements.append((transition, step, settling_time, len(readings)))
+
+    # Save data or construct plot if required
+    def save_data(self):
+        if self.profile.logging_save_settling_model:
+            self.logger.log("Writing settling model to file... ")
+            self.model.save(self.save_file("siggen_settling_model.json"))
+            with open(self.save_file("settling_measurements.csv"), 'w+') as file:
+                file.write("Transition,Step,Settling time (s),Readings\r\n")
+                for m in self.measurements:
+                    file.write("{},{},{},{}\r\n".format(*m))
+                file.close()
+            self.logger.logln("Done!")
+
+    # Cleanup as necessary
+    def cleanup(self):
+        super(SDR_Test, self).cleanup()
@@ -63,7 +63,7 @@ class SDR_Test(SDR_Test_Class):
                 self.iq_dump,
                 self.dependency_test_profile_adjustments
             )
-        self.iq_data = self.iq_dump.iq_data
+        self.iq_data = np.array(self.iq_dump.iq_data) # Copy out of the pooled acquisition buffer
         self.f_f0 = self.iq_dump.f_f0
         self.actual_f0 = self.iq_dump.actual_f0
 
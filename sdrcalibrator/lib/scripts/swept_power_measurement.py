@@ -4,6 +4,8 @@ from copy import copy, deepcopy
 import time
 
 from sdrcalibrator.lib.utils.sdr_test_class import SDR_Test_Class
+from sdrcalibrator.lib.utils.dsp_pipeline import DSP_Pipeline
+from sdrcalibrator.lib.utils.dictdotaccessor import DictDotAccessor
 from sdrcalibrator.lib.utils.sdr_test_error import SDR_Test_Error
 import sdrcalibrator.lib.utils.error as Error
 
@@ -42,6 +44,9 @@ class SDR_Test(SDR_Test_Class):
                 'test_spur_measurement_remove_ranges': [],
                 'test_spur_danl_num': 10,
                 'test_spur_threshold': 5,
+                'test_dsp_pipeline_depth': 0,
+                'test_siggen_list_sweep': False, # Experimental, not yet verified on hardware
+                'test_siggen_list_trigger': 'bus',
                 'logging_save_test_summary': False
             },
             'forced_profile_parameters': {
@@ -98,6 +103,15 @@ class SDR_Test(SDR_Test_Class):
             err = SDR_Test_Error(10, ehead, ebody)
             Error.error_out(self.logger, err)
 
+        # Check that the list sweep trigger is valid
+        if not self.profile.test_siggen_list_trigger in ['bus', 'software']:
+            ehead = 'Invalid signal generator list sweep trigger'
+            ebody = "List sweep trigger '{}' not supported. Please choose 'bus' or 'software'".format(
+                self.profile.test_siggen_list_trigger
+            )
+            err = SDR_Test_Error(10, ehead, ebody)
+            Error.error_out(self.logger, err)
+
     # Initialize the test
     def initialize_test(self):
         super(SDR_Test, self).initialize_test()
@@ -111,6 +125,165 @@ class SDR_Test(SDR_Test_Class):
         # Compute the sweep parameters
         self.compute_swept_power_sweep_parameters()
 
+        # Start the DSP worker if pipelining acquisitions
+        self.dsp_pipeline = None
+        if self.profile.test_dsp_pipeline_depth > 0:
+            self.logger.log("Starting DSP pipeline ({} acquisitions ahead)... ".format(
+                    self.profile.test_dsp_pipeline_depth))
+            self.dsp_pipeline = DSP_Pipeline(self.profile.test_dsp_pipeline_depth)
+            self.next_pipelined_index = 0
+            self.next_result_index = 0
+            self.logger.logln("Done!")
+
+        # Step the power ramps with the signal generator's list sweep if possible
+        self.siggen_list_sweep = self.use_siggen_list_sweep()
+        try:
+            self.run_sweep()
+        finally:
+            if self.dsp_pipeline is not None:
+                self.dsp_pipeline.stop()
+                self.dsp_pipeline = None
+            if self.siggen_list_sweep:
+                self.siggen.stop_list_sweep()
+
+    # Check whether the power ramps can be preloaded into a signal generator list sweep
+    def use_siggen_list_sweep(self):
+        if not self.profile.test_siggen_list_sweep:
+            return False
+        if not hasattr(self.siggen, 'load_list_sweep'):
+            reason = "the signal generator does not support list sweeps"
+        elif self.profile.sweep_order_3rd != 'power':
+            reason = "power is not the last swept parameter"
+        elif self.profile.power_level_mode == 'attenuator':
+            reason = "power is controlled with the attenuator"
+        else:
+            self.logger.logln("Stepping power ramps with the signal generator list sweep ({} trigger, experimental)...".format(
+                    self.profile.test_siggen_list_trigger))
+            return True
+        self.logger.logln("Not using the signal generator list sweep: {}...".format(reason))
+        return False
+
+    # Preload the output powers of a power ramp, so each point is a single trigger
+    # (the points are matched as setup_stimulus sets the power, anything else falls back to a normal set)
+    def load_siggen_power_ramp(self):
+        gain = self.sdr.get_gain()
+        p_outs = []
+        for power in self.sweep_list_3:
+            p_in = power
+            if self.profile.power_scale_cw_power_with_sdr_gain:
+                p_in -= gain
+            p_outs.append(p_in + self.profile.power_inline_attenuator)
+        self.logger.log("Loading {} point power ramp into the signal generator list sweep... ".format(len(p_outs)))
+        self.siggen.load_list_sweep(powers=p_outs, trigger=self.profile.test_siggen_list_trigger)
+        self.logger.logln("Done!")
+
+    # Get the (frequency, power, gain) of a point in the sweep
+    def get_sweep_point_parameters(self, i, j, k):
+        params = {}
+        params[self.profile.sweep_order_1st] = self.sweep_list_1[i]
+        params[self.profile.sweep_order_2nd] = self.sweep_list_2[j]
+        params[self.profile.sweep_order_3rd] = self.sweep_list_3[k]
+        return params['frequency'], params['power'], params['gain']
+
+    # Get the index of a point in sweep order
+    def get_sweep_point_index(self, i, j, k):
+        return (i*len(self.sweep_list_2) + j)*len(self.sweep_list_3) + k
+
+    # Get the sweep indices of a point from its index in sweep order
+    def get_sweep_point_indices(self, index):
+        ij, k = divmod(index, len(self.sweep_list_3))
+        i, j = divmod(ij, len(self.sweep_list_2))
+        return i, j, k
+
+    # Get a point's result from the DSP pipeline, acquiring ahead so the equipment
+    # works on the next points while the worker reduces this one
+    def get_pipelined_result(self, index):
+        # Collect points that were acquired ahead but skipped (e.g. after compression)
+        while self.next_result_index < min(index, self.next_pipelined_index):
+            self.dsp_pipeline.result(self.next_result_index)
+            self.next_result_index += 1
+
+        # Keep the acquisitions up to the pipeline depth ahead (but not past a possible compression break)
+        self.next_pipelined_index = max(self.next_pipelined_index, index)
+        num_points = len(self.sweep_list_1)*len(self.sweep_list_2)*len(self.sweep_list_3)
+        last_index = min(index+self.profile.test_dsp_pipeline_depth, num_points-1)
+        while (self.next_pipelined_index <= last_index and
+                    self.can_acquire_ahead(index, self.next_pipelined_index)):
+            self.acquire_pipelined_point(self.next_pipelined_index)
+            self.next_pipelined_index += 1
+
+        # Wait for this point's result
+        self.logger.log("Waiting for the DSP pipeline... ")
+        r = self.dsp_pipeline.result(index)
+        self.next_result_index = index + 1
+        self.logger.logln("Done!")
+        self.logger.stepin()
+        self.power_measurement.log_measured_powers(r)
+        self.logger.stepout()
+        return r
+
+    # Whether a point can be acquired while the result for index is pending, without driving the
+    # power ramp past where the compression check could stop it (a break can come at the point
+    # after linearity is first found, so the ramp pauses from there until the results catch up)
+    def can_acquire_ahead(self, index, ahead_index):
+        if not self.profile.test_check_for_compression:
+            return True
+        i, j, k = self.get_sweep_point_indices(index)
+        ahead_i, ahead_j, ahead_k = self.get_sweep_point_indices(ahead_index)
+        steps = self.profile.test_compression_linearity_steps
+        if not (ahead_i, ahead_j) == (i, j):
+            # A later ramp starts over, needing its first points to find linearity
+            return ahead_k <= steps
+        if self.linearity_achieved:
+            # The compression check is active, so the pending point may be the break
+            return ahead_k <= k
+        return ahead_k <= max(k, steps-1)+1
+
+    # Acquire a point and queue its power computation in the DSP pipeline
+    def acquire_pipelined_point(self, index):
+        i, j, k = self.get_sweep_point_indices(index)
+        f0, power, gain = self.get_sweep_point_parameters(i, j, k)
+        self.logger.logln("Acquiring point {} ({}, {}, gain of {}dB) for the DSP pipeline...".format(
+                index, self.logger.to_MHz(f0), self.logger.to_dBm(power), gain))
+        self.logger.stepin()
+
+        # Set the sdr gain and acquire without computing the powers
+        self.set_sdr_gain(gain)
+        if self.siggen_list_sweep and k == 0:
+            self.load_siggen_power_ramp()
+        self.power_measurement.defer_power_computation = True
+        try:
+            self.run_dependency_test(
+                self.power_measurement,
+                {
+                    'freq_f0': f0,
+                    'power_level': power,
+                    'sdr_gain': gain
+                }
+            )
+        finally:
+            self.power_measurement.defer_power_computation = False
+
+        # The power measurement keeps its own copy of each acquisition, so it can be queued as is
+        r = self.power_measurement
+
+        # Snapshot the point's parameters and DSP settings and queue the computation
+        point = {}
+        for param in ['f_f0', 'actual_f0', 'f_lo', 'f_dsp', 'f_cw', 'p_out', 'p_in', 'measured_power']:
+            point[param] = getattr(r, param, None)
+        point['dsp'] = r.get_dsp_settings()
+        self.dsp_pipeline.submit(index, self.compute_pipelined_point, point, r.iq_data, r.fs)
+        self.logger.stepout()
+
+    # Compute a point's powers in the DSP worker (only from the snapshot taken with the acquisition)
+    def compute_pipelined_point(self, point, iq_data, fs):
+        point.update(self.power_measurement.compute_measured_powers(
+                iq_data, point['actual_f0'], fs, point.pop('dsp')))
+        return DictDotAccessor(point)
+
+    # Run the sweep over all parameters
+    def run_sweep(self):
+
         # Initialize the data arrays
         empty_data = np.zeros((
             len(self.sweep_list_1),
@@ -208,22 +381,28 @@ class SDR_Test(SDR_Test_Class):
                     # Dump the logger file before running the test
                     self.logger.flush()
 
-                    # Set the sdr gain
-                    self.set_sdr_gain(gain)
-
-                    # Run the power measurement
-                    self.dependency_test_profile_adjustments = {
-                        'freq_f0': f0,
-                        'power_level': power,
-                        'sdr_gain': gain
-                    }
-                    self.run_dependency_test(
-                        self.power_measurement,
-                        self.dependency_test_profile_adjustments
-                    )
-
-                    # Recover the resultant data
-                    r = self.power_measurement
+                    if self.dsp_pipeline is not None:
+                        # Get the result from the pipeline (acquiring ahead as needed)
+                        r = self.get_pipelined_result(self.get_sweep_point_index(i, j, k))
+                    else:
+                        # Set the sdr gain and preload the power ramp
+                        self.set_sdr_gain(gain)
+                        if self.siggen_list_sweep and k == 0:
+                            self.load_siggen_power_ramp()
+
+                        # Run the power measurement
+                        self.dependency_test_profile_adjustments = {
+                            'freq_f0': f0,
+                            'power_level': power,
+                            'sdr_gain': gain
+                        }
+                        self.run_dependency_test(
+                            self.power_measurement,
+                            self.dependency_test_profile_adjustments
+                        )
+
+                        # Recover the resultant data
+                        r = self.power_measurement
                     self.f_f0s[i][j][k] = r.f_f0
                     self.actual_f0s[i][j][k] = r.actual_f0
                     self.f_los[i][j][k] = r.f_lo
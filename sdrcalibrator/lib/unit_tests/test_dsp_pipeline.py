@@ -0,0 +1,46 @@
+""" Test the background DSP worker """
+
+import threading
+import pytest
+from sdrcalibrator.lib.utils.dsp_pipeline import DSP_Pipeline
+
+class TestDSPPipeline:
+
+    @pytest.fixture(autouse=True)
+    def pipeline(self):
+        self.pipeline = DSP_Pipeline()
+        yield
+        self.pipeline.stop()
+
+    def test_result(self):
+        self.pipeline.submit('a', pow, 2, 10)
+        assert self.pipeline.result('a') == 1024
+
+    def test_results_by_key(self):
+        self.pipeline.submit('a', pow, 2, 1)
+        self.pipeline.submit('b', pow, 2, 2)
+        self.pipeline.submit('c', pow, 2, 3)
+        assert self.pipeline.result('c') == 8
+        assert self.pipeline.result('a') == 2
+        assert self.pipeline.result('b') == 4
+
+    def test_exception_is_reraised(self):
+        def fail():
+            raise ValueError("bad data")
+        self.pipeline.submit('a', fail)
+        with pytest.raises(ValueError):
+            self.pipeline.result('a')
+
+    def test_runs_in_submission_order(self):
+        ran = []
+        for i in range(5):
+            self.pipeline.submit(i, ran.append, i)
+        self.pipeline.result(4)
+        assert ran == [0, 1, 2, 3, 4]
+
+    def test_reduction_runs_in_background(self):
+        # The job waits for the caller, so this only completes if it runs on another thread
+        barrier = threading.Barrier(2, timeout=5)
+        self.pipeline.submit('a', barrier.wait)
+        barrier.wait()
+        self.pipeline.result('a')
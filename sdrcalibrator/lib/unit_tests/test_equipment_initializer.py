@@ -0,0 +1,122 @@
+""" Test the parallel equipment initialization """
+
+import threading
+from sdrcalibrator.lib.utils.logging import Logger
+from sdrcalibrator.lib.utils.equipment_initializer import Equipment_Initializer
+
+class RecordingLogger(Logger):
+
+    """ Quiet logger remembering what was logged as an error """
+    def __init__(self):
+        Logger.__init__(self, quiet_mode=True, log_to_file=True)
+        self.errors = []
+
+    def log(self, s="", indent=None, override_quiet_mode=False, is_error=False):
+        if is_error:
+            self.errors.append(s)
+            override_quiet_mode = False # Keep the test output clean
+            is_error = False
+        Logger.log(self, s, indent=indent, override_quiet_mode=override_quiet_mode, is_error=is_error)
+
+class FakeOwner:
+
+    """ Just the logger the initialization functions log through """
+    def __init__(self):
+        self.logger = RecordingLogger()
+
+class TestEquipmentInitializer:
+
+    """ Initializer with jobs recording when they ran """
+    def make_initializer(self, jobs, parallel=True):
+        initializer = Equipment_Initializer(FakeOwner(), parallel)
+        self.ran = []
+        for name, depends_on in jobs:
+            initializer.add(name, name, self.make_job(name), depends_on=depends_on)
+        return initializer
+
+    def make_job(self, name, error=None):
+        def job():
+            self.ran.append(name)
+            if error is not None:
+                raise error
+            return name.upper()
+        return job
+
+    """ Names in each wave """
+    def wave_names(self, initializer):
+        return [sorted(j['name'] for j in wave) for wave in initializer.waves()]
+
+    def test_independent_jobs_share_a_wave(self):
+        initializer = self.make_initializer([('sdr', None), ('siggen', None), ('pwrmtr', None)])
+        assert self.wave_names(initializer) == [['pwrmtr', 'sdr', 'siggen']]
+
+    def test_dependencies_go_in_later_waves(self):
+        initializer = self.make_initializer([
+                ('switch', ['siggen']),
+                ('sdr', None),
+                ('siggen', None),
+                ('atten', ['switch'])
+            ])
+        assert self.wave_names(initializer) == [['sdr', 'siggen'], ['switch'], ['atten']]
+
+    def test_equipment_not_in_use_is_ignored(self):
+        initializer = self.make_initializer([('switch', ['siggen', 'pwrmtr']), ('siggen', None)])
+        assert self.wave_names(initializer) == [['siggen'], ['switch']]
+
+    def test_run_returns_results(self):
+        initializer = self.make_initializer([('sdr', None), ('siggen', ['sdr'])])
+        assert initializer.run() is None
+        assert initializer.results == {'sdr': 'SDR', 'siggen': 'SIGGEN'}
+        assert self.ran == ['sdr', 'siggen']
+        assert sorted(initializer.initialized) == ['sdr', 'siggen']
+
+    def test_failures_stop_later_waves(self):
+        initializer = Equipment_Initializer(FakeOwner())
+        self.ran = []
+        initializer.add('sdr', 'sdr', self.make_job('sdr', ValueError("no sdr")))
+        initializer.add('switch', 'switch', self.make_job('switch'), depends_on=['sdr'])
+        name, e = initializer.run()
+        assert name == 'sdr'
+        assert isinstance(e, ValueError)
+        assert not 'switch' in self.ran
+
+    def test_every_failure_in_a_wave_is_recorded(self):
+        initializer = Equipment_Initializer(FakeOwner())
+        self.ran = []
+        initializer.add('sdr', 'sdr', self.make_job('sdr', ValueError("no sdr")))
+        initializer.add('siggen', 'siggen', self.make_job('siggen', ValueError("no siggen")))
+        initializer.add('pwrmtr', 'pwrmtr', self.make_job('pwrmtr'))
+        assert initializer.run() is not None
+        assert sorted(initializer.failed) == ['sdr', 'siggen']
+        assert initializer.initialized == ['pwrmtr']
+
+    def test_jobs_in_a_wave_run_concurrently(self):
+        # Each job waits for the other, so this only completes if they run at the same time
+        barrier = threading.Barrier(2, timeout=5)
+        initializer = Equipment_Initializer(FakeOwner())
+        initializer.add('sdr', 'sdr', barrier.wait)
+        initializer.add('siggen', 'siggen', barrier.wait)
+        assert initializer.run() is None
+
+    def test_serial_initialization(self):
+        initializer = self.make_initializer([('sdr', None), ('siggen', None)], parallel=False)
+        assert initializer.run() is None
+        assert self.ran == ['sdr', 'siggen']
+
+    def test_threaded_logs_are_replayed_in_job_order(self):
+        owner = FakeOwner()
+        initializer = Equipment_Initializer(owner)
+        initializer.add('sdr', 'SDR', lambda: owner.logger.logln("sdr step"))
+        initializer.add('siggen', 'signal generator', lambda: owner.logger.logln("siggen step"))
+        assert initializer.run() is None
+        log = owner.logger.log_buffer
+        assert log.index("Initializing SDR") < log.index("sdr step") < log.index("Initializing signal generator")
+        assert log.index("Initializing signal generator") < log.index("siggen step")
+        assert "    Initialized SDR in " in log
+
+    def test_threaded_errors_are_replayed_as_errors(self):
+        owner = FakeOwner()
+        initializer = Equipment_Initializer(owner)
+        initializer.add('sdr', 'SDR', lambda: owner.logger.logln("SDR failed", is_error=True))
+        assert initializer.run() is None
+        assert owner.logger.errors == ["SDR failed\r\n"]
@@ -0,0 +1,47 @@
+""" Test the pooled IQ buffers """
+
+import numpy as np
+from sdrcalibrator.lib.utils.iq_buffer_pool import IQ_Buffer_Pool
+
+class TestIQBufferPool:
+
+    def test_default_dtype(self):
+        pool = IQ_Buffer_Pool()
+        buf = pool.get(10)
+        assert len(buf) == 10
+        assert buf.dtype == np.complex128
+
+    def test_same_key_reuses_buffer(self):
+        pool = IQ_Buffer_Pool()
+        a = pool.get(100)
+        b = pool.get(100)
+        assert np.shares_memory(a, b)
+
+    def test_smaller_request_is_a_view(self):
+        pool = IQ_Buffer_Pool()
+        a = pool.get(100)
+        b = pool.get(10)
+        assert len(b) == 10
+        assert np.shares_memory(a, b)
+
+    def test_buffer_grows(self):
+        pool = IQ_Buffer_Pool()
+        pool.get(10)
+        b = pool.get(100)
+        assert len(b) == 100
+        assert np.shares_memory(pool.get(10), b)
+
+    def test_keys_and_dtypes_are_separate(self):
+        pool = IQ_Buffer_Pool()
+        a = pool.get(10)
+        b = pool.get(10, key='raw')
+        c = pool.get(10, dtype=np.complex64)
+        assert c.dtype == np.complex64
+        assert not np.shares_memory(a, b)
+        assert not np.shares_memory(a, c)
+
+    def test_clear(self):
+        pool = IQ_Buffer_Pool()
+        a = pool.get(10)
+        pool.clear()
+        assert not np.shares_memory(a, pool.get(10))
@@ -0,0 +1,102 @@
+""" Test reading IEEE 488.2 definite length binary blocks """
+
+import pytest
+import numpy as np
+from sdrcalibrator.lib.equipment.sdr.sdr_error import SDR_Error
+import sdrcalibrator.lib.equipment.sdr.scpi_block as scpi_block
+
+class FakeSession:
+
+    """ Read a response like vxi11: up to num bytes, or to the end of the message, failing once
+        the message has been read (a real read would time out). max_read limits the bytes per
+        bounded read, as a backend returning partial reads would. """
+    def __init__(self, response, max_read=None):
+        self.response = response
+        self.pos = 0
+        self.max_read = max_read
+        self.read_sizes = []
+
+    def read_raw(self, num=-1):
+        if self.pos >= len(self.response):
+            raise IOError("read_raw timed out")
+        end = len(self.response) if num < 0 else self.pos+num
+        if num >= 0 and self.max_read is not None:
+            end = min(end, self.pos+self.max_read)
+        data = self.response[self.pos:end]
+        self.pos += len(data)
+        self.read_sizes.append(len(data))
+        return data
+
+class TestScpiBlock:
+
+    """ Build a block response around some data """
+    def make_block(self, data, terminator=b'\n'):
+        length = str(len(data)).encode()
+        return b'#' + str(len(length)).encode() + length + data + terminator
+
+    @pytest.mark.parametrize('terminator', [b'\n', b'\r\n', b''])
+    @pytest.mark.parametrize('chunk_size', [1, 7, 800, 10000])
+    def test_reads_block_in_chunks(self, terminator, chunk_size):
+        iq = (np.arange(100) + 1j*np.arange(100)).astype('<c8')
+        session = FakeSession(self.make_block(iq.tobytes(), terminator))
+        data = scpi_block.read_definite_length_block(session, 'Fake SA', '<c8', chunk_size)
+        assert session.pos == len(session.response)
+        assert max(session.read_sizes[2:]) <= chunk_size+len(terminator) # After the header
+        assert data.dtype == np.dtype('<c8')
+        assert data.flags.writeable
+        assert np.array_equal(data, iq)
+
+    def test_partial_reads(self):
+        payload = bytes(range(256))*4
+        session = FakeSession(self.make_block(payload), max_read=3)
+        data = scpi_block.read_definite_length_block(session, 'Fake SA', chunk_size=100)
+        assert data.tobytes() == payload
+        assert session.pos == len(session.response)
+
+    def test_incomplete_block_read(self):
+        session = FakeSession(self.make_block(b'\x00'*16)[:-4])
+        with pytest.raises(SDR_Error) as e:
+            scpi_block.read_definite_length_block(session, 'Fake SA')
+        assert "Received 13 of 16 bytes" in str(e.value)
+
+    def test_malformed_header_read(self):
+        with pytest.raises(SDR_Error):
+            scpi_block.read_definite_length_block(FakeSession(b'1,2,3\n'), 'Fake SA')
+
+    def test_multi_digit_length(self):
+        payload = bytes(range(256))*40 # 10240 bytes, a 5 digit length
+        data = scpi_block.parse_definite_length_block(self.make_block(payload), 'Fake SA')
+        assert data.tobytes() == payload
+
+    def test_data_containing_terminator_bytes(self):
+        payload = b'\n\n\r\n#1'
+        data = scpi_block.parse_definite_length_block(self.make_block(payload), 'Fake SA')
+        assert data.tobytes() == payload
+
+    @pytest.mark.parametrize('raw', [
+        b'',
+        b'1,2,3\n',
+        b'#0\n',
+        b'#A12\n',
+        b'#3 1\n',
+        b'#4123'
+    ])
+    def test_malformed_header(self, raw):
+        with pytest.raises(SDR_Error):
+            scpi_block.parse_definite_length_block(raw, 'Fake SA')
+
+    def test_incomplete_block(self):
+        raw = self.make_block(b'\x00'*16)[:-4]
+        with pytest.raises(SDR_Error) as e:
+            scpi_block.parse_definite_length_block(raw, 'Fake SA')
+        assert "Received 13 of 16 bytes" in str(e.value)
+
+    def test_trailing_data(self):
+        raw = self.make_block(b'\x00'*16, terminator=b'\x00\n')
+        with pytest.raises(SDR_Error):
+            scpi_block.parse_definite_length_block(raw, 'Fake SA')
+
+    def test_partial_values(self):
+        raw = self.make_block(b'\x00'*12)
+        with pytest.raises(SDR_Error):
+            scpi_block.parse_definite_length_block(raw, 'Fake SA', dtype=np.complex64)
@@ -0,0 +1,53 @@
+""" Test the SCPI parameter set read back policies """
+
+from sdrcalibrator.lib.utils.scpi_set_policy import SCPI_Set_Policy
+
+class TestSCPISetPolicy:
+
+    """ Which of n sets of a command would be read back """
+    def verified_sets(self, policy, n, cmd=':FREQ'):
+        return [i for i in range(n) if policy.should_verify(cmd)]
+
+    def test_always_verifies_every_set(self):
+        policy = SCPI_Set_Policy('always')
+        assert self.verified_sets(policy, 5) == [0, 1, 2, 3, 4]
+
+    def test_always_never_skips(self):
+        policy = SCPI_Set_Policy('always')
+        policy.record(':FREQ', 1e9)
+        assert not policy.is_applied(':FREQ', 1e9)
+
+    def test_on_change_skips_applied_value(self):
+        policy = SCPI_Set_Policy('on-change')
+        assert not policy.is_applied(':FREQ', 1e9)
+        policy.record(':FREQ', 1e9)
+        assert policy.is_applied(':FREQ', 1e9)
+        assert not policy.is_applied(':FREQ', 2e9)
+        assert not policy.is_applied(':POW', 1e9)
+
+    def test_invalidate(self):
+        policy = SCPI_Set_Policy('on-change')
+        policy.record(':FREQ', 1e9)
+        policy.invalidate()
+        assert not policy.is_applied(':FREQ', 1e9)
+
+    def test_sampled_verifies_first_of_each_interval(self):
+        policy = SCPI_Set_Policy('sampled', sample_interval=3)
+        assert self.verified_sets(policy, 7) == [0, 3, 6]
+
+    def test_sampled_counts_per_command(self):
+        policy = SCPI_Set_Policy('sampled', sample_interval=3)
+        assert policy.should_verify(':FREQ')
+        assert policy.should_verify(':POW')
+        assert not policy.should_verify(':FREQ')
+
+    def test_sample_interval_at_least_one(self):
+        policy = SCPI_Set_Policy('sampled', sample_interval=0)
+        assert self.verified_sets(policy, 3) == [0, 1, 2]
+
+    def test_summary(self):
+        policy = SCPI_Set_Policy()
+        policy.should_verify(':FREQ')
+        policy.count_round_trips(':FREQ')
+        policy.count_round_trips(':FREQ', 2)
+        assert policy.summary() == [":FREQ: 1 sets, 3 round-trips"]
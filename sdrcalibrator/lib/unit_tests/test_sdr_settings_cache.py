@@ -0,0 +1,115 @@
+""" Test the cache of settings applied to the SDR """
+
+import pytest
+from sdrcalibrator.lib.utils.sdr_settings_cache import SDR_Settings_Cache
+
+class FakeSDR:
+
+    """ Record the setter calls, returning a distinct "actual" value for each """
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, name):
+        if not name.startswith('set_') and not name == 'tune_to_frequency':
+            raise AttributeError(name)
+        def setter(value):
+            self.calls.append((name, value))
+            return (name, value, len(self.calls))
+        return setter
+
+class FailingSDR(FakeSDR):
+
+    """ Fail the first gain set """
+    def __init__(self):
+        super().__init__()
+        self.failed = False
+
+    def set_gain(self, value):
+        self.calls.append(('set_gain', value))
+        if not self.failed:
+            self.failed = True
+            raise RuntimeError("gain set failed")
+        return value
+
+class TestSDRSettingsCache:
+
+    def test_miss_calls_the_setter(self):
+        sdr = FakeSDR()
+        cache = SDR_Settings_Cache(sdr)
+        assert cache.apply('gain', 10) == ('set_gain', 10, 1)
+        assert sdr.calls == [('set_gain', 10)]
+        assert cache.misses == {'gain': 1}
+
+    def test_hit_skips_the_setter(self):
+        sdr = FakeSDR()
+        cache = SDR_Settings_Cache(sdr)
+        first = cache.apply('frequency', 1e9)
+        assert cache.apply('frequency', 1e9) == first
+        assert sdr.calls == [('tune_to_frequency', 1e9)]
+        assert cache.hits == {'frequency': 1}
+
+    def test_changed_value_is_a_miss(self):
+        sdr = FakeSDR()
+        cache = SDR_Settings_Cache(sdr)
+        cache.apply('gain', 10)
+        cache.apply('gain', 20)
+        cache.apply('gain', 10)
+        assert [v for s, v in sdr.calls] == [10, 20, 10]
+
+    def test_disabled_cache_always_sets(self):
+        sdr = FakeSDR()
+        cache = SDR_Settings_Cache(sdr, enabled=False)
+        cache.apply('gain', 10)
+        cache.apply('gain', 10)
+        assert len(sdr.calls) == 2
+
+    @pytest.mark.parametrize('setting', list(SDR_Settings_Cache.INVALIDATES.keys()))
+    def test_setting_invalidates_dependent_settings(self, setting):
+        sdr = FakeSDR()
+        cache = SDR_Settings_Cache(sdr)
+        others = [s for s in SDR_Settings_Cache.SETTERS if not s == setting]
+        for s in others:
+            cache.apply(s, 1)
+        cache.apply(setting, 1)
+        sdr.calls = []
+        for s in others:
+            cache.apply(s, 1)
+        reapplied = [SDR_Settings_Cache.SETTERS[s] for s in SDR_Settings_Cache.INVALIDATES[setting]]
+        assert sorted(name for name, v in sdr.calls) == sorted(reapplied)
+
+    def test_clock_change_invalidates_everything_else(self):
+        assert sorted(SDR_Settings_Cache.INVALIDATES['clock_frequency']) == sorted(
+                s for s in SDR_Settings_Cache.SETTERS if not s == 'clock_frequency')
+
+    def test_unchanged_setting_does_not_invalidate(self):
+        sdr = FakeSDR()
+        cache = SDR_Settings_Cache(sdr)
+        cache.apply('sampling_frequency', 1e6)
+        cache.apply('frequency', 1e9)
+        cache.apply('sampling_frequency', 1e6)
+        cache.apply('frequency', 1e9)
+        assert len(sdr.calls) == 2
+
+    def test_invalidate_everything(self):
+        sdr = FakeSDR()
+        cache = SDR_Settings_Cache(sdr)
+        cache.apply('gain', 10)
+        cache.apply('frequency', 1e9)
+        cache.invalidate()
+        cache.apply('gain', 10)
+        cache.apply('frequency', 1e9)
+        assert len(sdr.calls) == 4
+
+    def test_failed_set_is_retried(self):
+        sdr = FailingSDR()
+        cache = SDR_Settings_Cache(sdr)
+        with pytest.raises(RuntimeError):
+            cache.apply('gain', 10)
+        assert cache.apply('gain', 10) == 10
+        assert sdr.calls == [('set_gain', 10), ('set_gain', 10)]
+
+    def test_summary(self):
+        cache = SDR_Settings_Cache(FakeSDR())
+        cache.apply('gain', 10)
+        cache.apply('gain', 10)
+        assert cache.summary() == ["gain: 1 hits, 1 misses"]
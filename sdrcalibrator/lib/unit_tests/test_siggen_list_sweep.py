@@ -0,0 +1,107 @@
+""" Test the signal generator list sweep point matching """
+
+import pytest
+from sdrcalibrator.lib.equipment.siggen.siggen_settling import Settling_Tracker
+
+SIGGEN_MODULES = [
+    'sdrcalibrator.lib.equipment.siggen.e4438c',
+    'sdrcalibrator.lib.equipment.siggen.e8663b',
+    'sdrcalibrator.lib.equipment.siggen.n5182b'
+]
+
+class FakeVisaSession:
+
+    """ Record the SCPI traffic instead of talking to an instrument """
+    def __init__(self):
+        self.writes = []
+        self.queries = []
+
+    def write(self, cmd):
+        self.writes.append(cmd)
+
+    def query(self, cmd):
+        self.queries.append(cmd)
+        self.writes.append(cmd)
+        return "1"
+
+class TestSiggenListSweep:
+
+    """ Create a driver talking to a fake session (the drivers need pyvisa/gnuradio to import) """
+    def make_siggen(self, module_name):
+        module = pytest.importorskip(module_name)
+        siggen = module.Signal_Generator()
+        siggen.siggen = FakeVisaSession()
+        siggen.settling = Settling_Tracker()
+        siggen.max_output_power = 10
+        siggen.list_sweep = None
+        return siggen
+
+    """ Commands written since the last check """
+    def new_writes(self, siggen):
+        writes = siggen.siggen.writes
+        siggen.siggen.writes = []
+        return writes
+
+    @pytest.mark.parametrize('module_name', SIGGEN_MODULES)
+    def test_load_does_not_wait_on_armed_sweep(self, module_name):
+        siggen = self.make_siggen(module_name)
+        siggen.load_list_sweep(powers=[-30, -20, -10])
+        writes = self.new_writes(siggen)
+        assert writes[-1] == ':INITiate'
+        assert writes.index('*OPC?') < writes.index(':INITiate')
+
+    @pytest.mark.parametrize('module_name', SIGGEN_MODULES)
+    def test_current_point_matches_without_trigger(self, module_name):
+        siggen = self.make_siggen(module_name)
+        siggen.load_list_sweep(powers=[-30, -20, -10])
+        self.new_writes(siggen)
+        siggen.set_power(-30)
+        assert self.new_writes(siggen) == []
+        assert siggen.list_sweep['index'] == 0
+
+    @pytest.mark.parametrize('module_name', SIGGEN_MODULES)
+    @pytest.mark.parametrize('trigger,trigger_cmd', [('bus', '*TRG'), ('software', ':TRIGger')])
+    def test_next_point_advances_with_one_trigger(self, module_name, trigger, trigger_cmd):
+        siggen = self.make_siggen(module_name)
+        siggen.load_list_sweep(powers=[-30, -20, -10], trigger=trigger)
+        self.new_writes(siggen)
+        siggen.set_power(-20)
+        assert self.new_writes(siggen) == [trigger_cmd]
+        siggen.set_power(-10)
+        assert self.new_writes(siggen) == [trigger_cmd]
+        assert siggen.list_sweep['index'] == 2
+        assert siggen.settling.power == -10
+
+    @pytest.mark.parametrize('module_name', SIGGEN_MODULES)
+    def test_off_list_value_falls_back_to_fixed_set(self, module_name):
+        siggen = self.make_siggen(module_name)
+        siggen.load_list_sweep(powers=[-30, -20, -10])
+        siggen.set_power(-20)
+        self.new_writes(siggen)
+        siggen.set_power(-5)
+        writes = self.new_writes(siggen)
+        assert siggen.list_sweep is None
+        assert not '*TRG' in writes
+        # Held at the current point in fixed mode, then set directly
+        assert writes.index(':POWer -20DBM') < writes.index(':POWer:MODE FIXed')
+        assert writes[-1] == ':POWer -5DBM'
+
+    @pytest.mark.parametrize('module_name', SIGGEN_MODULES)
+    def test_skipping_a_point_falls_back_to_fixed_set(self, module_name):
+        siggen = self.make_siggen(module_name)
+        siggen.load_list_sweep(powers=[-30, -20, -10])
+        self.new_writes(siggen)
+        siggen.set_power(-10)
+        writes = self.new_writes(siggen)
+        assert siggen.list_sweep is None
+        assert writes[-1] == ':POWer -10DBM'
+
+    @pytest.mark.parametrize('module_name', SIGGEN_MODULES)
+    def test_unswept_parameter_is_set_directly(self, module_name):
+        siggen = self.make_siggen(module_name)
+        siggen.load_list_sweep(powers=[-30, -20, -10])
+        self.new_writes(siggen)
+        siggen.tune_to_frequency(1e9)
+        writes = self.new_writes(siggen)
+        assert len(writes) == 1 and writes[0].startswith(':FREQuency ')
+        assert siggen.list_sweep is not None
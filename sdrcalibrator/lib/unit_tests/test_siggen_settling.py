@@ -0,0 +1,143 @@
+""" Test the learned signal generator settling times """
+
+import pytest
+import sdrcalibrator.lib.equipment.siggen.siggen_settling as siggen_settling
+from sdrcalibrator.lib.equipment.siggen.siggen_settling import Settling_Model, Settling_Tracker
+
+class FakeClock:
+
+    """ Stand in for time.time/time.sleep so the delays can be checked without waiting """
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, t):
+        self.sleeps.append(t)
+        self.now += max(0, t)
+
+class TestSettlingModel:
+
+    """ Model with a few characterized power steps (no safety margin, to keep the numbers exact) """
+    def make_model(self):
+        model = Settling_Model('Fake siggen', safety_margin=1)
+        model.add_measurement('power', 1, 0.2)
+        model.add_measurement('power', 10, 0.1)
+        model.add_measurement('power', 20, 0.5)
+        model.add_measurement('rf_on', 0, 0.3)
+        return model
+
+    def test_uncharacterized_transition(self):
+        assert self.make_model().settling_time('frequency', 1e6) is None
+
+    def test_step_larger_than_characterized(self):
+        assert self.make_model().settling_time('power', 21) is None
+
+    def test_characterized_step(self):
+        assert self.make_model().settling_time('power', 20) == 0.5
+
+    def test_uses_worst_time_up_to_bounding_step(self):
+        model = self.make_model()
+        # A step of 5 is bounded by the step of 10, but the step of 1 took longer
+        assert model.settling_time('power', 5) == 0.2
+        assert model.settling_time('power', 10) == 0.2
+        assert model.settling_time('power', 0.5) == 0.2
+
+    def test_step_direction_is_ignored(self):
+        model = self.make_model()
+        assert model.settling_time('power', -15) == model.settling_time('power', 15)
+
+    def test_rf_switching_has_no_step(self):
+        assert self.make_model().settling_time('rf_on') == 0.3
+
+    def test_safety_margin(self):
+        model = Settling_Model(safety_margin=2)
+        model.add_measurement('power', 1, 0.2)
+        assert model.settling_time('power', 1) == pytest.approx(0.4)
+
+    def test_save_and_load(self, tmp_path):
+        model = self.make_model()
+        fname = str(tmp_path / "settling_model.json")
+        model.save(fname)
+        loaded = Settling_Model.load(fname)
+        assert loaded.siggen_name == 'Fake siggen'
+        assert loaded.safety_margin == 1
+        assert loaded.points == model.points
+
+class TestSettlingTracker:
+
+    @pytest.fixture(autouse=True)
+    def fake_clock(self, monkeypatch):
+        self.clock = FakeClock()
+        monkeypatch.setattr(siggen_settling, 'time', self.clock)
+
+    """ Tracker at a known output state with the RF off """
+    def make_tracker(self, model=True):
+        if model:
+            model = Settling_Model(safety_margin=1)
+            model.add_measurement('power', 10, 0.1)
+            model.add_measurement('frequency', 1e6, 0.05)
+            model.add_measurement('rf_on', 0, 0.02)
+            model.add_measurement('rf_off', 0, 0.01)
+        else:
+            model = None
+        tracker = Settling_Tracker(model)
+        tracker.power_changed(-20)
+        tracker.frequency_changed(1e9)
+        tracker.rf_switched(True)
+        tracker.rf_switched(False)
+        self.clock.sleeps = []
+        return tracker
+
+    def test_without_model_uses_configured_times(self):
+        tracker = self.make_tracker(model=False)
+        tracker.power_changed(-10)
+        assert self.clock.sleeps == []
+        assert tracker.rf_settling_time('rf_on', 1) == 1
+        assert tracker.rf_settling_time('rf_off', 0.5) == 0.5
+
+    def test_rf_on_uses_model_time(self):
+        tracker = self.make_tracker()
+        assert tracker.rf_settling_time('rf_on', 1) == pytest.approx(0.02)
+        assert tracker.rf_settling_time('rf_off', 1) == pytest.approx(0.01)
+
+    def test_changes_with_rf_off_are_left_pending(self):
+        tracker = self.make_tracker()
+        tracker.power_changed(-25)
+        assert self.clock.sleeps == []
+        # Switching on waits for the pending power step rather than just the RF on time
+        assert tracker.rf_settling_time('rf_on', 1) == pytest.approx(0.1)
+
+    def test_pending_change_time_elapses(self):
+        tracker = self.make_tracker()
+        tracker.power_changed(-25)
+        self.clock.now += 0.09
+        assert tracker.rf_settling_time('rf_on', 1) == pytest.approx(0.02)
+
+    def test_uncharacterized_change_uses_configured_time(self):
+        tracker = self.make_tracker()
+        tracker.frequency_changed(2e9)
+        assert tracker.rf_settling_time('rf_on', 1) == 1
+        tracker.rf_switched(True)
+        tracker.rf_switched(False)
+        assert tracker.rf_settling_time('rf_on', 1) == pytest.approx(0.02)
+
+    def test_changes_with_rf_on_wait_straight_away(self):
+        tracker = self.make_tracker()
+        tracker.rf_switched(True)
+        tracker.frequency_changed(1e9+1e6)
+        assert sum(self.clock.sleeps) == pytest.approx(0.05)
+
+    def test_unchanged_value_does_not_wait(self):
+        tracker = self.make_tracker()
+        tracker.rf_switched(True)
+        tracker.power_changed(-20)
+        assert self.clock.sleeps == []
+
+    def test_reset_forgets_output_state(self):
+        tracker = self.make_tracker()
+        tracker.reset()
+        tracker.power_changed(-20)
+        assert tracker.rf_settling_time('rf_on', 1) == 1
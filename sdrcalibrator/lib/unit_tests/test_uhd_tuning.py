@@ -0,0 +1,58 @@
+""" Test retuning the gr-uhd based SDRs and waiting for LO lock """
+
+import pytest
+from sdrcalibrator.lib.equipment.sdr.sdr_error import SDR_Error
+from sdrcalibrator.lib.equipment.sdr.uhd_tuning import tune_and_wait_for_lock
+
+class FakeValue:
+
+    """ Stand in for the sensor_value_t and time_spec_t results """
+    def __init__(self, value):
+        self.value = value
+
+    def to_bool(self):
+        return self.value
+
+    def get_real_secs(self):
+        return self.value
+
+class FakeUSRP:
+
+    """ Report unlocked for a number of sensor readings after a retune, advancing device time per reading """
+    def __init__(self, unlocked_readings):
+        self.unlocked_readings = unlocked_readings
+        self.device_time = 10.0
+        self.calls = []
+
+    def set_center_freq(self, tune_request):
+        self.calls.append('tune')
+        return "tune result"
+
+    def get_sensor(self, name):
+        assert name == 'lo_locked'
+        self.calls.append('sensor')
+        self.device_time += 0.001
+        self.unlocked_readings -= 1
+        return FakeValue(self.unlocked_readings < 0)
+
+    def get_time_now(self):
+        return FakeValue(self.device_time)
+
+class TestUHDTuning:
+
+    def test_already_locked(self):
+        usrp = FakeUSRP(0)
+        tune_result, valid_data_time = tune_and_wait_for_lock(usrp, None, 1e9, 1, 0)
+        assert tune_result == "tune result"
+        assert usrp.calls == ['tune', 'sensor']
+        assert valid_data_time == pytest.approx(10.001)
+
+    def test_valid_data_starts_after_lock(self):
+        usrp = FakeUSRP(3)
+        tune_result, valid_data_time = tune_and_wait_for_lock(usrp, None, 1e9, 1, 0)
+        assert usrp.calls == ['tune'] + ['sensor']*4
+        assert valid_data_time == pytest.approx(10.004)
+
+    def test_lock_timeout(self):
+        with pytest.raises(SDR_Error):
+            tune_and_wait_for_lock(FakeUSRP(10**9), None, 1e9, 0.01, 0.001)
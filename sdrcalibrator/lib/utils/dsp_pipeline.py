@@ -0,0 +1,48 @@
+""" Background DSP worker so equipment can move on while earlier data is reduced """
+import threading
+import queue
+
+
+class DSP_Pipeline(object):
+    def __init__(self, max_pending=1):
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.results = {}
+        self.cond = threading.Condition()
+        self.worker = threading.Thread(target=self.run_worker)
+        self.worker.daemon = True
+        self.worker.start()
+
+    # Queue a reduction of func(*args) under a key (blocks while max_pending jobs are waiting)
+    def submit(self, key, func, *args):
+        self.jobs.put((key, func, args))
+
+    # Wait for and remove the result for a key, re-raising anything the reduction raised
+    def result(self, key):
+        with self.cond:
+            while key not in self.results:
+                self.cond.wait()
+            success, value = self.results.pop(key)
+        if not success:
+            raise value
+        return value
+
+    # Worker thread: reduce jobs in submission order
+    def run_worker(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            key, func, args = job
+            try:
+                result = (True, func(*args))
+            except Exception as e:
+                result = (False, e)
+            with self.cond:
+                self.results[key] = result
+                self.cond.notify_all()
+
+    # Stop the worker once the queued jobs are done
+    def stop(self):
+        self.jobs.put(None)
+        self.worker.join()
+        self.results = {}
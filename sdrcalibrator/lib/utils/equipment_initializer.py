@@ -0,0 +1,169 @@
+""" Initialize independent equipment in parallel, in dependency order """
+import threading
+import time
+
+from sdrcalibrator.lib.utils.logging import Logger
+
+
+class Thread_Logger(Logger):
+
+    """ Logger recording each piece of output with how it was logged, so it can be replayed later """
+    def __init__(self, indent_level):
+        Logger.__init__(self, quiet_mode=True, log_to_file=False)
+        self.indent_level = indent_level
+        self.entries = [] # (s, indent, override_quiet_mode, is_error)
+
+    def log(
+                self,
+                s="",
+                indent=None,
+                override_quiet_mode=False,
+                is_error=False
+            ):
+        if indent is None:
+            indent = self.indent_level
+        self.entries.append((s, indent, override_quiet_mode, is_error))
+        self.beginning_of_line = False
+
+
+class Thread_Log_Router(object):
+
+    """ Stand-in for the logger giving each worker thread its own buffer (replayed in order later) """
+    def __init__(self, logger):
+        self.logger = logger
+        self.thread_loggers = {}
+
+    # Start buffering the calling thread's log output
+    def capture(self):
+        thread_logger = Thread_Logger(self.logger.indent_level)
+        self.thread_loggers[threading.current_thread().ident] = thread_logger
+
+    # Stop buffering the calling thread's log output, returning what was logged
+    def release(self):
+        return self.thread_loggers.pop(threading.current_thread().ident).entries
+
+    def __getattr__(self, name):
+        thread_logger = self.thread_loggers.get(threading.current_thread().ident, self.logger)
+        return getattr(thread_logger, name)
+
+
+class Equipment_Initializer(object):
+    def __init__(self, owner, parallel=True):
+        self.owner = owner # Object whose logger the initialization functions use
+        self.parallel = parallel
+        self.jobs = []
+        self.init_times = {}
+        self.results = {} # name -> value returned by the job's function
+        self.initialized = []
+        self.failure = None # (name, exception) of the first failed initialization
+        self.failed = [] # Names of every failed initialization (possibly partway connected)
+        self.lock = threading.Lock()
+
+    # Queue an initialization, run after the named equipment it depends on
+    # Threaded jobs run in parallel, the others (e.g. interactive ones) on the calling thread
+    def add(self, name, label, func, depends_on=None, threaded=True):
+        self.jobs.append({
+            'name': name,
+            'label': label,
+            'func': func,
+            'depends_on': depends_on or [],
+            'threaded': threaded and self.parallel
+        })
+
+    # Split the jobs into waves which only depend on earlier waves (equipment not in use is ignored)
+    def waves(self):
+        names = [j['name'] for j in self.jobs]
+        waves = []
+        done = []
+        remaining = list(self.jobs)
+        while remaining:
+            wave = [j for j in remaining if all(d in done or d not in names for d in j['depends_on'])]
+            waves.append(wave)
+            done += [j['name'] for j in wave]
+            remaining = [j for j in remaining if j not in wave]
+        return waves
+
+    # Run the jobs wave by wave, stopping after the first wave with a failure
+    # Returns the (name, exception) of the first failure, or None
+    def run(self):
+        for wave in self.waves():
+            self.run_wave(wave)
+            if self.failure is not None:
+                break
+        return self.failure
+
+    def run_wave(self, wave):
+        # Jobs on the calling thread log directly and go first
+        for job in [j for j in wave if not j['threaded']]:
+            self.job_started(job)
+            self.run_job(job)
+            if self.failure is not None:
+                return
+
+        # Threaded jobs buffer their logs, which are replayed in job order once all have finished
+        threaded_jobs = [j for j in wave if j['threaded']]
+        if not threaded_jobs:
+            return
+        logger = self.owner.logger
+        router = Thread_Log_Router(logger)
+        logs = {}
+        threads = []
+        self.owner.logger = router
+        try:
+            for job in threaded_jobs:
+                t = threading.Thread(target=self.run_threaded_job, args=(job, router, logs))
+                t.daemon = True
+                t.start()
+                threads.append(t)
+            for t in threads:
+                t.join()
+        finally:
+            self.owner.logger = logger
+        self.replay_logs(logger, threaded_jobs, logs)
+
+    # Write the buffered logs of threaded jobs to the logger in job order
+    # Each piece is logged as it was on the thread, so errors still go to the error stream
+    def replay_logs(self, logger, jobs, logs):
+        for job in jobs:
+            log = logs.get(job['name'], [])
+            if not log:
+                continue
+            logger.force_new_line()
+            for s, indent, override_quiet_mode, is_error in log:
+                logger.log(s, indent=indent, override_quiet_mode=override_quiet_mode, is_error=is_error)
+                logger.beginning_of_line = s.endswith("\n")
+
+    def run_threaded_job(self, job, router, logs):
+        router.capture()
+        try:
+            self.job_started(job)
+            self.run_job(job)
+        finally:
+            logs[job['name']] = router.release()
+
+    def run_job(self, job):
+        start_time = time.time()
+        try:
+            result = job['func']()
+        except BaseException as e:
+            with self.lock:
+                if self.failure is None:
+                    self.failure = (job['name'], e)
+                self.failed.append(job['name'])
+            return
+        with self.lock:
+            self.init_times[job['name']] = time.time()-start_time
+            self.results[job['name']] = result
+            self.initialized.append(job['name'])
+        self.job_finished(job)
+
+    # Log the start of a job
+    def job_started(self, job):
+        self.owner.logger.logln("Initializing {}...".format(job['label']))
+
+    # Log the completion of a job
+    def job_finished(self, job):
+        self.owner.logger.stepin()
+        self.owner.logger.logln("Initialized {} in {:.3f}s".format(
+                job['label'], self.init_times[job['name']]))
+        self.owner.logger.stepout()
@@ -0,0 +1,24 @@
+""" Reusable IQ buffers shared between the test class and the SDR drivers """
+import numpy as np
+
+
+class IQ_Buffer_Pool(object):
+    def __init__(self, dtype=np.complex128):
+        self.dtype = np.dtype(dtype)
+        self.buffers = {}
+
+    # Return a length n array, reusing the buffer for this key (it only grows)
+    # NOTE: the returned array is overwritten by the next request for the same key
+    def get(self, n, key='iq', dtype=None):
+        if dtype is None:
+            dtype = self.dtype
+        dtype = np.dtype(dtype)
+        buf = self.buffers.get((key, dtype))
+        if buf is None or len(buf) < n:
+            buf = np.empty(n, dtype=dtype)
+            self.buffers[(key, dtype)] = buf
+        return buf[:n]
+
+    # Drop all pooled buffers
+    def clear(self):
+        self.buffers = {}
@@ -0,0 +1,68 @@
+""" Configure the instruments for a measurement point in parallel, joining before the stimulus is turned on """
+import threading
+import time
+
+from sdrcalibrator.lib.utils.equipment_initializer import Equipment_Initializer, Thread_Log_Router
+
+
+class Point_Configurator(Equipment_Initializer):
+
+    """ Each step starts as soon as the steps it depends on are done, so a point takes about as long as its slowest instrument """
+    def __init__(self, owner, parallel=True):
+        super(Point_Configurator, self).__init__(owner, parallel)
+        self.total_time = 0
+
+    # Steps log their own progress
+    def job_started(self, job):
+        pass
+
+    def job_finished(self, job):
+        pass
+
+    # Run all the steps, re-raising the first failure once their logs have been written
+    # Returns the values returned by the steps, keyed by name
+    def run(self):
+        start_time = time.time()
+        if self.parallel:
+            self.run_concurrently()
+        else:
+            super(Point_Configurator, self).run()
+        self.total_time = time.time()-start_time
+        if self.failure is not None:
+            raise self.failure[1]
+        return self.results
+
+    # Total time spent in the individual steps (what running them one after another would take)
+    def step_time(self):
+        return sum(self.init_times.values())
+
+    def run_concurrently(self):
+        names = [j['name'] for j in self.jobs]
+        done = dict((name, threading.Event()) for name in names)
+        logger = self.owner.logger
+        router = Thread_Log_Router(logger)
+        logs = {}
+        threads = []
+        self.owner.logger = router
+        try:
+            for job in self.jobs:
+                t = threading.Thread(target=self.run_step, args=(job, router, logs, done))
+                t.daemon = True
+                t.start()
+                threads.append(t)
+            for t in threads:
+                t.join()
+        finally:
+            self.owner.logger = logger
+        self.replay_logs(logger, self.jobs, logs)
+
+    # Wait for the steps this one depends on, then run it unless something already failed
+    def run_step(self, job, router, logs, done):
+        try:
+            for d in job['depends_on']:
+                if d in done:
+                    done[d].wait()
+            if self.failure is None:
+                self.run_threaded_job(job, router, logs)
+        finally:
+            done[job['name']].set()
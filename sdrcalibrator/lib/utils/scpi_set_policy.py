@@ -0,0 +1,45 @@
+""" Decide which SCPI parameter sets are read back, and count the round-trips they cost """
+
+
+class SCPI_Set_Policy(object):
+
+    """ Read back every set, only sets that change the value, or every Nth set of a command """
+    POLICIES = ['always', 'on-change', 'sampled']
+
+    def __init__(self, policy='always', sample_interval=10):
+        self.policy = policy
+        self.sample_interval = max(1, int(sample_interval))
+        self.applied = {} # cmd -> last value set and verified on the instrument
+        self.set_counts = {}
+        self.round_trips = {}
+
+    # Whether the value is known to be applied already, so the set can be skipped
+    def is_applied(self, cmd, set_val):
+        return self.policy == 'on-change' and cmd in self.applied and self.applied[cmd] == set_val
+
+    # Whether this set should be read back (call once per set written to the instrument)
+    def should_verify(self, cmd):
+        self.set_counts[cmd] = self.set_counts.get(cmd, 0) + 1
+        if self.policy == 'sampled':
+            return (self.set_counts[cmd]-1) % self.sample_interval == 0
+        return True
+
+    # Remember a value that reached the instrument
+    def record(self, cmd, set_val):
+        self.applied[cmd] = set_val
+
+    # Forget the applied values (after a preset or anything else changing the instrument state)
+    def invalidate(self):
+        self.applied = {}
+
+    # Count network round-trips spent on a command
+    def count_round_trips(self, cmd, n=1):
+        self.round_trips[cmd] = self.round_trips.get(cmd, 0) + n
+
+    # Summary of the sets and round-trips per command
+    def summary(self):
+        s = []
+        for cmd in sorted(self.round_trips):
+            s.append("{}: {} sets, {} round-trips".format(
+                    cmd, self.set_counts.get(cmd, 0), self.round_trips[cmd]))
+        return s
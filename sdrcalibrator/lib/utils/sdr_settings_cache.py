@@ -0,0 +1,68 @@
+""" Shadow copy of the last settings applied to an SDR to skip redundant sets """
+
+
+class SDR_Settings_Cache(object):
+
+    """ SDR setter for each cached setting """
+    SETTERS = {
+        'clock_frequency': 'set_clock_frequency',
+        'sampling_frequency': 'set_sampling_frequency',
+        'auto_dc_offset': 'set_auto_dc_offset',
+        'auto_iq_imbalance': 'set_auto_iq_imbalance',
+        'dsp_lo_shift': 'set_dsp_lo_shift',
+        'frequency': 'tune_to_frequency',
+        'gain': 'set_gain'
+    }
+
+    """ Settings left unknown on the device when another setting changes """
+    INVALIDATES = {
+        'clock_frequency': [
+            'sampling_frequency',
+            'auto_dc_offset',
+            'auto_iq_imbalance',
+            'dsp_lo_shift',
+            'frequency',
+            'gain'
+        ],
+        'sampling_frequency': ['dsp_lo_shift', 'frequency'],
+        'dsp_lo_shift': ['frequency']
+    }
+
+    def __init__(self, sdr, enabled=True):
+        self.sdr = sdr
+        self.enabled = enabled
+        self.state = {} # setting -> (requested value, setter return value)
+        self.hits = {}
+        self.misses = {}
+
+    # Apply a setting unless it is already applied, returning what the setter returned
+    def apply(self, setting, value):
+        if self.enabled and setting in self.state and self.state[setting][0] == value:
+            self.hits[setting] = self.hits.get(setting, 0) + 1
+            return self.state[setting][1]
+        self.misses[setting] = self.misses.get(setting, 0) + 1
+
+        # Forget the setting first so a failed set is retried next time
+        self.invalidate(setting)
+        result = getattr(self.sdr, self.SETTERS[setting])(value)
+        self.state[setting] = (value, result)
+        return result
+
+    # Forget a setting (and those depending on it), or everything if none is given
+    def invalidate(self, setting=None):
+        if setting is None:
+            self.state = {}
+            return
+        self.state.pop(setting, None)
+        for s in self.INVALIDATES.get(setting, []):
+            self.state.pop(s, None)
+
+    # Summary of the hits and misses per setting
+    def summary(self):
+        s = []
+        for setting in self.SETTERS:
+            hits = self.hits.get(setting, 0)
+            misses = self.misses.get(setting, 0)
+            if hits or misses:
+                s.append("{}: {} hits, {} misses".format(setting, hits, misses))
+        return s
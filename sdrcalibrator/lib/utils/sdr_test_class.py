@@ -4,7 +4,7 @@ import math
 import csv
 
 import numpy as np
-from scipy import signal, integrate
+from scipy import signal, integrate, fftpack
 
 from matplotlib import pyplot as plt
 
@@ -13,7 +13,12 @@ from operator import itemgetter
 import sdrcalibrator.lib.utils.common as utils
 import sdrcalibrator.lib.utils.error as Error
 from sdrcalibrator.lib.utils.logging import Logger
+from sdrcalibrator.lib.utils.iq_buffer_pool import IQ_Buffer_Pool
+from sdrcalibrator.lib.utils.equipment_initializer import Equipment_Initializer
+from sdrcalibrator.lib.utils.point_configurator import Point_Configurator
+from sdrcalibrator.lib.utils.sdr_settings_cache import SDR_Settings_Cache
 from sdrcalibrator.lib.utils.sdr_test_error import SDR_Test_Error
+from sdrcalibrator.lib.equipment.siggen.siggen_settling import Settling_Model
 
 import json
 from shutil import copyfile
@@ -36,6 +41,17 @@ class SDR_Test_Class(object):
         'pwr_correction_factors_set':False
     }
 
+    """ Equipment which must be initialized before other equipment (e.g. the switch before the meter) """
+    EQUIPMENT_INITIALIZATION_DEPENDENCIES = {
+        'pwrmtr': ['switch']
+    }
+
+    """ Supported IQ/DSP precision modes: (IQ dtype, spectrum dtype) """
+    IQ_PRECISION_DTYPES = {
+        'double': (np.complex128, np.float64),
+        'single': (np.complex64, np.float32)
+    }
+
     """ Equipment parameter definition dict """
     EQUIPMENT_PARAMETER_DEFINITIONS = {
         'sdr': {
@@ -65,7 +81,8 @@ class SDR_Test_Class(object):
             ],
             'defaultable_profile_parameters': [
                 'siggen_rf_on_settling_time',
-                'siggen_rf_off_settling_time'
+                'siggen_rf_off_settling_time',
+                'siggen_settling_model_file'
             ]
         },
         'pwrmtr': {
@@ -150,6 +167,12 @@ class SDR_Test_Class(object):
                 'fft_averaging_number': 1,
                 'fft_window': None,
 
+                'sdr_iq_precision': 'double',
+                'sdr_cache_settings': True,
+                'sdr_ready_timeout': 1,
+                'equipment_parallel_initialization': True,
+                'equipment_parallel_point_configuration': True,
+
                 'logging_quiet_mode': False,
                 'logging_save_log_file': False
             },
@@ -253,6 +276,23 @@ class SDR_Test_Class(object):
 
     # Perform the general cleanup
     def cleanup(self):
+        # Report how many SDR settings were skipped as unchanged
+        if 'sdr' in self.equipment_in_use and hasattr(getattr(self, 'sdr', None), 'settings_cache'):
+            self.logger.logln("SDR settings cache:")
+            self.logger.stepin()
+            for line in self.sdr.settings_cache.summary():
+                self.logger.logln(line)
+            self.logger.stepout()
+
+        # Report the round-trips spent configuring SCPI instruments
+        for equip in ['sdr', 'pwrmtr']:
+            if equip in self.equipment_in_use and hasattr(getattr(self, equip, None), 'get_round_trip_summary'):
+                self.logger.logln("{} SCPI round-trips:".format(equip))
+                self.logger.stepin()
+                for line in getattr(self, equip).get_round_trip_summary():
+                    self.logger.logln(line)
+                self.logger.stepout()
+
         # Make sure to run power down procedures for all equipment
         for equip in self.equipment_in_use:
             self.logger.log("Powering down {}... ".format(equip))
@@ -329,6 +369,15 @@ class SDR_Test_Class(object):
             if not self.profile_parameter_exists(k):
                 self.profile_set_parameter(k, v)
         
+        # Check the IQ/DSP precision mode
+        if self.profile.sdr_iq_precision not in self.IQ_PRECISION_DTYPES:
+            raise SDR_Test_Error(
+                    10,
+                    "Unknown IQ precision '{}'".format(self.profile.sdr_iq_precision),
+                    "The profile parameter 'sdr_iq_precision' must be one of\r\n" +
+                    "{}".format(sorted(self.IQ_PRECISION_DTYPES.keys()))
+                )
+
         # Check test functionality and add parameters to definitions
         self.using_stimulus = False
         if 'apply_stimulus' in self.PROFILE_DEFINITIONS['possible_functionality']:
@@ -446,6 +495,12 @@ class SDR_Test_Class(object):
     def profile_get_parameter(self, param):
         return getattr(self.profile, param)
 
+    """ Get the (IQ, spectrum) dtypes for the profile's precision mode """
+    def get_precision_dtypes(self):
+        if not self.profile_parameter_exists('sdr_iq_precision'):
+            return self.IQ_PRECISION_DTYPES['double']
+        return self.IQ_PRECISION_DTYPES[self.profile.sdr_iq_precision]
+
     """ Add equipment defaults to the profile """
     def profile_add_equipment_defaults(self, equip):
         equip_params = self.EQUIPMENT_PARAMETER_DEFINITIONS[equip]
@@ -503,9 +558,15 @@ class SDR_Test_Class(object):
         self.logger.logln("Configuring logger...")
         self.configure_logger()
 
+        # Equipment is connected once all modules are loaded and defaults applied
+        initializer = Equipment_Initializer(
+                self,
+                not self.profile_parameter_exists('equipment_parallel_initialization') or
+                self.profile.equipment_parallel_initialization
+            )
+
         # Check for an SDR to initialize
         if 'sdr' in self.equipment_in_use:
-            self.logger.logln("Initializing SDR...")
             try:
                 sdr_module = "sdrcalibrator.lib.equipment.sdr.{}".format(self.profile.sdr_module)
                 self.sdr = utils.import_object(sdr_module, "SDR")()
@@ -520,10 +581,10 @@ class SDR_Test_Class(object):
                 err = SDR_Test_Error(12, ehead, ebody)
                 Error.error_out(self.logger, err)
             self.profile_add_equipment_defaults('sdr')
-            try:
-                self.initialize_sdr()
-            except self.SDR_Error_Class as e:
-                Error.error_out(self.logger, e)
+            initializer.add(
+                    'sdr', "SDR", self.initialize_sdr,
+                    depends_on=self.EQUIPMENT_INITIALIZATION_DEPENDENCIES.get('sdr')
+                )
             self.equipment_in_use['sdr'] = self.sdr
             self.equipment_errors['SDR_Error_Class'] = self.SDR_Error_Class
 
@@ -531,7 +592,6 @@ class SDR_Test_Class(object):
 
         # Check for a signal generator to initialize
         if 'siggen' in self.equipment_in_use:
-            self.logger.logln("Initializing signal generator...")
             try:
                 siggen_module = "sdrcalibrator.lib.equipment.siggen.{}".format(self.profile.siggen_module)
                 self.siggen = utils.import_object(siggen_module, "Signal_Generator")()
@@ -545,16 +605,15 @@ class SDR_Test_Class(object):
                 err = SDR_Test_Error(12, ehead, ebody)
                 Error.error_out(self.logger, err)
             self.profile_add_equipment_defaults('siggen')
-            try:
-                self.initialize_siggen()
-            except self.Signal_Generator_Error_Class as e:
-                Error.error_out(self.logger, e)
+            initializer.add(
+                    'siggen', "signal generator", self.initialize_siggen,
+                    depends_on=self.EQUIPMENT_INITIALIZATION_DEPENDENCIES.get('siggen')
+                )
             self.equipment_in_use['siggen'] = self.siggen
             self.equipment_errors['Signal_Generator_Error_Class'] = self.Signal_Generator_Error_Class
 
         # Check for a power meter to initialize
         if 'pwrmtr' in self.equipment_in_use:
-            self.logger.logln("Initializing power meter...")
             try:
                 pwrmtr_module = "sdrcalibrator.lib.equipment.pwrmtr.{}".format(self.profile.pwrmtr_module)
                 self.pwrmtr = utils.import_object(pwrmtr_module, "Power_Meter")()
@@ -568,16 +627,17 @@ class SDR_Test_Class(object):
                 err = SDR_Test_Error(12, ehead, ebody)
                 Error.error_out(self.logger, err)
             self.profile_add_equipment_defaults('pwrmtr')
-            try:
-                self.initialize_pwrmtr()
-            except self.Power_Meter_Error_Class as e:
-                Error.error_out(self.logger, e)
+            # Asking which instrument to use needs the console, so that stays on this thread
+            initializer.add(
+                    'pwrmtr', "power meter", self.initialize_pwrmtr,
+                    depends_on=self.EQUIPMENT_INITIALIZATION_DEPENDENCIES.get('pwrmtr'),
+                    threaded=not self.profile.pwrmtr_connect_params.get('ask_which_instrument', False)
+                )
             self.equipment_in_use['pwrmtr'] = self.pwrmtr
             self.equipment_errors['Power_Meter_Error_Class'] = self.Power_Meter_Error_Class
 
         # Check for an RF switch to initialize
         if 'switch' in self.equipment_in_use:
-            self.logger.logln("Initializing RF switch...")
             try:
                 switch_module = "sdrcalibrator.lib.equipment.switch.{}".format(self.profile.switch_module)
                 self.switch = utils.import_object(switch_module, "RF_Switch")()
@@ -591,16 +651,15 @@ class SDR_Test_Class(object):
                 err = SDR_Test_Error(12, ehead, ebody)
                 Error.error_out(self.logger, err)
             self.profile_add_equipment_defaults('switch')
-            try:
-                self.initialize_switch()
-            except self.RF_Switch_Error_Class as e:
-                Error.error_out(self.logger, e)
+            initializer.add(
+                    'switch', "RF switch", self.initialize_switch,
+                    depends_on=self.EQUIPMENT_INITIALIZATION_DEPENDENCIES.get('switch')
+                )
             self.equipment_in_use['switch'] = self.switch
             self.equipment_errors['RF_Switch_Error_Class'] = self.RF_Switch_Error_Class
         
         # Check for programmable attenuator to initialize
         if 'atten' in self.equipment_in_use:
-            self.logger.logln("Initializing programmable attenuator...")
             try:
                 atten_module = "sdrcalibrator.lib.equipment.atten.{}".format(self.profile.atten_module)
                 self.atten = utils.import_object(atten_module, "Programmable_Attenuator")()
@@ -613,13 +672,26 @@ class SDR_Test_Class(object):
                 err = SDR_Test_Error(12, ehead, ebody)
                 Error.error_out(self.logger, err)
             self.profile_add_equipment_defaults('atten')
-            try:
-                self.initialize_atten()
-            except self.Programmable_Attenuator_Error_Class as e:
-                Error.error_out(self.logger, e)
+            initializer.add(
+                    'atten', "programmable attenuator", self.initialize_atten,
+                    depends_on=self.EQUIPMENT_INITIALIZATION_DEPENDENCIES.get('atten')
+                )
             self.equipment_in_use['atten'] = self.atten
             self.equipment_errors['Programmable_Attenuator_Error_Class'] = self.Programmable_Attenuator_Error_Class
 
+        # Connect to the equipment, in parallel where nothing depends on another instrument
+        failure = initializer.run()
+        self.equipment_init_times = initializer.init_times
+        if failure is not None:
+            # Fail fast, powering down whatever was already connected (or failed partway through)
+            e = failure[1]
+            for equip in initializer.failed:
+                self.logger.logln("Failed to initialize {}...".format(equip))
+            self.power_down_equipment(initializer.initialized + initializer.failed)
+            if isinstance(e, SystemExit) or not hasattr(e, 'err_code'):
+                raise e
+            Error.error_out(self.logger, e)
+
         # Check for defaulted parameters which relied on equipment settings
         self.logger.log(
                 "Checking defaulted parameters which rely on " +
@@ -628,6 +700,20 @@ class SDR_Test_Class(object):
         self.check_dependent_defaulted_profile_parameters()
         self.logger.logln("Done!")
 
+    """ Power down and drop equipment, e.g. when another instrument failed to initialize """
+    def power_down_equipment(self, equipment):
+        for equip in equipment:
+            self.logger.log("Powering down {}... ".format(equip))
+            try:
+                if hasattr(getattr(self, equip), 'power_down'):
+                    getattr(self, equip).power_down()
+                self.equipment_in_use.pop(equip, None)
+                delattr(self, equip)
+            except Exception as e:
+                self.logger.logln("Failed ({})".format(e))
+                continue
+            self.logger.logln("Done!")
+
     """ Configure the logger """
     def configure_logger(self):
         self.logger.stepin()
@@ -660,34 +746,41 @@ class SDR_Test_Class(object):
         self.logger.logln("SDR serial number: \"{}\"".format(self.sdr_serial_number))
         self.logger.stepout()
 
+        # Track the applied settings so unchanged ones are not set again
+        # (shared with dependency tests through the SDR)
+        self.sdr.settings_cache = SDR_Settings_Cache(
+                self.sdr,
+                not self.profile_parameter_exists('sdr_cache_settings') or self.profile.sdr_cache_settings
+            )
+
         # Set the clock frequency
         self.logger.log("SDR clock frequency will be set to {}... ".format(
             self.logger.to_MHz(self.profile.sdr_clock_frequency)))
-        self.sdr.set_clock_frequency(self.profile.sdr_clock_frequency)
+        self.apply_sdr_setting('clock_frequency', self.profile.sdr_clock_frequency)
         self.logger.logln("Done!")
 
         # Set the sampling frequency
         self.logger.log("SDR sampling frequency will be set to {}... ".format(
             self.logger.to_MHz(self.profile.sdr_sampling_frequency)))
-        self.sdr.set_sampling_frequency(self.profile.sdr_sampling_frequency)
+        self.apply_sdr_setting('sampling_frequency', self.profile.sdr_sampling_frequency)
         self.logger.logln("Done!")
 
         # Check for DC offset correction
         self.logger.log("Setting auto DC offset correction to {}... ".format(
             self.profile.sdr_auto_dc_offset))
-        self.sdr.set_auto_dc_offset(self.profile.sdr_auto_dc_offset)
+        self.apply_sdr_setting('auto_dc_offset', self.profile.sdr_auto_dc_offset)
         self.logger.logln("Done!")
 
         # Check for IQ imbalance correction
         self.logger.log("Setting auto IQ balance correction to {}... ".format(
             self.profile.sdr_auto_iq_imbalance))
-        self.sdr.set_auto_iq_imbalance(self.profile.sdr_auto_iq_imbalance)
+        self.apply_sdr_setting('auto_iq_imbalance', self.profile.sdr_auto_iq_imbalance)
         self.logger.logln("Done!")
 
         # Check for SDR gain
         self.logger.log("Setting SDR gain to {}... ".format(
             self.logger.to_dBm(self.profile.sdr_gain)))
-        self.sdr.set_gain(self.profile.sdr_gain)
+        self.apply_sdr_setting('gain', self.profile.sdr_gain)
         self.logger.logln("Done!")
 
         # Check for LO tuning error threshold
@@ -701,13 +794,17 @@ class SDR_Test_Class(object):
         if self.profile.sdr_use_dsp_lo_shift:
             self.logger.log("Setting DSP LO shift to {}... ".format(
                 self.logger.to_MHz(self.profile.sdr_dsp_lo_shift)))
-            self.sdr.set_dsp_lo_shift(self.profile.sdr_dsp_lo_shift)
+            self.apply_sdr_setting('dsp_lo_shift', self.profile.sdr_dsp_lo_shift)
             self.logger.logln("Done!")
         else:
             self.logger.log("Disabling DSP LO shifting...")
-            self.sdr.set_dsp_lo_shift(0)
+            self.apply_sdr_setting('dsp_lo_shift', 0)
             self.logger.logln("Done!")
         
+        # Reuse the IQ buffers between acquisitions (shared with dependency tests through the SDR)
+        # Their dtype sets the precision the drivers deliver IQ data in
+        self.sdr.iq_buffer_pool = IQ_Buffer_Pool(self.get_precision_dtypes()[0])
+
         # Determine scale factor configuration
         self.sdr.scale_factors = None
         if self.profile.sdr_power_scale_factor is not None:
@@ -755,6 +852,12 @@ class SDR_Test_Class(object):
                 )
             )
 
+        # Use a characterized settling model for the transitions it covers
+        if self.profile.siggen_settling_model_file is not None:
+            self.logger.log("Loading signal generator settling model... ")
+            self.load_siggen_settling_model(self.profile.siggen_settling_model_file)
+            self.logger.logln("Done!")
+
         self.logger.stepout()
         return
 
@@ -898,6 +1001,17 @@ class SDR_Test_Class(object):
             err = SDR_Test_Error(10, ehead, ebody)
             Error.error_out(self.logger, err)
 
+    """ Load a signal generator settling model written by the siggen_settling test """
+    def load_siggen_settling_model(self, fname):
+        model = Settling_Model.load(fname)
+        if model.siggen_name is not None and model.siggen_name != self.siggen.SIGGEN_NAME:
+            ehead = "Settling model is for a different signal generator"
+            ebody = "The model was characterized with a '{}'\r\n".format(model.siggen_name)
+            ebody += "but the signal generator in use is a '{}'.".format(self.siggen.SIGGEN_NAME)
+            err = SDR_Test_Error(10, ehead, ebody)
+            Error.error_out(self.logger, err)
+        self.siggen.configure_settling_model(model)
+
     """ Calculate the correction factor from current setup """
     def calculate_setup_correction_factor(self, f, setup_factor_type='C23'):
         self.logger.logln("Calculating setup correction factor...")
@@ -1042,7 +1156,7 @@ class SDR_Test_Class(object):
         self.logger.logln("Tuning SDR to {}... ".format(
             self.logger.to_MHz(f0)))
         try:
-            actual_f0 = self.sdr.tune_to_frequency(f0)
+            actual_f0 = self.apply_sdr_setting('frequency', f0)
         except self.SDR_Error_Class as e:
             Error.error_out(self.logger, e)
         f_lo = self.sdr.current_lo_frequency()
@@ -1054,6 +1168,11 @@ class SDR_Test_Class(object):
         self.logger.logln("Actual f0:     {}".format(self.logger.to_MHz(actual_f0)))
         self.logger.logln("LO frequency:  {}".format(self.logger.to_MHz(f_lo)))
         self.logger.logln("DSP frequency: {}".format(self.logger.to_MHz(f_dsp)))
+        # SDRs retuning on device time report the stream sample where valid data begins
+        if hasattr(self.sdr, 'get_valid_data_index'):
+            valid_index = self.sdr.get_valid_data_index()
+            if valid_index is not None:
+                self.logger.logln("Valid from:    stream sample {}".format(valid_index))
         self.logger.stepout()
         return actual_f0
 
@@ -1212,14 +1331,16 @@ class SDR_Test_Class(object):
             "Reading {} samples after {} conditioning samples...".format(
                     num, self.profile.sdr_conditioning_samples))
         # print("CALLING TAKE IQ SAMPLES FOR SDR =", self.sdr) # TODO: remove this
+        # NOTE: the pooled buffer is overwritten by the next acquisition
         data = self.sdr.take_iq_samples(
-                num, self.profile.sdr_conditioning_samples)
+                num, self.profile.sdr_conditioning_samples,
+                out=self.sdr.iq_buffer_pool.get(num))
         self.logger.logln("Done!")
 
-        # Scale the samples with the loaded scale factor
+        # Scale the samples with the loaded scale factor (in place)
         if not (self.sdr.scale_factor == 0):
             self.logger.log("Scaling IQ data with defined scale factor... ")
-            data = self.scale_iq_data_with_power_factor(data, self.sdr.scale_factor)
+            data = self.scale_iq_data_with_power_factor(data, self.sdr.scale_factor, out=data)
             self.logger.logln("Done!")
 
         return data
@@ -1227,9 +1348,25 @@ class SDR_Test_Class(object):
     """ Set the gain of the SDR """
     def set_sdr_gain(self, g):
         try:
-            self.sdr.set_gain(g)
+            self.apply_sdr_setting('gain', g)
         except self.SDR_Error_Class as e:
             Error.error_out(self.logger, e)
+
+    """ Apply an SDR setting, skipping it if unchanged since it was last applied """
+    def apply_sdr_setting(self, setting, value):
+        return self.sdr.settings_cache.apply(setting, value)
+
+    """ Wait for the SDR to settle after a configuration change, logging how long it took """
+    def wait_for_sdr_ready(self):
+        self.logger.log("Waiting for SDR to settle... ")
+        start_time = time.time()
+        ready = self.sdr.wait_until_ready(self.profile.sdr_ready_timeout)
+        ready_time = time.time()-start_time
+        if ready:
+            self.logger.logln("Ready after {:.3f}s".format(ready_time))
+        else:
+            self.logger.logln("Not settled after {:.3f}s, continuing anyway".format(ready_time))
+        return ready_time
     
     """
         >>>
@@ -1241,26 +1378,44 @@ class SDR_Test_Class(object):
     def setup_stimulus(self, f0, p_in):
         if not self.using_stimulus:
             return
-        # Setup the siggen for a single CW for calibrating other equipment
-        if self.profile.power_stimulus == 'single_cw_for_calibration':
-            self.logger.logln("Setting up CW from signal generator...")
-            self.logger.stepin()
+        configurator = self.new_point_configurator()
+        f0 = self.plan_stimulus(configurator, f0, p_in)
+        self.run_point_configurator(configurator)
+        return f0
+
+    """ Setup the stimulus and tune the SDR for a measurement point, configuring the instruments in parallel """
+    def configure_point(self, f0, p_in):
+        configurator = self.new_point_configurator()
+        f_sdr = f0
+        if self.using_stimulus:
+            f_stimulus = self.plan_stimulus(configurator, f0, p_in)
+            if f_stimulus is not None:
+                f_sdr = f_stimulus
+        configurator.add('sdr', "SDR", lambda: self.tune_sdr_to_frequency(f_sdr))
+        results = self.run_point_configurator(configurator)
+        return f_sdr, results['sdr']
+
+    """ Create a configurator for the instrument steps of a measurement point """
+    def new_point_configurator(self):
+        return Point_Configurator(
+                self,
+                not self.profile_parameter_exists('equipment_parallel_point_configuration') or
+                self.profile.equipment_parallel_point_configuration
+            )
 
-            # Tune the signal generator to the correct frequency
-            self.logger.log("Tuning signal generator to {}... ".format(
-                    self.logger.to_MHz(f0)
-                ))
-            self.siggen.tune_to_frequency(f0)
-            self.logger.logln("Done!")
+    """ Run the steps of a measurement point, logging the time saved by running them in parallel """
+    def run_point_configurator(self, configurator):
+        results = configurator.run()
+        if configurator.parallel and len(configurator.jobs) > 1:
+            self.logger.logln("Configured point in {:.3f}s ({:.3f}s of instrument time)".format(
+                    configurator.total_time, configurator.step_time()))
+        return results
 
-            # Set the output power for the signal generator
-            self.logger.log(
-                "Setting signal generator output power to {}... ".format(
-                    self.logger.to_dBm(p_in)
-                ))
-            self.siggen.set_power(p_in)
-            self.logger.logln("Done!")
-            self.logger.stepout()
+    """ Compute the stimulus parameters and queue the instrument steps to apply them """
+    def plan_stimulus(self, configurator, f0, p_in):
+        # Setup the siggen for a single CW for calibrating other equipment
+        if self.profile.power_stimulus == 'single_cw_for_calibration':
+            configurator.add('siggen', "signal generator", lambda: self.configure_calibration_cw(f0, p_in))
             return
         # Compute and setup the siggen for a single CW
         if self.profile.power_stimulus == 'single_cw':
@@ -1295,121 +1450,157 @@ class SDR_Test_Class(object):
             except SDR_Test_Error as e:
                 Error.error_out(self.logger, e)
             self.logger.logln("Done!")
-            
-            # If using the attenuator to control power, set that up
+            self.logger.stepout()
+
+            # The attenuator and siggen tuning are independent, the power needs the attenuation
+            # and verification needs the power to be set
             if self.profile.power_level_mode == 'attenuator':
-                desired_atten = self.profile.power_base_power - self.p_out
-                left_over_atten = self.atten.set_attenuation(desired_atten,self.f_cw)
-                self.attenuation = desired_atten-left_over_atten
-                self.p_out = self.profile.power_base_power - left_over_atten
-                self.logger.logln(
-                    "Programmable attenuator level set to: {}".format(
-                            self.logger.to_dBm(self.attenuation)
-                        )
-                    )
-            # Log the approximate power levels
-            self.logger.logln(
-                "Signal generator CW output power will be set to: {}".format(
-                        self.logger.to_dBm(self.p_out)
-                    )
+                configurator.add('atten', "attenuator", self.configure_stimulus_attenuation)
+            configurator.add('siggen_frequency', "signal generator frequency", self.tune_siggen_to_cw)
+            configurator.add(
+                    'siggen_power', "signal generator power", self.set_siggen_cw_power,
+                    depends_on=['atten', 'siggen_frequency']
                 )
-            self.logger.logln(
-                "Approximate power at SDR input will be: {}".format(
-                        self.logger.to_dBm(self.p_in)
-                    )
+            configurator.add(
+                    'power_verification', "power verification", self.verify_stimulus_power,
+                    depends_on=['siggen_power']
                 )
-            
-            # Configure the signal generator with calculated parameters
-            self.logger.logln("Configuring signal generator...")
-            self.logger.stepin()
+            return f0
 
-            # Tune the signal generator to the correct frequency
-            self.logger.log("Tuning signal generator to {}... ".format(
-                    self.logger.to_MHz(self.f_cw)
-                ))
-            self.siggen.tune_to_frequency(self.f_cw)
-            self.logger.logln("Done!")
+    """ Tune and set the power of the siggen CW used for calibrating other equipment """
+    def configure_calibration_cw(self, f0, p_in):
+        self.logger.logln("Setting up CW from signal generator...")
+        self.logger.stepin()
 
-            # Set the output power for the signal generator
-            self.logger.log(
-                "Setting signal generator output power to {}... ".format(
-                    self.logger.to_dBm(self.p_out)
-                ))
-            self.siggen.set_power(self.p_out)
-            self.logger.logln("Done!")
+        # Tune the signal generator to the correct frequency
+        self.logger.log("Tuning signal generator to {}... ".format(
+                self.logger.to_MHz(f0)
+            ))
+        self.siggen.tune_to_frequency(f0)
+        self.logger.logln("Done!")
 
-            # Perform power verification if required
-            if self.verifying_power:
-                self.logger.logln("Verifying power output...")
-                self.logger.stepin()
+        # Set the output power for the signal generator
+        self.logger.log(
+            "Setting signal generator output power to {}... ".format(
+                self.logger.to_dBm(p_in)
+            ))
+        self.siggen.set_power(p_in)
+        self.logger.logln("Done!")
+        self.logger.stepout()
 
-                # Perform power verification with power meter
-                if self.profile.power_verification == 'power_meter':
+    """ Set the programmable attenuator to control the stimulus power """
+    def configure_stimulus_attenuation(self):
+        desired_atten = self.profile.power_base_power - self.p_out
+        left_over_atten = self.atten.set_attenuation(desired_atten,self.f_cw)
+        self.attenuation = desired_atten-left_over_atten
+        self.p_out = self.profile.power_base_power - left_over_atten
+        self.logger.logln(
+            "Programmable attenuator level set to: {}".format(
+                    self.logger.to_dBm(self.attenuation)
+                )
+            )
 
-                    # Tune the power meter to the CW frequency
-                    self.logger.log("Tuning power meter to {}... ".format(self.logger.to_MHz(self.f_cw)))
-                    self.pwrmtr.tune_to_frequency(self.f_cw)
-                    self.logger.logln("Done!")
+    """ Tune the signal generator to the computed CW frequency """
+    def tune_siggen_to_cw(self):
+        self.logger.log("Tuning signal generator to {}... ".format(
+                self.logger.to_MHz(self.f_cw)
+            ))
+        self.siggen.tune_to_frequency(self.f_cw)
+        self.logger.logln("Done!")
 
-                    # Turn the switch to the power meter
-                    self.logger.log("Turning switch to the power meter... ")
-                    self.switch.select_meter()
-                    self.logger.logln("Done!")
+    """ Set the signal generator to the computed CW output power """
+    def set_siggen_cw_power(self):
+        # Log the approximate power levels
+        self.logger.logln(
+            "Signal generator CW output power will be set to: {}".format(
+                    self.logger.to_dBm(self.p_out)
+                )
+            )
+        self.logger.logln(
+            "Approximate power at SDR input will be: {}".format(
+                    self.logger.to_dBm(self.p_in)
+                )
+            )
 
-                    # Turn on the power
-                    self.stimulus_on()
+        # Set the output power for the signal generator
+        self.logger.log(
+            "Setting signal generator output power to {}... ".format(
+                self.logger.to_dBm(self.p_out)
+            ))
+        self.siggen.set_power(self.p_out)
+        self.logger.logln("Done!")
 
-                    # Measure the power with the power meter
-                    self.logger.log("Measuring power with the power meter... ")
-                    self.measured_power = self.pwrmtr.take_measurement(self.p_out)
-                    self.logger.logln("Done!")
-                    self.logger.stepin()
-                    self.logger.logln("Measured power: {}".format(self.logger.to_dBm(self.measured_power)))
-                    self.logger.stepout()
+    """ Verify the stimulus power, or assume it if not verifying """
+    def verify_stimulus_power(self):
+        # Perform power verification if required
+        if self.verifying_power:
+            self.logger.logln("Verifying power output...")
+            self.logger.stepin()
 
-                    # If using correction factors for the switch, apply them
-                    if self.switch.calibrated:
-                        self.calculate_setup_correction_factor(self.f_cw)
-                        self.logger.stepin()
-                        self.measured_power += self.setup_correction_factor
-                        self.logger.logln("Setup correction factor: {}".format(self.logger.to_dBm(self.setup_correction_factor)))
-                        self.logger.logln("Corrected measured power: {}".format(self.logger.to_dBm(self.measured_power)))
-                        self.logger.stepout()
+            # Perform power verification with power meter
+            if self.profile.power_verification == 'power_meter':
 
-                    # Turn on the power
-                    self.stimulus_off()
+                # Tune the power meter to the CW frequency
+                self.logger.log("Tuning power meter to {}... ".format(self.logger.to_MHz(self.f_cw)))
+                self.pwrmtr.tune_to_frequency(self.f_cw)
+                self.logger.logln("Done!")
 
-                    # Turn the switch to the power meter
-                    self.logger.log("Turning switch to the SDR... ")
-                    self.switch.select_sdr()
-                    self.logger.logln("Done!")
+                # Turn the switch to the power meter
+                self.logger.log("Turning switch to the power meter... ")
+                self.switch.select_meter()
+                self.logger.logln("Done!")
 
-                    # Calculate the measured power
-                    if self.profile.power_level_mode == 'attenuator':
-                        self.measured_power -= self.attenuation
-                        self.logger.logln("Power after the attenuator taken to be: {}".format(self.logger.to_dBm(self.measured_power)))
-                # Calculate the power based on C20
-                if self.profile.power_verification == 'C20':
-                    if self.switch.calibrated:
-                        self.calculate_setup_correction_factor(self.f_cw, setup_factor_type='C20')
-                        self.logger.stepin()
-                        self.measured_power = self.p_out + self.setup_correction_factor
-                        self.logger.logln("Setup correction factor: {}".format(self.logger.to_dBm(self.setup_correction_factor)))
-                        self.logger.logln("Corrected measured power: {}".format(self.logger.to_dBm(self.measured_power)))
-                        self.logger.stepout()
-                    else:
-                        self.logger.stepin()
-                        self.measured_power = self.p_out
-                        self.logger.logln("No setup correction factor")
-                        self.logger.logln("Corrected measured power: {}".format(self.logger.to_dBm(self.measured_power)))
-                        self.logger.stepout()
+                # Turn on the power
+                self.stimulus_on()
+
+                # Measure the power with the power meter
+                self.logger.log("Measuring power with the power meter... ")
+                self.measured_power = self.pwrmtr.take_measurement(self.p_out)
+                self.logger.logln("Done!")
+                self.logger.stepin()
+                self.logger.logln("Measured power: {}".format(self.logger.to_dBm(self.measured_power)))
                 self.logger.stepout()
-            else:
-                self.measured_power = self.p_in
-                self.logger.logln("Assuming the true power to be {}...".format(self.logger.to_dBm(self.measured_power)))
 
-            self.logger.stepout(step_out_num=2)
-            return f0
+                # If using correction factors for the switch, apply them
+                if self.switch.calibrated:
+                    self.calculate_setup_correction_factor(self.f_cw)
+                    self.logger.stepin()
+                    self.measured_power += self.setup_correction_factor
+                    self.logger.logln("Setup correction factor: {}".format(self.logger.to_dBm(self.setup_correction_factor)))
+                    self.logger.logln("Corrected measured power: {}".format(self.logger.to_dBm(self.measured_power)))
+                    self.logger.stepout()
+
+                # Turn on the power
+                self.stimulus_off()
+
+                # Turn the switch to the power meter
+                self.logger.log("Turning switch to the SDR... ")
+                self.switch.select_sdr()
+                self.logger.logln("Done!")
+
+                # Calculate the measured power
+                if self.profile.power_level_mode == 'attenuator':
+                    self.measured_power -= self.attenuation
+                    self.logger.logln("Power after the attenuator taken to be: {}".format(self.logger.to_dBm(self.measured_power)))
+            # Calculate the power based on C20
+            if self.profile.power_verification == 'C20':
+                if self.switch.calibrated:
+                    self.calculate_setup_correction_factor(self.f_cw, setup_factor_type='C20')
+                    self.logger.stepin()
+                    self.measured_power = self.p_out + self.setup_correction_factor
+                    self.logger.logln("Setup correction factor: {}".format(self.logger.to_dBm(self.setup_correction_factor)))
+                    self.logger.logln("Corrected measured power: {}".format(self.logger.to_dBm(self.measured_power)))
+                    self.logger.stepout()
+                else:
+                    self.logger.stepin()
+                    self.measured_power = self.p_out
+                    self.logger.logln("No setup correction factor")
+                    self.logger.logln("Corrected measured power: {}".format(self.logger.to_dBm(self.measured_power)))
+                    self.logger.stepout()
+            self.logger.stepout()
+        else:
+            self.measured_power = self.p_in
+            self.logger.logln("Assuming the true power to be {}...".format(self.logger.to_dBm(self.measured_power)))
     
     """ Function to recover stimulus parameters from a dependency test """
     def recover_stimulus_parameters_from_dependency_test(self, t):
@@ -1635,9 +1826,11 @@ class SDR_Test_Class(object):
     # GENERAL FFT FUNCTIONS
     #
 
-    # Calculate the dBm power of the current window
-    def calculate_fft_window_power(self):
-        window_power = np.mean(self.fft_window) #sum(self.fft_window ** 2)/len(self.fft_window)
+    # Calculate the dBm power of the current window (or of a given one)
+    def calculate_fft_window_power(self, window=None):
+        if window is None:
+            window = self.fft_window
+        window_power = np.mean(window) #sum(self.fft_window ** 2)/len(self.fft_window)
         window_power_dbm = 20*np.log10(window_power)
         #window_power_dbm = -7.3166024515
         return window_power_dbm
@@ -1645,13 +1838,14 @@ class SDR_Test_Class(object):
     # Create the window for the FFT
     def construct_fft_window(self, window, length):
         self.logger.log("Creating the {} FFT window... ".format(window))
+        real_dtype = self.get_precision_dtypes()[1]
         if window is None:
-            self.fft_window = np.ones(length) # signal.flattop(length) # TODO: CHANGE THIS BACK FROM BOXCAR
+            self.fft_window = np.ones(length, dtype=real_dtype) # signal.flattop(length) # TODO: CHANGE THIS BACK FROM BOXCAR
             #self.fft_window = np.ones(length)
             self.logger.logln("Done!")
             return
         if window == "flattop":
-            self.fft_window = signal.flattop(length) # todo: look into why flattop window doesn't work
+            self.fft_window = signal.flattop(length).astype(real_dtype) # todo: look into why flattop window doesn't work
             self.logger.logln("Done!")
             return
         
@@ -1662,63 +1856,78 @@ class SDR_Test_Class(object):
     
     # Normalize an FFT
     def normalize_dBm_fft(self, fft):
-        return (fft - 20*np.log10(len(fft)))
+        return (fft - float(20*np.log10(len(fft))))
 
     # Compute a normalized dBm FFT
-    def compute_dBm_fft(self, data, f0):
-        fft, fft_freqs = self.compute_fft(data, f0)
-        return (fft - 20*np.log10(len(data)/2)), fft_freqs
+    def compute_dBm_fft(self, data, f0, fs=None, window=None):
+        fft, fft_freqs = self.compute_fft(data, f0, fs, window)
+        return (fft - float(20*np.log10(len(data)/2))), fft_freqs
 
     # Compute a default FFT
-    def compute_fft(self, data, f0):
-        print("LENGTH OF WINDOW:", len(self.fft_window))
-        print("LENGTH OF DATA:", len(data))
+    # (fftpack keeps single precision input in single precision, np.fft always promotes)
+    # Frequencies stay double since float32 cannot resolve Hz at GHz center frequencies
+    # Pass the sampling frequency (fs) and window to avoid reading the SDR and test state, e.g. from a DSP worker
+    def compute_fft(self, data, f0, fs=None, window=None):
+        if fs is None:
+            fs = self.sdr.get_sampling_frequency()
+        if window is None:
+            window = self.fft_window
         fft = 20*np.log10(
                 np.absolute(
                     np.fft.fftshift(
-                        np.fft.fft(self.fft_window*data)
+                        fftpack.fft(window*data)
                     )
                 )
-            ) + self.compute_lin_v_to_dbm_p_factor() - self.calculate_fft_window_power()
+            )
+        fft += float(self.compute_lin_v_to_dbm_p_factor() - self.calculate_fft_window_power(window))
         fft_freqs = np.fft.fftshift(
                 np.fft.fftfreq(
-                    len(data), d=(1/self.sdr.get_sampling_frequency()) #d=(1/self.profile.sdr_sampling_frequency)
+                    len(data), d=(1/fs) #d=(1/self.profile.sdr_sampling_frequency)
                 )
             ) + f0
         return fft, fft_freqs
 
     # Compute an averaged normalized dBm FFT
-    def compute_avg_dBm_fft(self, data, f0, avg_num=1):
+    # (accumulated in double, returned in the spectrum precision)
+    def compute_avg_dBm_fft(self, data, f0, avg_num=1, fs=None, window=None, dtype=None):
+        if dtype is None:
+            dtype = self.get_precision_dtypes()[1]
+        if fs is None:
+            fs = self.sdr.get_sampling_frequency()
         bins = int(len(data)/avg_num)
-        fft = np.zeros(bins)
+        fft = np.zeros(bins, dtype=np.float64)
         fft_freqs = np.zeros(bins)
         for i in range(avg_num):
             sub_data = data[i*bins:(i+1)*bins]
             sub_fft, sub_fft_freqs = self.compute_dBm_fft(
-                    sub_data, f0
+                    sub_data, f0, fs, window
                 )
-            fft = fft + sub_fft
+            fft += sub_fft
             fft_freqs = sub_fft_freqs
-        fft = fft / avg_num
-        return fft, fft_freqs
+        fft /= avg_num
+        return fft.astype(dtype, copy=False), fft_freqs
 
     # Compute an averaged default FFT
-    def compute_avg_fft(self, data, lo_freq, avg_num=1):
-        print("LENGTH OF DATA IN AVG FFT:", len(data))
+    # (accumulated in double, returned in the spectrum precision)
+    def compute_avg_fft(self, data, lo_freq, avg_num=1, fs=None, window=None, dtype=None):
+        if dtype is None:
+            dtype = self.get_precision_dtypes()[1]
+        if fs is None:
+            fs = self.sdr.get_sampling_frequency()
         bins = int(len(data)/avg_num)
-        fft = np.zeros(bins)#-1000
+        fft = np.zeros(bins, dtype=np.float64)#-1000
         fft_freqs = np.zeros(bins)
         for i in range(avg_num):
             sub_data = data[i*bins:(i+1)*bins]
             sub_fft, sub_fft_freqs = self.compute_fft(
-                    sub_data, lo_freq
+                    sub_data, lo_freq, fs, window
                 )
             #fft = np.max(np.array([fft, sub_fft]), axis=0) (Max trace)
-            fft = fft + 10**(sub_fft/10)  # converts back to linear to be converted to dB again later
+            fft += 10**(sub_fft.astype(np.float64)/10)  # converts back to linear to be converted to dB again later
             fft_freqs = sub_fft_freqs
-        fft = fft / avg_num
+        fft /= avg_num
         fft = 10*np.log10(fft)
-        return fft, fft_freqs
+        return fft.astype(dtype, copy=False), fft_freqs
 
     #
     # POWER MEASUREMENT FUNCTIONS
@@ -1731,18 +1940,25 @@ class SDR_Test_Class(object):
         factor = 10*np.log10(factor) + 30
         return factor
 
-    # Compute power by averaging the time-domain signal
+    # Compute power by averaging the time-domain signal (summed in double)
     def compute_time_domain_averaged_power(self, data):
         return 10*np.log10(
                 np.mean(
-                    np.abs(data)**2
+                    np.abs(data)**2, dtype=np.float64
                 )
             ) + self.compute_lin_v_to_dbm_p_factor()
 
     # Compute power by integrating the frequency domain signal
-    def compute_freq_domain_integrated_power(self, data):
-        f_psd,psd = signal.welch(data, nperseg=self.profile.fft_number_of_bins, fs=self.profile.sdr_sampling_frequency, window=self.fft_window)
-        acc = integrate.trapz(psd, f_psd)
+    # (the segment length, sampling frequency and window default to the profile's and current window)
+    def compute_freq_domain_integrated_power(self, data, nperseg=None, fs=None, window=None):
+        if nperseg is None:
+            nperseg = self.profile.fft_number_of_bins
+        if fs is None:
+            fs = self.profile.sdr_sampling_frequency
+        if window is None:
+            window = self.fft_window
+        f_psd,psd = signal.welch(data, nperseg=nperseg, fs=fs, window=window)
+        acc = integrate.trapz(psd.astype(np.float64, copy=False), f_psd)
         acc = 10*np.log10(acc) + self.compute_lin_v_to_dbm_p_factor()
         return acc
 
@@ -1767,9 +1983,11 @@ class SDR_Test_Class(object):
         return fft[fft_max_index], fft_freq[fft_max_index]
 
     # Scale the time domain IQ data with a power scale factor
-    def scale_iq_data_with_power_factor(self, iq_data, power_scaling_factor):
-        voltage_scaling_factor = (10**(power_scaling_factor/20.0))
-        return iq_data*voltage_scaling_factor
+    # (the factor is cast to the data's precision so single precision IQ stays single)
+    def scale_iq_data_with_power_factor(self, iq_data, power_scaling_factor, out=None):
+        iq_data = np.asarray(iq_data)
+        voltage_scaling_factor = np.promote_types(iq_data.real.dtype, np.float32).type(10**(power_scaling_factor/20.0))
+        return np.multiply(iq_data, voltage_scaling_factor, out=out)
 
     #
     # LINEARITY CHECK FUNCTIONS